@@ -1,161 +1,1277 @@
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import csv
-from datetime import datetime, timedelta
+from itertools import product
+import re
 import sys
 
+import numpy as np
 import pandas as pd
-import pyupbit
 from loguru import logger
 
-from config import PAPER_INITIAL_KRW, RSI_PERIOD, TRADE_AMOUNT_KRW
-from strategy import get_signal
+from candle_store import CandleStore
+from config import (
+    CANDLE_CACHE_FILE,
+    DAILY_LOSS_LIMIT_PCT,
+    MAX_INVEST_RATIO,
+    PAPER_INITIAL_KRW,
+    RSI_PERIOD,
+    STOP_LOSS_PCT,
+    TAKE_PROFIT_PCT,
+    TRADE_AMOUNT_KRW,
+)
+from indicator_cache import IndicatorCache, data_range
+from indicators import IndicatorGraph
+from market_data import fetch_ohlcv_days, interval_to_minutes, to_datetime
+from paper_broker import PaperBroker
+from report import compute_metrics
+from resample import BASE_INTERVAL, Timeframes, timeframe_minutes
+from result_store import ResultStore, RunCache, data_fingerprint
+from strategies import parse_strategy
+from strategy import (
+    BUY_THRESHOLD,
+    SELL_THRESHOLD,
+    StreamingRSI,
+    calculate_rsi,
+    signal_from_rsi,
+    signals_from_rsi,
+)
+from trade_columns import (
+    EQUITY_COLUMNS_DIR,
+    TRADE_COLUMNS_DIR,
+    write_columns,
+    write_trade_columns,
+)
+from trading_rules import RiskRules, apply_rules
 
 FEE_RATE = 0.0005
 MIN_ORDER_KRW = 5000.0
 DEFAULT_DAYS = 90
 DEFAULT_INTERVAL = "minute5"
 TRADES_CSV = "trades.csv"
+PORTFOLIO_CSV = "portfolio_trades.csv"
+TICKER_TRADES_CSV = "trades_{ticker}.csv"
+STRATEGY_TRADES_CSV = "trades_{strategy}.csv"
+INTERVAL_TRADES_CSV = "trades_{interval}.csv"
+DEFAULT_ENGINE = "stream"
+TRADE_FIELDS = ["time", "signal", "price", "qty", "fee", "balance", "position", "pnl"]
+WALK_FORWARD_CSV = "walk_forward.csv"
+DEFAULT_TRAIN_DAYS = 30
+DEFAULT_TEST_DAYS = 7
+WALK_FORWARD_FIELDS = [
+    "window",
+    "train_start",
+    "train_end",
+    "test_start",
+    "test_end",
+    "period",
+    "buy_threshold",
+    "sell_threshold",
+    "trade_amount",
+    "stop_loss_pct",
+    "take_profit_pct",
+    "in_sample_return",
+    "out_of_sample_return",
+    "out_of_sample_mdd",
+    "out_of_sample_trades",
+    "out_of_sample_win_rate",
+]
+SIGNAL_NAMES = {1: "buy", -1: "sell", 0: "hold"}
 
 
-def interval_to_minutes(interval):
-    if not interval.startswith("minute"):
-        raise ValueError("Only minute intervals are supported.")
-    return int(interval.replace("minute", ""))
+def format_trade_row(row):
+    formatted = {
+        "time": row["time"].isoformat(sep=" "),
+        "signal": row["signal"],
+        "price": f"{row['price']:.4f}",
+        "qty": f"{row['qty']:.8f}",
+        "fee": f"{row['fee']:.2f}",
+        "balance": f"{row['balance']:.2f}",
+        "position": f"{row['position']:.8f}",
+        "pnl": f"{row['pnl']:.2f}",
+    }
+    if "ticker" in row:
+        formatted["ticker"] = row["ticker"]
+    return formatted
 
 
-def fetch_ohlcv_days(ticker, interval, days):
-    minutes = interval_to_minutes(interval)
-    total_needed = int(days * 24 * 60 / minutes)
-    remaining = max(total_needed, 1)
-    dfs = []
-    to = None
+def write_trades_csv(rows, path, fields=TRADE_FIELDS):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(format_trade_row(row))
+
+
+def buy_fill(krw_balance, trade_amount, price):
+    # Market buy of trade_amount with the fee on top, capped by cash.
+    # (spend, fee, qty), or None below the minimum order.
+    available = krw_balance / (1 + FEE_RATE)
+    spend = min(trade_amount, available)
+    if spend < MIN_ORDER_KRW:
+        return None
+    return spend, spend * FEE_RATE, spend / price
+
+
+def sell_fill(qty, price):
+    # Market sell of qty: (fee, net proceeds), or None below the minimum
+    # order.
+    proceeds = qty * price
+    if proceeds < MIN_ORDER_KRW:
+        return None
+    fee = proceeds * FEE_RATE
+    return fee, proceeds - fee
+
+
+class BacktestAccount:
+    def __init__(self, initial_krw=PAPER_INITIAL_KRW, trade_amount=TRADE_AMOUNT_KRW):
+        self.krw_balance = float(initial_krw)
+        self.trade_amount = float(trade_amount)
+        self.position_qty = 0.0
+        self.position_cost = 0.0
+        self.position_spend = 0.0
+        self.trades = []
+
+    @property
+    def avg_price(self):
+        if self.position_qty <= 0:
+            return 0.0
+        return self.position_spend / self.position_qty
+
+    def buy(self, ts, price):
+        fill = buy_fill(self.krw_balance, self.trade_amount, price)
+        if fill is None:
+            return False
+        spend, fee, qty = fill
+        self.krw_balance -= (spend + fee)
+        self.position_qty += qty
+        self.position_cost += (spend + fee)
+        self.position_spend += spend
+
+        self.trades.append(
+            {
+                "time": to_datetime(ts),
+                "signal": "buy",
+                "price": price,
+                "qty": qty,
+                "fee": fee,
+                "balance": self.krw_balance,
+                "position": self.position_qty,
+                "pnl": 0.0,
+            }
+        )
+        return True
+
+    def sell(self, ts, price):
+        if self.position_qty <= 0:
+            return False
+        fill = sell_fill(self.position_qty, price)
+        if fill is None:
+            return False
+        fee, net = fill
+        pnl = net - self.position_cost
+        self.krw_balance += net
+
+        qty = self.position_qty
+        self.position_qty = 0.0
+        self.position_cost = 0.0
+        self.position_spend = 0.0
+
+        self.trades.append(
+            {
+                "time": to_datetime(ts),
+                "signal": "sell",
+                "price": price,
+                "qty": qty,
+                "fee": fee,
+                "balance": self.krw_balance,
+                "position": self.position_qty,
+                "pnl": pnl,
+            }
+        )
+        return True
+
+
+def exit_triggered(price, avg_price, stop_loss_pct, take_profit_pct):
+    change_pct = (price - avg_price) / avg_price
+    if stop_loss_pct and change_pct <= -stop_loss_pct:
+        return True
+    return bool(take_profit_pct and change_pct >= take_profit_pct)
+
+
+def first_touch(lows, highs, start, end, avg_price, stop_loss_pct, take_profit_pct):
+    # First bar in [start, end) whose low/high crosses the stop or target,
+    # via running min/max + searchsorted instead of a per-bar loop.
+    if start >= end:
+        return None
+    first = end
+    if stop_loss_pct:
+        worst = np.minimum.accumulate((lows[start:end] - avg_price) / avg_price)
+        first = min(first, start + int(np.searchsorted(-worst, stop_loss_pct)))
+    if take_profit_pct:
+        best = np.maximum.accumulate((highs[start:end] - avg_price) / avg_price)
+        first = min(first, start + int(np.searchsorted(best, take_profit_pct)))
+    if first >= end:
+        return None
+    return first
+
+
+def simulate_stream(
+    df,
+    period=RSI_PERIOD,
+    buy_threshold=BUY_THRESHOLD,
+    sell_threshold=SELL_THRESHOLD,
+    trade_amount=TRADE_AMOUNT_KRW,
+    stop_loss_pct=None,
+    take_profit_pct=None,
+    strategy=None,
+):
+    account = BacktestAccount(trade_amount=trade_amount)
+    if strategy is None:
+        rsi_state = StreamingRSI(period)
+    else:
+        stream = strategy.stream()
+    check_exits = bool(stop_loss_pct or take_profit_pct)
+
+    for ts, close in zip(df.index, df["close"]):
+        if strategy is None:
+            rsi = rsi_state.update(close)
+        else:
+            signal = SIGNAL_NAMES[stream.update(close)]
+        price = float(close)
+
+        if check_exits and account.position_qty > 0:
+            if exit_triggered(price, account.avg_price, stop_loss_pct, take_profit_pct):
+                account.sell(ts, price)
+                continue
+
+        if strategy is None:
+            if rsi is None:
+                continue
+            signal = signal_from_rsi(rsi, buy_threshold, sell_threshold)
+        if signal == "buy":
+            account.buy(ts, price)
+        elif signal == "sell":
+            account.sell(ts, price)
+
+    return account.trades
+
 
-    while remaining > 0:
-        count = min(200, remaining)
-        df = pyupbit.get_ohlcv(ticker, interval=interval, count=count, to=to)
-        if df is None or df.empty:
-            break
-        dfs.append(df)
-        remaining -= len(df)
+def simulate_vectorized(
+    df,
+    period=RSI_PERIOD,
+    buy_threshold=BUY_THRESHOLD,
+    sell_threshold=SELL_THRESHOLD,
+    trade_amount=TRADE_AMOUNT_KRW,
+    stop_loss_pct=None,
+    take_profit_pct=None,
+    rsi=None,
+    signals=None,
+):
+    account = BacktestAccount(trade_amount=trade_amount)
+    if signals is None:
+        if rsi is None:
+            rsi = calculate_rsi(df["close"], period).to_numpy()
+        signals = signals_from_rsi(rsi, buy_threshold, sell_threshold)
+    closes = df["close"].to_numpy(dtype=float)
+    index = df.index
+    check_exits = bool(stop_loss_pct or take_profit_pct)
+    watch_from = 0
+
+    def close_on_exit(end):
+        # Returns the bar consumed by a stop/target exit, if any.
+        nonlocal watch_from
+        while account.position_qty > 0:
+            hit = first_touch(
+                closes,
+                closes,
+                watch_from,
+                end,
+                account.avg_price,
+                stop_loss_pct,
+                take_profit_pct,
+            )
+            if hit is None:
+                return None
+            watch_from = hit + 1
+            if account.sell(index[hit], float(closes[hit])) or hit == end - 1:
+                return hit
+        return None
+
+    for idx in np.flatnonzero(signals):
+        if check_exits and close_on_exit(idx + 1) == idx:
+            continue
+        if signals[idx] > 0:
+            account.buy(index[idx], float(closes[idx]))
+        elif account.position_qty > 0:
+            account.sell(index[idx], float(closes[idx]))
+        watch_from = idx + 1
 
-        earliest = df.index[0]
-        next_to = earliest - timedelta(seconds=1)
-        if hasattr(next_to, "to_pydatetime"):
-            next_to = next_to.to_pydatetime()
-        to = next_to
+    if check_exits:
+        close_on_exit(len(closes))
 
-        if len(df) < count:
-            break
+    return account.trades
 
-    if not dfs:
+
+def first_exit(opens, lows, highs, start, end, avg_price, stop_loss_pct, take_profit_pct):
+    # (bar, price) of the first stop/target touch in [start, end), or None.
+    # A bar touching both is taken as a stop since the order inside it is
+    # unknown; a bar opening beyond the level fills at its open.
+    stop_hit = first_touch(lows, highs, start, end, avg_price, stop_loss_pct, None)
+    target_hit = first_touch(lows, highs, start, end, avg_price, None, take_profit_pct)
+    if stop_hit is None and target_hit is None:
         return None
+    if target_hit is None or (stop_hit is not None and stop_hit <= target_hit):
+        hit = stop_hit
+        price = min(avg_price * (1 - stop_loss_pct), opens[hit])
+    else:
+        hit = target_hit
+        price = max(avg_price * (1 + take_profit_pct), opens[hit])
+    return hit, float(min(max(price, lows[hit]), highs[hit]))
+
+
+def simulate_intrabar(
+    df,
+    sub_df,
+    period=RSI_PERIOD,
+    buy_threshold=BUY_THRESHOLD,
+    sell_threshold=SELL_THRESHOLD,
+    trade_amount=TRADE_AMOUNT_KRW,
+    stop_loss_pct=STOP_LOSS_PCT,
+    take_profit_pct=TAKE_PROFIT_PCT,
+    rsi=None,
+    signals=None,
+):
+    # Signals act on df's closes like simulate_vectorized, but stop-loss and
+    # take-profit are checked against the sub_df (minute1) lows/highs in
+    # between and fill at the level, with one searchsorted per open stretch.
+    account = BacktestAccount(trade_amount=trade_amount)
+    if signals is None:
+        if rsi is None:
+            rsi = calculate_rsi(df["close"], period).to_numpy()
+        signals = signals_from_rsi(rsi, buy_threshold, sell_threshold)
+    closes = df["close"].to_numpy(dtype=float)
+    index = df.index
+    sub_index = sub_df.index
+    opens = sub_df["open"].to_numpy(dtype=float)
+    lows = sub_df["low"].to_numpy(dtype=float)
+    highs = sub_df["high"].to_numpy(dtype=float)
+
+    # Sub-bars [bar_first[i], bar_end[i]) make up bar i; a bar closes when
+    # the next one opens.
+    bar_first = np.searchsorted(sub_index.values, index.values, side="left")
+    closes_at = np.empty_like(index.values)
+    closes_at[:-1] = index.values[1:]
+    if len(index) > 1:
+        closes_at[-1] = index.values[-1] + np.min(np.diff(index.values))
+    elif len(index):
+        closes_at[-1] = sub_index.values[-1] + 1
+    bar_end = np.searchsorted(sub_index.values, closes_at, side="left")
+    check_exits = bool(stop_loss_pct or take_profit_pct)
+    watch_from = 0
+
+    def close_on_exit(end):
+        # Returns the sub-bar consumed by a stop/target exit, if any.
+        nonlocal watch_from
+        while account.position_qty > 0:
+            hit = first_exit(
+                opens,
+                lows,
+                highs,
+                watch_from,
+                end,
+                account.avg_price,
+                stop_loss_pct,
+                take_profit_pct,
+            )
+            if hit is None:
+                return None
+            watch_from = hit[0] + 1
+            if account.sell(sub_index[hit[0]], hit[1]):
+                return hit[0]
+        return None
+
+    for idx in np.flatnonzero(signals):
+        if check_exits:
+            hit = close_on_exit(bar_end[idx])
+            if hit is not None and hit >= bar_first[idx]:
+                continue
+        if signals[idx] > 0:
+            account.buy(index[idx], float(closes[idx]))
+        elif account.position_qty > 0:
+            account.sell(index[idx], float(closes[idx]))
+        watch_from = bar_end[idx]
+
+    if check_exits:
+        close_on_exit(len(sub_index))
+
+    return account.trades
+
+
+def equity_curve(df, trades, initial_krw=PAPER_INITIAL_KRW):
+    # Carries each trade row's balance/position forward to every later bar
+    # and marks the position at that bar's close.
+    times = df.index.as_unit("s").asi8
+    closes = df["close"].to_numpy(dtype=np.float64)
+    cash = np.full(len(times), float(initial_krw))
+    position = np.zeros(len(times))
+    if trades:
+        count = len(trades)
+        trade_times = pd.DatetimeIndex([t["time"] for t in trades]).as_unit("s").asi8
+        last = np.searchsorted(trade_times, times, side="right") - 1
+        held = last >= 0
+        balances = np.fromiter((t["balance"] for t in trades), dtype=np.float64, count=count)
+        positions = np.fromiter((t["position"] for t in trades), dtype=np.float64, count=count)
+        cash[held] = balances[last[held]]
+        position[held] = positions[last[held]]
+    return {
+        "time": times,
+        "equity": cash + position * closes,
+        "position": position,
+        "cash": cash,
+    }
+
+
+def simulate_replay(
+    df,
+    period=RSI_PERIOD,
+    buy_threshold=BUY_THRESHOLD,
+    sell_threshold=SELL_THRESHOLD,
+    trade_amount=TRADE_AMOUNT_KRW,
+    stop_loss_pct=STOP_LOSS_PCT,
+    take_profit_pct=TAKE_PROFIT_PCT,
+    rsi=None,
+    signals=None,
+):
+    # Drives the live paper rules (daily loss limit, stop-loss/take-profit,
+    # max invest ratio) over history with an in-memory PaperBroker.
+    rules = RiskRules(
+        trade_amount=trade_amount,
+        stop_loss_pct=stop_loss_pct,
+        take_profit_pct=take_profit_pct,
+    )
+    broker = PaperBroker(initial_krw=PAPER_INITIAL_KRW, persist=False)
+    if signals is None:
+        if rsi is None:
+            rsi = calculate_rsi(df["close"], period).to_numpy()
+        signals = signals_from_rsi(rsi, buy_threshold, sell_threshold)
+        # run_once skips bars whose RSI is not ready before touching the broker.
+        ready = np.flatnonzero(~np.isnan(rsi))
+    else:
+        # Strategy signals are 0 until warmed up, which the loop skips anyway.
+        ready = np.arange(len(signals))
+    if len(ready) == 0:
+        return []
+    index = df.index[ready]
+    closes = df["close"].to_numpy(dtype=float)[ready].tolist()
+    days = index.normalize().values
+    new_day = np.empty(len(ready), dtype=bool)
+    new_day[0] = True
+    new_day[1:] = days[1:] != days[:-1]
+
+    trades = []
+    for pos, (signal, price, day_changed) in enumerate(
+        zip(signals[ready].tolist(), closes, new_day.tolist())
+    ):
+        if day_changed:
+            broker.refresh_day(price, now=index[pos])
+        if signal == 0 and broker.coin_amount <= 0:
+            continue
+
+        avg_buy_price = broker.avg_buy_price
+        event, result = apply_rules(broker, SIGNAL_NAMES[signal], price, rules)
+        if result is None or result["status"] != "filled":
+            continue
+
+        qty = result["qty"]
+        pnl = 0.0
+        if result["side"] == "sell":
+            pnl = (price - avg_buy_price) * qty
+        trades.append(
+            {
+                "time": to_datetime(index[pos]),
+                "signal": result["side"],
+                "price": price,
+                "qty": qty,
+                "fee": 0.0,
+                "balance": broker.krw_balance,
+                "position": broker.coin_amount,
+                "pnl": pnl,
+            }
+        )
+
+    return trades
+
+
+class PortfolioAccount:
+    def __init__(self, initial_krw=PAPER_INITIAL_KRW, trade_amount=TRADE_AMOUNT_KRW):
+        self.krw_balance = float(initial_krw)
+        self.trade_amount = float(trade_amount)
+        self.positions = {}
+        self.trades = []
+
+    def _record(self, ticker, ts, signal, price, qty, fee, position, pnl):
+        self.trades.append(
+            {
+                "time": to_datetime(ts),
+                "ticker": ticker,
+                "signal": signal,
+                "price": price,
+                "qty": qty,
+                "fee": fee,
+                "balance": self.krw_balance,
+                "position": position,
+                "pnl": pnl,
+            }
+        )
+
+    def buy(self, ticker, ts, price):
+        fill = buy_fill(self.krw_balance, self.trade_amount, price)
+        if fill is None:
+            return False
+        spend, fee, qty = fill
+        self.krw_balance -= (spend + fee)
+        position_qty, position_cost = self.positions.get(ticker, (0.0, 0.0))
+        position_qty += qty
+        self.positions[ticker] = (position_qty, position_cost + (spend + fee))
+        self._record(ticker, ts, "buy", price, qty, fee, position_qty, 0.0)
+        return True
+
+    def sell(self, ticker, ts, price):
+        position_qty, position_cost = self.positions.get(ticker, (0.0, 0.0))
+        if position_qty <= 0:
+            return False
+        fill = sell_fill(position_qty, price)
+        if fill is None:
+            return False
+        fee, net = fill
+        self.krw_balance += net
+        del self.positions[ticker]
+        self._record(
+            ticker, ts, "sell", price, position_qty, fee, 0.0, net - position_cost
+        )
+        return True
+
+
+def load_market(
+    ticker,
+    interval,
+    days,
+    use_cache=True,
+    period=RSI_PERIOD,
+    buy_threshold=BUY_THRESHOLD,
+    sell_threshold=SELL_THRESHOLD,
+):
+    # Runs in a worker thread, so each call opens its own SQLite connection.
+    store = CandleStore(CANDLE_CACHE_FILE) if use_cache else None
+    try:
+        df = fetch_ohlcv_days(ticker, interval, days, store=store)
+    finally:
+        if store is not None:
+            store.close()
+    if df is None or df.empty:
+        return None
+
+    signals = signals_from_rsi(
+        calculate_rsi(df["close"], period).to_numpy(), buy_threshold, sell_threshold
+    )
+    events = np.flatnonzero(signals)
+    return {
+        "ticker": ticker,
+        "times": df.index.values[events].astype("datetime64[ns]").view("int64"),
+        "signals": signals[events],
+        "prices": df["close"].to_numpy(dtype=float)[events],
+        "index": df.index[events],
+    }
+
+
+def simulate_portfolio(markets, trade_amount=TRADE_AMOUNT_KRW):
+    # Signals act at bar closes with no stop-loss/take-profit, like the
+    # stream/vectorized engines; parse_args rejects the other options.
+    account = PortfolioAccount(trade_amount=trade_amount)
+    if not markets:
+        return account.trades
+
+    times = np.concatenate([m["times"] for m in markets])
+    order_in_basket = np.concatenate(
+        [np.full(len(m["times"]), i) for i, m in enumerate(markets)]
+    )
+    offsets = np.concatenate([np.arange(len(m["times"])) for m in markets])
+    order = np.lexsort((order_in_basket, times))
+
+    for k in order:
+        market = markets[order_in_basket[k]]
+        pos = offsets[k]
+        price = float(market["prices"][pos])
+        ts = market["index"][pos]
+        if market["signals"][pos] > 0:
+            account.buy(market["ticker"], ts, price)
+        else:
+            account.sell(market["ticker"], ts, price)
+
+    return account.trades
+
+
+def resolve_tickers(tickers=None, all_krw=False):
+    if all_krw:
+        import pyupbit
+
+        return pyupbit.get_tickers(fiat="KRW") or []
+    return [t.strip() for t in (tickers or "").split(",") if t.strip()]
+
+
+def run_portfolio_backtest(
+    tickers,
+    days,
+    interval,
+    use_cache=True,
+    workers=None,
+    period=RSI_PERIOD,
+    buy_threshold=BUY_THRESHOLD,
+    sell_threshold=SELL_THRESHOLD,
+    trade_amount=TRADE_AMOUNT_KRW,
+):
+    if not tickers:
+        logger.error("No tickers given.")
+        return 1
+
+    def load(ticker):
+        try:
+            return load_market(
+                ticker,
+                interval,
+                days,
+                use_cache=use_cache,
+                period=period,
+                buy_threshold=buy_threshold,
+                sell_threshold=sell_threshold,
+            )
+        except Exception as exc:
+            logger.error("Failed to fetch OHLCV for {}: {}", ticker, exc)
+            return None
 
-    result = pd.concat(dfs).sort_index()
-    result = result[~result.index.duplicated(keep="last")]
-    return result
+    with ThreadPoolExecutor(max_workers=workers or min(len(tickers), 8)) as pool:
+        loaded = list(pool.map(load, tickers))
+
+    markets = [m for m in loaded if m is not None]
+    if not markets:
+        logger.error("No OHLCV data returned.")
+        return 1
+
+    trades = simulate_portfolio(markets, trade_amount=trade_amount)
+
+    write_trades_csv(trades, PORTFOLIO_CSV, fields=["ticker"] + TRADE_FIELDS)
+    for market in markets:
+        ticker = market["ticker"]
+        path = TICKER_TRADES_CSV.format(ticker=ticker)
+        write_trades_csv([t for t in trades if t["ticker"] == ticker], path)
+    logger.info(
+        "Portfolio backtest finished for {} markets. Trades written to {}",
+        len(markets),
+        PORTFOLIO_CSV,
+    )
+    return 0
+
+
+def parse_range(text, cast=float):
+    # "a:b:step" (inclusive) or "a,b,c"
+    if ":" in text:
+        parts = [cast(p) for p in text.split(":")]
+        if len(parts) != 3 or parts[2] <= 0:
+            raise argparse.ArgumentTypeError(f"Invalid range: {text}")
+        start, stop, step = parts
+        count = int(round((stop - start) / step)) + 1
+        return [cast(round(start + i * step, 10)) for i in range(max(count, 0))]
+    return [cast(p) for p in text.split(",") if p != ""]
+
+
+def build_grid(periods, buys, sells, amounts, stop_losses, take_profits):
+    grid = []
+    for period, buy, sell, amount, sl, tp in product(
+        periods, buys, sells, amounts, stop_losses, take_profits
+    ):
+        if buy >= sell:
+            continue
+        grid.append(
+            {
+                "period": int(period),
+                "buy_threshold": buy,
+                "sell_threshold": sell,
+                "trade_amount": amount,
+                "stop_loss_pct": sl or None,
+                "take_profit_pct": tp or None,
+            }
+        )
+    # Grouping by period lets each worker reuse its cached RSI series.
+    grid.sort(key=lambda params: params["period"])
+    return grid
+
+
+def rank_results(results):
+    return sorted(
+        results,
+        key=lambda r: (r["cumulative_return"], r["mdd"]),
+        reverse=True,
+    )
+
+
+def walk_forward_windows(total, train_bars, test_bars, step_bars=None):
+    # (start, split, end) bar offsets: train on [start, split), test on
+    # [split, end), then roll forward by step_bars (default: test_bars).
+    step = step_bars or test_bars
+    return [
+        (start, start + train_bars, start + train_bars + test_bars)
+        for start in range(0, total - train_bars - test_bars + 1, step)
+    ]
+
+
+def cached_rsi(df, period, cache, ticker=None, interval=None):
+    # Computed once per period over the full history; windows take slices.
+    key = (ticker, interval, "rsi", period, data_range(df))
+    return cache.get_or_compute(
+        key, lambda: calculate_rsi(df["close"], period).to_numpy()
+    )
+
+
+def evaluate_window(df, rsi, start, end, params):
+    trades = simulate_vectorized(df.iloc[start:end], rsi=rsi[start:end], **params)
+    return compute_metrics(trades)
+
+
+def evaluate_windows(df, grid, start, end, rsi, results):
+    # Metrics of every grid point over bars [start, end), with rsi(period)
+    # giving the full-history series. Stored window results (keyed by the
+    # full candles plus the bar range) are reused.
+    def compute(todo):
+        return [evaluate_window(df, rsi(p["period"]), start, end, p) for p in todo]
+
+    return results.metrics_many("walk_forward", grid, compute, window=[start, end])
 
 
-def write_trades_csv(rows, path):
-    fields = ["time", "signal", "price", "qty", "fee", "balance", "position", "pnl"]
+def walk_forward(
+    df,
+    grid,
+    train_bars,
+    test_bars,
+    step_bars=None,
+    ticker=None,
+    interval=None,
+    cache=None,
+    results=None,
+):
+    cache = cache if cache is not None else IndicatorCache()
+    results = results if results is not None else RunCache()
+    index = df.index
+    rows = []
+
+    def rsi(period):
+        return cached_rsi(df, period, cache, ticker, interval)
+
+    for number, (start, split, end) in enumerate(
+        walk_forward_windows(len(df), train_bars, test_bars, step_bars), start=1
+    ):
+        train = evaluate_windows(df, grid, start, split, rsi, results)
+        best = rank_results([dict(p, **m) for p, m in zip(grid, train)])[0]
+        params = {field: best[field] for field in grid[0]}
+        test = evaluate_windows(df, [params], split, end, rsi, results)[0]
+
+        row = {
+            "window": number,
+            "train_start": index[start],
+            "train_end": index[split - 1],
+            "test_start": index[split],
+            "test_end": index[end - 1],
+            "in_sample_return": best["cumulative_return"],
+            "out_of_sample_return": test["cumulative_return"],
+            "out_of_sample_mdd": test["mdd"],
+            "out_of_sample_trades": test["trade_count"],
+            "out_of_sample_win_rate": test["win_rate"],
+        }
+        row.update(params)
+        rows.append(row)
+    return rows
+
+
+def write_walk_forward_csv(rows, path):
     with open(path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fields)
+        writer = csv.DictWriter(f, fieldnames=WALK_FORWARD_FIELDS)
         writer.writeheader()
-        for row in rows:
-            writer.writerow(row)
+        writer.writerows(rows)
 
 
-def run_backtest(ticker, days, interval):
+def run_walk_forward(args):
+    store = None if args.no_cache else CandleStore(CANDLE_CACHE_FILE)
     try:
-        df = fetch_ohlcv_days(ticker, interval, days)
+        df = fetch_ohlcv_days(args.ticker, args.interval, args.days, store=store)
     except Exception as exc:
         logger.error("Failed to fetch OHLCV: {}", exc)
         return 1
+    finally:
+        if store is not None:
+            store.close()
 
     if df is None or df.empty:
         logger.error("No OHLCV data returned.")
         return 1
 
-    krw_balance = float(PAPER_INITIAL_KRW)
-    position_qty = 0.0
-    position_cost = 0.0
-    trades = []
+    grid = build_grid(
+        args.periods,
+        args.buy,
+        args.sell,
+        args.trade_amount,
+        args.stop_loss or [0.0],
+        args.take_profit or [0.0],
+    )
+    if not grid:
+        logger.error("Parameter grid is empty.")
+        return 1
 
-    for idx in range(len(df)):
-        window = df.iloc[: idx + 1]
-        signal, rsi = get_signal(window, RSI_PERIOD)
-        if rsi is None:
-            continue
+    bars_per_day = 1440 // interval_to_minutes(args.interval)
+    train_bars = int(args.train_days * bars_per_day)
+    test_bars = int(args.test_days * bars_per_day)
+    step_bars = int(args.step_days * bars_per_day) if args.step_days else None
+    if train_bars + test_bars > len(df):
+        logger.error(
+            "Need {} candles for one window but only {} were fetched.",
+            train_bars + test_bars,
+            len(df),
+        )
+        return 1
 
-        price = float(window["close"].iloc[-1])
-        ts = window.index[-1]
-        if hasattr(ts, "to_pydatetime"):
-            ts = ts.to_pydatetime()
-        time_str = ts.isoformat(sep=" ")
+    cache = IndicatorCache()
+    store = None if args.no_results else ResultStore()
+    try:
+        config = grid_config(args.ticker, args.days, args.interval, df)
+        results = RunCache(store, config)
+        rows = walk_forward(
+            df,
+            grid,
+            train_bars,
+            test_bars,
+            step_bars,
+            ticker=args.ticker,
+            interval=args.interval,
+            cache=cache,
+            results=results,
+        )
+    finally:
+        if store is not None:
+            store.close()
+    write_walk_forward_csv(rows, WALK_FORWARD_CSV)
 
-        if signal == "buy":
-            available = krw_balance / (1 + FEE_RATE)
-            spend = min(TRADE_AMOUNT_KRW, available)
-            if spend < MIN_ORDER_KRW:
-                continue
-            fee = spend * FEE_RATE
-            qty = spend / price
-            krw_balance -= (spend + fee)
-            position_qty += qty
-            position_cost += (spend + fee)
-
-            trades.append(
-                {
-                    "time": time_str,
-                    "signal": "buy",
-                    "price": f"{price:.4f}",
-                    "qty": f"{qty:.8f}",
-                    "fee": f"{fee:.2f}",
-                    "balance": f"{krw_balance:.2f}",
-                    "position": f"{position_qty:.8f}",
-                    "pnl": "0.00",
-                }
-            )
-            continue
+    compounded = 1.0
+    for row in rows:
+        compounded *= 1 + row["out_of_sample_return"]
+    logger.info(
+        "Walk-forward finished: {} windows x {} combinations, out-of-sample "
+        "return {:.2f}% (RSI cache {} hits / {} misses, {} stored results "
+        "reused). Results written to {}",
+        len(rows),
+        len(grid),
+        (compounded - 1) * 100,
+        cache.hits,
+        cache.misses,
+        results.reused,
+        WALK_FORWARD_CSV,
+    )
+    return 0
 
-        if signal == "sell" and position_qty > 0:
-            proceeds = position_qty * price
-            if proceeds < MIN_ORDER_KRW:
-                continue
-            fee = proceeds * FEE_RATE
-            net = proceeds - fee
-            pnl = net - position_cost
-            krw_balance += net
-
-            qty = position_qty
-            position_qty = 0.0
-            position_cost = 0.0
-
-            trades.append(
-                {
-                    "time": time_str,
-                    "signal": "sell",
-                    "price": f"{price:.4f}",
-                    "qty": f"{qty:.8f}",
-                    "fee": f"{fee:.2f}",
-                    "balance": f"{krw_balance:.2f}",
-                    "position": f"{position_qty:.8f}",
-                    "pnl": f"{pnl:.2f}",
-                }
+
+ENGINES = {
+    "stream": simulate_stream,
+    "vectorized": simulate_vectorized,
+    "replay": simulate_replay,
+}
+
+
+def run_backtest(
+    ticker,
+    days,
+    interval,
+    engine=DEFAULT_ENGINE,
+    use_cache=True,
+    columnar=False,
+    equity=False,
+    strategies=None,
+    intervals=None,
+    intrabar=False,
+    use_results=True,
+    stop_loss_pct=None,
+    take_profit_pct=None,
+):
+    fetch_interval, fetch_days = interval, days
+    if intervals or intrabar:
+        # One minute1 fetch for every interval, plus one bucket of the
+        # coarsest so its first full candle is still inside the range.
+        coarsest = max(timeframe_minutes(i) for i in intervals or [interval])
+        fetch_interval, fetch_days = BASE_INTERVAL, days + coarsest / 1440
+    store = CandleStore(CANDLE_CACHE_FILE) if use_cache else None
+    try:
+        df = fetch_ohlcv_days(ticker, fetch_interval, fetch_days, store=store)
+    except Exception as exc:
+        logger.error("Failed to fetch OHLCV: {}", exc)
+        return 1
+    finally:
+        if store is not None:
+            store.close()
+
+    if df is None or df.empty:
+        logger.error("No OHLCV data returned.")
+        return 1
+
+    exits = exit_levels(engine, intrabar, stop_loss_pct, take_profit_pct)
+    results = ResultStore() if use_results else None
+    try:
+        config = backtest_config(ticker, days, interval, engine, intrabar, df, exits)
+        cache = RunCache(results, config)
+        sub_df = df if intrabar else None
+        outputs = {"columnar": columnar, "equity": equity, "exits": exits}
+        if intervals:
+            return run_timeframes(
+                df, intervals, engine, strategies, sub_df, cache, **outputs
             )
+        if intrabar:
+            df = Timeframes(df).get(interval)
+        if strategies:
+            return run_strategies(
+                df, strategies, engine, sub_df=sub_df, cache=cache, **outputs
+            )
+
+        trades, _, key = cache.run(
+            {},
+            lambda: simulate_frame(df, engine, sub_df=sub_df, **exits),
+            TRADES_CSV,
+            write_trades_csv,
+            need_trades=columnar or equity,
+        )
+    finally:
+        if results is not None:
+            results.close()
+    log_reuse(key)
 
-    write_trades_csv(trades, TRADES_CSV)
+    write_outputs(df, trades, columnar, equity)
     logger.info("Backtest finished. Trades written to {}", TRADES_CSV)
     return 0
 
 
+def write_outputs(df, trades, columnar=False, equity=False, label=None):
+    # With several strategies or intervals, label keeps each run's column
+    # directories apart, like its trades CSV.
+    suffix = f"_{label}" if label else ""
+    if columnar:
+        directory = TRADE_COLUMNS_DIR + suffix
+        write_trade_columns(trades, directory)
+        logger.info("Columnar trades written to {}", directory)
+    if equity:
+        directory = EQUITY_COLUMNS_DIR + suffix
+        write_columns(equity_curve(df, trades), directory)
+        logger.info("Equity curve written to {}", directory)
+
+
+def strategy_slug(strategy, interval=None):
+    label = strategy.label.replace("|", "_or_")
+    if interval:
+        label = f"{interval}_{label}"
+    return re.sub(r"[^A-Za-z0-9_.=+-]+", "_", label).strip("_")
+
+
+def exit_levels(engine, intrabar, stop_loss_pct=None, take_profit_pct=None):
+    # Unset levels: bar-close engines trade without exits, while --intrabar
+    # and the replay engine use the configured live levels. 0 turns one off.
+    live = intrabar or engine == "replay"
+    if stop_loss_pct is None:
+        stop_loss_pct = STOP_LOSS_PCT if live else None
+    if take_profit_pct is None:
+        take_profit_pct = TAKE_PROFIT_PCT if live else None
+    return {
+        "stop_loss_pct": stop_loss_pct or None,
+        "take_profit_pct": take_profit_pct or None,
+    }
+
+
+def backtest_config(ticker, days, interval, engine, intrabar, df, exits):
+    # Everything that shapes a backtest's trades, for the result store key.
+    return {
+        "ticker": ticker,
+        "days": days,
+        "interval": interval,
+        "engine": engine,
+        "intrabar": bool(intrabar),
+        "period": RSI_PERIOD,
+        "buy_threshold": BUY_THRESHOLD,
+        "sell_threshold": SELL_THRESHOLD,
+        "trade_amount": TRADE_AMOUNT_KRW,
+        "initial_krw": PAPER_INITIAL_KRW,
+        "fee_rate": FEE_RATE,
+        "min_order_krw": MIN_ORDER_KRW,
+        "stop_loss_pct": exits["stop_loss_pct"],
+        "take_profit_pct": exits["take_profit_pct"],
+        "max_invest_ratio": MAX_INVEST_RATIO,
+        "daily_loss_limit_pct": DAILY_LOSS_LIMIT_PCT,
+        "candles": len(df),
+        "data": data_fingerprint(df),
+    }
+
+
+def grid_config(ticker, days, interval, df):
+    # Shared config of vectorized grid runs (sweep, walk-forward); each
+    # grid point's params override the RSI and exit fields.
+    exits = exit_levels("vectorized", False)
+    return backtest_config(ticker, days, interval, "vectorized", False, df, exits)
+
+
+def log_reuse(key):
+    if key is not None:
+        logger.info("Reused stored result {}", key[:12])
+
+
+def simulate_frame(
+    df,
+    engine=DEFAULT_ENGINE,
+    strategy=None,
+    graph=None,
+    sub_df=None,
+    stop_loss_pct=None,
+    take_profit_pct=None,
+):
+    # sub_df (minute1 candles) switches to intrabar stop-loss/take-profit
+    # fills on top of bar-close signals (parse_args rejects it with the
+    # replay engine). Levels come from exit_levels.
+    exits = {"stop_loss_pct": stop_loss_pct, "take_profit_pct": take_profit_pct}
+    signals = None
+    if strategy is not None and (sub_df is not None or engine != "stream"):
+        signals = strategy.signals(graph or IndicatorGraph(df["close"]))
+    if sub_df is not None:
+        return simulate_intrabar(df, sub_df, signals=signals, **exits)
+    if strategy is None:
+        return ENGINES[engine](df, RSI_PERIOD, **exits)
+    if engine == "stream":
+        return simulate_stream(df, strategy=strategy, **exits)
+    return ENGINES[engine](df, signals=signals, **exits)
+
+
+def run_timeframes(
+    base,
+    intervals,
+    engine=DEFAULT_ENGINE,
+    strategies=None,
+    sub_df=None,
+    cache=None,
+    columnar=False,
+    equity=False,
+    exits=None,
+):
+    # Each interval is resampled from the minute1 frame once; with several
+    # intervals the trades go to trades_<interval>.csv.
+    cache = cache or RunCache()
+    exits = exits or exit_levels(engine, sub_df is not None)
+    timeframes = Timeframes(base)
+    for interval in intervals:
+        df = timeframes.get(interval)
+        if df.empty:
+            logger.warning("Not enough minute1 candles for {}", interval)
+            continue
+        label = interval if len(intervals) > 1 else None
+        frame_cache = cache.child(interval=interval)
+        if strategies:
+            run_strategies(
+                df,
+                strategies,
+                engine,
+                label,
+                sub_df,
+                frame_cache,
+                columnar=columnar,
+                equity=equity,
+                exits=exits,
+            )
+            continue
+        path = INTERVAL_TRADES_CSV.format(interval=interval) if label else TRADES_CSV
+        trades, metrics, key = frame_cache.run(
+            {},
+            lambda: simulate_frame(df, engine, sub_df=sub_df, **exits),
+            path,
+            write_trades_csv,
+            need_trades=columnar or equity,
+        )
+        log_reuse(key)
+        write_outputs(df, trades, columnar, equity, label)
+        logger.info(
+            "{}: {} candles, {} closed trades, return {:.2f}% -> {}",
+            interval,
+            len(df),
+            metrics["trade_count"],
+            metrics["cumulative_return"] * 100,
+            path,
+        )
+    return 0
+
+
+def run_strategies(
+    df,
+    strategies,
+    engine=DEFAULT_ENGINE,
+    interval=None,
+    sub_df=None,
+    cache=None,
+    columnar=False,
+    equity=False,
+    exits=None,
+):
+    # All strategies read one indicator graph, so shared EMAs, diffs and
+    # rolling windows are computed once per run.
+    cache = cache or RunCache()
+    graph = IndicatorGraph(df["close"])
+    exits = exits or exit_levels(engine, sub_df is not None)
+    for strategy in strategies:
+        if len(strategies) > 1:
+            label = strategy_slug(strategy, interval)
+            path = STRATEGY_TRADES_CSV.format(strategy=label)
+        elif interval:
+            label = interval
+            path = INTERVAL_TRADES_CSV.format(interval=interval)
+        else:
+            label = None
+            path = TRADES_CSV
+        trades, metrics, key = cache.run(
+            {"strategy": strategy.spec},
+            lambda: simulate_frame(df, engine, strategy, graph, sub_df, **exits),
+            path,
+            write_trades_csv,
+            need_trades=columnar or equity,
+        )
+        log_reuse(key)
+        write_outputs(df, trades, columnar, equity, label)
+        logger.info(
+            "{}: {} closed trades, return {:.2f}% -> {}",
+            strategy.label,
+            metrics["trade_count"],
+            metrics["cumulative_return"] * 100,
+            path,
+        )
+    return 0
+
+
+RSI_FLAGS = {
+    "periods": RSI_PERIOD,
+    "buy": BUY_THRESHOLD,
+    "sell": SELL_THRESHOLD,
+    "trade_amount": TRADE_AMOUNT_KRW,
+}
+
+
+def parse_intervals(text):
+    intervals = [item.strip() for item in text.split(",") if item.strip()]
+    for interval in intervals:
+        timeframe_minutes(interval)
+    return intervals
+
+
 def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("--ticker", default="KRW-BTC")
     parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
     parser.add_argument("--interval", default=DEFAULT_INTERVAL)
-    return parser.parse_args()
+    parser.add_argument("--intervals", type=parse_intervals, default=None)
+    parser.add_argument("--engine", choices=sorted(ENGINES), default=DEFAULT_ENGINE)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--tickers", default=None)
+    parser.add_argument("--all-krw", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--columnar", action="store_true")
+    parser.add_argument("--equity", action="store_true")
+    parser.add_argument("--intrabar", action="store_true")
+    parser.add_argument("--no-results", action="store_true")
+    parser.add_argument("--strategy", action="append", type=parse_strategy, default=None)
+    parser.add_argument("--walk-forward", action="store_true")
+    parser.add_argument("--train-days", type=float, default=DEFAULT_TRAIN_DAYS)
+    parser.add_argument("--test-days", type=float, default=DEFAULT_TEST_DAYS)
+    parser.add_argument("--step-days", type=float, default=None)
+    # RSI grids for --walk-forward, single values with --tickers/--all-krw;
+    # plain runs use the configured RSI settings.
+    parser.add_argument("--periods", type=lambda t: parse_range(t, int), default=None)
+    parser.add_argument("--buy", type=parse_range, default=None)
+    parser.add_argument("--sell", type=parse_range, default=None)
+    parser.add_argument("--trade-amount", type=parse_range, default=None)
+    # Grids for --walk-forward; a single value for a plain run.
+    parser.add_argument("--stop-loss", type=parse_range, default=None)
+    parser.add_argument("--take-profit", type=parse_range, default=None)
+    args = parser.parse_args()
+    given = [flag for flag in RSI_FLAGS if getattr(args, flag) is not None]
+    for flag, default in RSI_FLAGS.items():
+        if getattr(args, flag) is None:
+            setattr(args, flag, [default])
+    if args.walk_forward:
+        return args
+    if args.tickers or args.all_krw:
+        check_portfolio_args(parser, args)
+        return args
+    if given:
+        names = "/".join("--" + flag.replace("_", "-") for flag in given)
+        parser.error(f"{names} need --walk-forward or --tickers/--all-krw")
+    if args.intrabar and args.engine == "replay":
+        parser.error("--engine replay is not supported with --intrabar")
+    for flag in ("stop_loss", "take_profit"):
+        values = getattr(args, flag)
+        if values is not None and len(values) != 1:
+            name = flag.replace("_", "-")
+            parser.error(f"--{name} takes a single value without --walk-forward")
+    return args
+
+
+def single_value(values):
+    return values[0] if values else None
+
+
+def check_portfolio_args(parser, args):
+    # The portfolio simulation takes one RSI setting and trades at bar
+    # closes; refuse options it would otherwise ignore.
+    if args.engine == "replay":
+        parser.error("--engine replay is not supported with --tickers/--all-krw")
+    for flag in ("strategy", "intervals", "intrabar", "columnar", "equity"):
+        if getattr(args, flag):
+            parser.error(f"--{flag} is not supported with --tickers/--all-krw")
+    if any(args.stop_loss or []) or any(args.take_profit or []):
+        parser.error("--stop-loss/--take-profit are not supported with --tickers/--all-krw")
+    for flag in ("periods", "buy", "sell", "trade_amount"):
+        if len(getattr(args, flag)) != 1:
+            name = flag.replace("_", "-")
+            parser.error(f"--{name} takes a single value with --tickers/--all-krw")
 
 
 if __name__ == "__main__":
     args = parse_args()
-    sys.exit(run_backtest(args.ticker, args.days, args.interval))
+    if args.walk_forward:
+        sys.exit(run_walk_forward(args))
+    if args.tickers or args.all_krw:
+        tickers = resolve_tickers(args.tickers, args.all_krw)
+        sys.exit(
+            run_portfolio_backtest(
+                tickers,
+                args.days,
+                args.interval,
+                use_cache=not args.no_cache,
+                workers=args.workers,
+                period=args.periods[0],
+                buy_threshold=args.buy[0],
+                sell_threshold=args.sell[0],
+                trade_amount=args.trade_amount[0],
+            )
+        )
+    sys.exit(
+        run_backtest(
+            args.ticker,
+            args.days,
+            args.interval,
+            engine=args.engine,
+            use_cache=not args.no_cache,
+            columnar=args.columnar,
+            equity=args.equity,
+            strategies=args.strategy,
+            intervals=args.intervals,
+            intrabar=args.intrabar,
+            use_results=not args.no_results,
+            stop_loss_pct=single_value(args.stop_loss),
+            take_profit_pct=single_value(args.take_profit),
+        )
+    )
@@ -0,0 +1,249 @@
+from datetime import datetime
+import os
+
+from loguru import logger
+import numpy as np
+
+from instrumentation import metrics
+from paper_broker import DEFAULT_INITIAL_KRW
+from trading_rules import LIVE_RULES
+
+DEFAULT_BATCH_STATE_PATH = "paper_accounts.npz"
+STATE_COLUMNS = ["krw_balance", "coin_amount", "avg_buy_price", "day_start_equity"]
+
+# Per-account outcome codes; index into the name tuples.
+RESULT_NAMES = (
+    "none",
+    "filled",
+    "invalid_amount",
+    "insufficient_krw",
+    "invalid_price",
+    "no_position",
+    "skipped",
+)
+RESULT_CODES = {name: code for code, name in enumerate(RESULT_NAMES)}
+EVENT_NAMES = (
+    "none",
+    "hold",
+    "buy",
+    "sell",
+    "stop_loss",
+    "take_profit",
+    "daily_loss_limit",
+    "max_invest_ratio",
+)
+EVENT_CODES = {name: code for code, name in enumerate(EVENT_NAMES)}
+
+
+def _select(mask, count):
+    if mask is None:
+        return np.ones(count, dtype=bool)
+    mask = np.asarray(mask)
+    if mask.dtype != bool:
+        # Account indices; an empty list would otherwise be a float array.
+        selected = np.zeros(count, dtype=bool)
+        selected[mask.astype(np.intp)] = True
+        return selected
+    return mask
+
+
+def _per_account(value, count):
+    return np.broadcast_to(np.asarray(value, dtype=np.float64), (count,))
+
+
+class BatchPaperBroker:
+    # N paper accounts as NumPy columns. buy/sell_all/refresh_day take an
+    # optional mask (bool array or account indices) plus a scalar or
+    # per-account price, and update every selected account in one call with
+    # the same float operations, in the same order, as PaperBroker, so each
+    # account's state is bit-identical to a PaperBroker fed the same calls.
+    # State is one npz snapshot instead of a JSON file and journal per
+    # account.
+    def __init__(self, count, initial_krw=DEFAULT_INITIAL_KRW, state_path=None):
+        self.count = int(count)
+        self.default_krw = float(initial_krw)
+        self.state_path = state_path
+        self._reset_to_defaults()
+        if state_path is not None and os.path.exists(state_path):
+            try:
+                self.load(state_path)
+            except Exception as exc:
+                logger.warning("Failed to load paper accounts; resetting: {}", exc)
+                self._reset_to_defaults()
+
+    def _reset_to_defaults(self):
+        self.krw_balance = np.full(self.count, self.default_krw)
+        self.coin_amount = np.zeros(self.count)
+        self.avg_buy_price = np.zeros(self.count)
+        self.last_day = np.full(self.count, np.datetime64(datetime.now().date(), "D"))
+        self.day_start_equity = np.full(self.count, self.default_krw)
+
+    def load(self, path):
+        with np.load(path) as data:
+            columns = {name: data[name] for name in STATE_COLUMNS}
+            last_day = data["last_day"].astype("datetime64[D]")
+        if any(len(values) != self.count for values in columns.values()):
+            raise ValueError("Paper account snapshot has a different account count")
+        for name, values in columns.items():
+            setattr(self, name, values.astype(np.float64))
+        self.last_day = last_day
+        # Like PaperBroker._apply_state: no day means no daily loss state.
+        self.day_start_equity[np.isnat(self.last_day)] = 0.0
+
+    def save(self, path=None):
+        # Atomically replaced, like the PaperBroker snapshot.
+        path = path or self.state_path or DEFAULT_BATCH_STATE_PATH
+        tmp_path = path + ".tmp"
+        with metrics.timer("broker_save"):
+            try:
+                with open(tmp_path, "wb") as f:
+                    np.savez(f, last_day=self.last_day, **self.columns())
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except Exception as exc:
+                logger.warning("Failed to save paper accounts: {}", exc)
+
+    def columns(self):
+        return {name: getattr(self, name) for name in STATE_COLUMNS}
+
+    def get_status(self, account):
+        return {
+            "krw_balance": float(self.krw_balance[account]),
+            "coin_amount": float(self.coin_amount[account]),
+            "avg_buy_price": float(self.avg_buy_price[account]),
+        }
+
+    def get_total_equity(self, current_price):
+        return self.krw_balance + self.coin_amount * _per_account(current_price, self.count)
+
+    def get_daily_loss_pct(self, current_price):
+        equity = self.get_total_equity(current_price)
+        start = self.day_start_equity
+        active = start > 0
+        loss = np.zeros(self.count)
+        loss[active] = (equity[active] - start[active]) / start[active]
+        return loss
+
+    def refresh_day(self, current_price, now=None, mask=None):
+        if now is None:
+            now = datetime.now()
+        today = np.datetime64(now.date(), "D")
+        changed = _select(mask, self.count) & (self.last_day != today)
+        if changed.any():
+            price = _per_account(current_price, self.count)
+            self.day_start_equity[changed] = (
+                self.krw_balance[changed] + self.coin_amount[changed] * price[changed]
+            )
+            self.last_day[changed] = today
+        return changed
+
+    def buy(self, price, amount_krw, mask=None):
+        # (result codes, qty, krw spent); unselected accounts get "none".
+        selected = _select(mask, self.count)
+        price = _per_account(price, self.count)
+        amount = _per_account(amount_krw, self.count)
+        results = np.zeros(self.count, dtype=np.int8)
+        invalid = selected & ((price <= 0) | (amount <= 0))
+        results[invalid] = RESULT_CODES["invalid_amount"]
+        spend = np.where(selected & ~invalid, np.minimum(amount, self.krw_balance), 0.0)
+        broke = selected & ~invalid & (spend <= 0)
+        results[broke] = RESULT_CODES["insufficient_krw"]
+        filled = selected & ~invalid & ~broke
+        results[filled] = RESULT_CODES["filled"]
+
+        qty = np.zeros(self.count)
+        spend = np.where(filled, spend, 0.0)
+        if filled.any():
+            fill_spend = spend[filled]
+            fill_qty = fill_spend / price[filled]
+            qty[filled] = fill_qty
+            coin = self.coin_amount[filled]
+            total_cost = self.avg_buy_price[filled] * coin + fill_spend
+            total_qty = coin + fill_qty
+            self.avg_buy_price[filled] = total_cost / total_qty
+            self.coin_amount[filled] = total_qty
+            self.krw_balance[filled] -= fill_spend
+        return results, qty, spend
+
+    def sell_all(self, price, mask=None):
+        # (result codes, qty, krw received); unselected accounts get "none".
+        selected = _select(mask, self.count)
+        price = _per_account(price, self.count)
+        results = np.zeros(self.count, dtype=np.int8)
+        invalid = selected & (price <= 0)
+        results[invalid] = RESULT_CODES["invalid_price"]
+        empty = selected & ~invalid & (self.coin_amount <= 0)
+        results[empty] = RESULT_CODES["no_position"]
+        filled = selected & ~invalid & ~empty
+        results[filled] = RESULT_CODES["filled"]
+
+        qty = np.where(filled, self.coin_amount, 0.0)
+        proceeds = np.zeros(self.count)
+        if filled.any():
+            proceeds[filled] = qty[filled] * price[filled]
+            self.krw_balance[filled] += proceeds[filled]
+            self.coin_amount[filled] = 0.0
+            self.avg_buy_price[filled] = 0.0
+        return results, qty, proceeds
+
+    def apply_rules(self, signals, price, rules=LIVE_RULES, mask=None):
+        # trading_rules.apply_rules for every selected account at once.
+        # signals holds 1/-1/0 per account; rules is a RiskRules or any
+        # object with its fields, which may be per-account arrays (one risk
+        # setting per strategy variant).
+        # Returns (event codes, result codes, qty). Callers run refresh_day
+        # first, as with PaperBroker.
+        selected = _select(mask, self.count)
+        signals = np.broadcast_to(np.asarray(signals), (self.count,))
+        price = _per_account(price, self.count)
+        events = np.zeros(self.count, dtype=np.int8)
+        results = np.zeros(self.count, dtype=np.int8)
+        qty = np.zeros(self.count)
+
+        limit = _per_account(rules.daily_loss_limit_pct, self.count)
+        blocked = selected & (self.get_daily_loss_pct(price) <= -limit)
+        events[blocked] = EVENT_CODES["daily_loss_limit"]
+        open_ = selected & ~blocked
+
+        held = open_ & (self.coin_amount > 0) & (self.avg_buy_price > 0)
+        change_pct = np.zeros(self.count)
+        change_pct[held] = (price[held] - self.avg_buy_price[held]) / self.avg_buy_price[held]
+        stop = _per_account(rules.stop_loss_pct, self.count)
+        take = _per_account(rules.take_profit_pct, self.count)
+        stop_hit = held & (stop != 0) & (change_pct <= -stop)
+        take_hit = held & ~stop_hit & (take != 0) & (change_pct >= take)
+        events[stop_hit] = EVENT_CODES["stop_loss"]
+        events[take_hit] = EVENT_CODES["take_profit"]
+        rest = open_ & ~stop_hit & ~take_hit
+
+        wants_buy = rest & (signals == 1)
+        trade_amount = _per_account(rules.trade_amount, self.count)
+        ratio = _per_account(rules.max_invest_ratio, self.count)
+        coin_value = self.coin_amount * price
+        max_coin_value = self.get_total_equity(price) * ratio
+        spend = np.minimum(trade_amount, self.krw_balance)
+        capped = wants_buy & (
+            (coin_value >= max_coin_value) | (coin_value + spend > max_coin_value)
+        )
+        events[capped] = EVENT_CODES["max_invest_ratio"]
+        results[capped] = RESULT_CODES["skipped"]
+        buying = wants_buy & ~capped
+        events[buying] = EVENT_CODES["buy"]
+        selling = rest & (signals == -1)
+        events[selling] = EVENT_CODES["sell"]
+        holding = rest & (signals != 1) & (signals != -1)
+        events[holding] = EVENT_CODES["hold"]
+        results[holding] = RESULT_CODES["skipped"]
+
+        # The masks are disjoint, so the fills can run after all decisions.
+        exits = stop_hit | take_hit | selling
+        if exits.any():
+            sold, sold_qty, _ = self.sell_all(price, exits)
+            results[exits] = sold[exits]
+            qty[exits] = sold_qty[exits]
+        if buying.any():
+            bought, bought_qty, _ = self.buy(price, trade_amount, buying)
+            results[buying] = bought[buying]
+            qty[buying] = bought_qty[buying]
+        return events, results, qty
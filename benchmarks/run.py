@@ -0,0 +1,272 @@
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from loguru import logger
+import numpy as np
+
+import backtest
+from batch_broker import BatchPaperBroker
+from config import RSI_PERIOD, TRADE_AMOUNT_KRW
+from paper_broker import PaperBroker
+from report import compute_metrics, load_trades
+from strategy import calculate_rsi, get_signal
+
+from benchmarks.synthetic import REGIMES, synthetic_ohlcv
+
+HISTORY_FILE = os.path.join(os.path.dirname(__file__), "history.json")
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_REPEAT = 3
+DEFAULT_BROKER_OPS = 2_000
+DEFAULT_BATCH_ACCOUNTS = 1_000
+QUIET_MODULES = ["backtest", "market_data", "paper_broker", "batch_broker"]
+
+
+def parse_sizes(text):
+    return [int(float(part)) for part in text.split(",") if part]
+
+
+def best_time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def result(name, bars, seconds, units):
+    return {
+        "name": name,
+        "bars": bars,
+        "seconds": seconds,
+        "units": units,
+        "per_sec": units / seconds if seconds > 0 else None,
+    }
+
+
+def bench_strategy(df, repeat):
+    bars = len(df)
+    close = df["close"]
+    return [
+        result("calculate_rsi", bars, best_time(lambda: calculate_rsi(close, RSI_PERIOD), repeat), bars),
+        result("get_signal", bars, best_time(lambda: get_signal(df, RSI_PERIOD), repeat), bars),
+    ]
+
+
+def bench_backtest(df, engines, repeat, directory):
+    # run_backtest end to end with the fetch stubbed out and the result
+    # store off; the last run's trades.csv feeds the report benchmark.
+    bars = len(df)
+    trades_csv = os.path.join(directory, "trades.csv")
+    results = []
+    fetch, trades_path = backtest.fetch_ohlcv_days, backtest.TRADES_CSV
+    backtest.fetch_ohlcv_days = lambda *args, **kwargs: df
+    backtest.TRADES_CSV = trades_csv
+    try:
+        for engine in engines:
+            seconds = best_time(
+                lambda: backtest.run_backtest(
+                    "KRW-BTC",
+                    0,
+                    "minute5",
+                    engine=engine,
+                    use_cache=False,
+                    use_results=False,
+                ),
+                repeat,
+            )
+            results.append(result(f"run_backtest[{engine}]", bars, seconds, bars))
+    finally:
+        backtest.fetch_ohlcv_days, backtest.TRADES_CSV = fetch, trades_path
+
+    rows = len(load_trades(trades_csv))
+    seconds = best_time(lambda: compute_metrics(load_trades(trades_csv)), repeat)
+    results.append(result("load_trades+compute_metrics", bars, seconds, max(rows, 1)))
+    return results
+
+
+def bench_broker(df, ops, directory):
+    # Journaled fills with the default snapshot/fsync settings.
+    prices = df["close"].to_numpy()[:ops].tolist()
+    broker = PaperBroker(state_path=os.path.join(directory, "paper_account.json"))
+    buy_seconds = sell_seconds = 0.0
+    for price in prices:
+        start = time.perf_counter()
+        broker.buy(price=price, amount_krw=TRADE_AMOUNT_KRW)
+        middle = time.perf_counter()
+        broker.sell_all(price=price)
+        sell_seconds += time.perf_counter() - middle
+        buy_seconds += middle - start
+
+    saves = max(1, len(prices) // 10)
+    start = time.perf_counter()
+    for _ in range(saves):
+        broker.save()
+    save_seconds = time.perf_counter() - start
+    broker.close()
+
+    bars = len(df)
+    return [
+        result("PaperBroker.buy", bars, buy_seconds, len(prices)),
+        result("PaperBroker.sell_all", bars, sell_seconds, len(prices)),
+        result("PaperBroker.save", bars, save_seconds, saves),
+    ]
+
+
+def bench_batch_broker(df, ops, accounts, directory):
+    # One RSI threshold variant per account, stepped through the live rules
+    # together; units are account-bars.
+    closes = df["close"].to_numpy()[:ops]
+    rsi = calculate_rsi(df["close"].iloc[:ops], RSI_PERIOD).to_numpy()
+    buy = np.linspace(20, 40, accounts)
+    sell = np.linspace(80, 60, accounts)
+    days = df.index[:ops]
+    broker = BatchPaperBroker(accounts)
+    start = time.perf_counter()
+    for price, value, ts in zip(closes.tolist(), rsi.tolist(), days):
+        broker.refresh_day(price, now=ts)
+        signals = (value <= buy).astype(np.int8) - (value >= sell).astype(np.int8)
+        broker.apply_rules(signals, price)
+    step_seconds = time.perf_counter() - start
+
+    saves = max(1, ops // 100)
+    path = os.path.join(directory, "paper_accounts.npz")
+    start = time.perf_counter()
+    for _ in range(saves):
+        broker.save(path)
+    save_seconds = time.perf_counter() - start
+
+    bars = len(df)
+    return [
+        result("BatchPaperBroker.apply_rules", bars, step_seconds, ops * accounts),
+        result("BatchPaperBroker.save", bars, save_seconds, saves),
+    ]
+
+
+def run_suite(sizes, interval, regime, seed, repeat, engines, broker_ops, batch_accounts):
+    results = []
+    for bars in sizes:
+        df = synthetic_ohlcv(bars, interval=interval, regime=regime, seed=seed)
+        with tempfile.TemporaryDirectory() as directory:
+            results.extend(bench_strategy(df, repeat))
+            results.extend(bench_backtest(df, engines, repeat, directory))
+            results.extend(bench_broker(df, min(broker_ops, bars), directory))
+            results.extend(
+                bench_batch_broker(df, min(broker_ops, bars), batch_accounts, directory)
+            )
+    return results
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_history(history, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def previous_results(history, run):
+    # Latest earlier run with the same synthetic data settings.
+    for entry in reversed(history):
+        if entry["params"] == run["params"]:
+            return {(r["name"], r["bars"]): r for r in entry["results"]}
+    return {}
+
+
+def print_results(run, previous):
+    print(f"{'benchmark':<30} {'bars':>9} {'seconds':>10} {'per_sec':>12} {'vs prev':>8}")
+    for r in run["results"]:
+        before = previous.get((r["name"], r["bars"]))
+        change = ""
+        if before and before["seconds"] > 0:
+            change = f"{r['seconds'] / before['seconds']:.2f}x"
+        per_sec = f"{r['per_sec']:.0f}" if r["per_sec"] else "-"
+        print(f"{r['name']:<30} {r['bars']:>9} {r['seconds']:>10.4f} {per_sec:>12} {change:>8}")
+
+
+def main(args):
+    for module in QUIET_MODULES:
+        logger.disable(module)
+
+    run = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": {
+            "interval": args.interval,
+            "regime": args.regime,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "broker_ops": args.broker_ops,
+            "batch_accounts": args.batch_accounts,
+        },
+    }
+    run["results"] = run_suite(
+        args.sizes,
+        args.interval,
+        args.regime,
+        args.seed,
+        args.repeat,
+        args.engines,
+        args.broker_ops,
+        args.batch_accounts,
+    )
+
+    history = load_history(args.history)
+    print_results(run, previous_results(history, run))
+    if not args.no_save:
+        history.append(run)
+        save_history(history, args.history)
+        print(f"Results appended to {args.history}")
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=parse_sizes, default=DEFAULT_SIZES)
+    parser.add_argument("--interval", default="minute5")
+    parser.add_argument("--regime", choices=sorted(REGIMES), default="normal")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument(
+        "--engines",
+        type=lambda text: text.split(","),
+        default=sorted(backtest.ENGINES),
+    )
+    parser.add_argument("--broker-ops", type=int, default=DEFAULT_BROKER_OPS)
+    parser.add_argument("--batch-accounts", type=int, default=DEFAULT_BATCH_ACCOUNTS)
+    parser.add_argument("--history", default=HISTORY_FILE)
+    parser.add_argument("--no-save", action="store_true")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
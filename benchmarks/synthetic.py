@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from market_data import interval_to_minutes
+
+DEFAULT_START = "2024-01-01 09:00:00"
+DEFAULT_PRICE = 50_000_000.0
+# Per-bar drift and log-return volatility of each regime.
+REGIMES = {
+    "calm": (0.0, 0.0008),
+    "normal": (0.0, 0.002),
+    "volatile": (0.0, 0.006),
+    "trend": (0.0002, 0.002),
+}
+
+
+def synthetic_ohlcv(
+    bars,
+    interval="minute5",
+    regime="normal",
+    seed=0,
+    start=DEFAULT_START,
+    start_price=DEFAULT_PRICE,
+):
+    # Same bars/interval/regime/seed always gives the same frame, shaped like
+    # pyupbit.get_ohlcv output (naive KST index).
+    drift, volatility = REGIMES[regime]
+    rng = np.random.default_rng(seed)
+    returns = drift + volatility * rng.standard_normal(bars)
+    close = start_price * np.exp(np.cumsum(returns))
+    open_ = np.empty(bars)
+    open_[0] = start_price
+    open_[1:] = close[:-1]
+    wick = np.abs(rng.standard_normal((2, bars))) * volatility / 2
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = rng.lognormal(0.0, 1.0, bars)
+
+    index = pd.date_range(start, periods=bars, freq=f"{interval_to_minutes(interval)}min")
+    return pd.DataFrame(
+        {
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume,
+            "value": close * volume,
+        },
+        index=index,
+    )
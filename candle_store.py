@@ -0,0 +1,111 @@
+import sqlite3
+
+import pandas as pd
+
+COLUMNS = ["open", "high", "low", "close", "volume", "value"]
+
+
+def to_epoch(ts):
+    return int(pd.Timestamp(ts).value // 1_000_000_000)
+
+
+def from_epoch(seconds):
+    return pd.to_datetime(seconds, unit="s")
+
+
+class CandleStore:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS candles ("
+            "ticker TEXT NOT NULL, interval TEXT NOT NULL, ts INTEGER NOT NULL, "
+            "open REAL, high REAL, low REAL, close REAL, volume REAL, value REAL, "
+            "PRIMARY KEY (ticker, interval, ts)) WITHOUT ROWID"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS coverage ("
+            "ticker TEXT NOT NULL, interval TEXT NOT NULL, start_ts INTEGER NOT NULL, "
+            "PRIMARY KEY (ticker, interval))"
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def save(self, ticker, interval, df):
+        if df is None or df.empty:
+            return 0
+        frame = df.reindex(columns=COLUMNS)
+        epochs = frame.index.values.astype("datetime64[s]").astype("int64")
+        rows = zip(
+            [ticker] * len(frame),
+            [interval] * len(frame),
+            epochs.tolist(),
+            *(frame[col].astype(float).tolist() for col in COLUMNS),
+        )
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO candles "
+                "(ticker, interval, ts, open, high, low, close, volume, value) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(frame)
+
+    def _frame(self, rows):
+        if not rows:
+            return None
+        df = pd.DataFrame(rows, columns=["ts"] + COLUMNS)
+        df.index = from_epoch(df.pop("ts").to_numpy())
+        return df
+
+    def load(self, ticker, interval, start=None, end=None):
+        query = "SELECT ts, open, high, low, close, volume, value FROM candles "
+        query += "WHERE ticker = ? AND interval = ?"
+        params = [ticker, interval]
+        if start is not None:
+            query += " AND ts >= ?"
+            params.append(to_epoch(start))
+        if end is not None:
+            query += " AND ts <= ?"
+            params.append(to_epoch(end))
+        rows = self.conn.execute(query + " ORDER BY ts", params).fetchall()
+        return self._frame(rows)
+
+    def load_last(self, ticker, interval, count):
+        rows = self.conn.execute(
+            "SELECT ts, open, high, low, close, volume, value FROM candles "
+            "WHERE ticker = ? AND interval = ? ORDER BY ts DESC LIMIT ?",
+            (ticker, interval, int(count)),
+        ).fetchall()
+        return self._frame(rows[::-1])
+
+    def bounds(self, ticker, interval):
+        first, last = self.conn.execute(
+            "SELECT MIN(ts), MAX(ts) FROM candles WHERE ticker = ? AND interval = ?",
+            (ticker, interval),
+        ).fetchone()
+        if first is None:
+            return None
+        return from_epoch(first), from_epoch(last)
+
+    def coverage_start(self, ticker, interval):
+        row = self.conn.execute(
+            "SELECT start_ts FROM coverage WHERE ticker = ? AND interval = ?",
+            (ticker, interval),
+        ).fetchone()
+        if row is None:
+            return None
+        return from_epoch(row[0])
+
+    def mark_coverage(self, ticker, interval, start):
+        current = self.coverage_start(ticker, interval)
+        if current is not None and current <= pd.Timestamp(start):
+            return
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO coverage (ticker, interval, start_ts) "
+                "VALUES (?, ?, ?)",
+                (ticker, interval, to_epoch(start)),
+            )
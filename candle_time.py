@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta, timezone
+
+KST_OFFSET = timedelta(hours=9)
+
+
+def interval_to_minutes(interval):
+    if not interval.startswith("minute"):
+        raise ValueError("Only minute intervals are supported.")
+    return int(interval.replace("minute", ""))
+
+
+def to_datetime(ts):
+    if hasattr(ts, "to_pydatetime"):
+        return ts.to_pydatetime()
+    return ts
+
+
+def now_kst():
+    return datetime.now(timezone.utc).replace(tzinfo=None) + KST_OFFSET
+
+
+def floor_time(ts, minutes):
+    # Upbit aligns candles to UTC, while indexes are KST.
+    utc = to_datetime(ts) - KST_OFFSET
+    epoch_minutes = int(utc.replace(tzinfo=timezone.utc).timestamp() // 60)
+    floored = epoch_minutes - epoch_minutes % minutes
+    start = datetime.fromtimestamp(floored * 60, timezone.utc).replace(tzinfo=None)
+    return start + KST_OFFSET
@@ -38,12 +38,32 @@ RSI_PERIOD = _get_int("RSI_PERIOD", 14)
 TRADE_AMOUNT_KRW = _get_float("TRADE_AMOUNT_KRW", 10000.0)
 PAPER_INITIAL_KRW = _get_float("PAPER_INITIAL_KRW", 1000000.0)
 PAPER_STATE_FILE = _get_str("PAPER_STATE_FILE", "paper_account.json")
+PAPER_SNAPSHOT_EVERY = _get_int("PAPER_SNAPSHOT_EVERY", 100)
+PAPER_FSYNC_EVERY = _get_int("PAPER_FSYNC_EVERY", 1)
+STRATEGY_STATE_FILE = _get_str("STRATEGY_STATE_FILE", "strategy_state.json")
 LOG_FILE = _get_str("LOG_FILE", "trades.log")
+LOG_ENQUEUE = _get_int("LOG_ENQUEUE", 1)
+EVENT_LOG_ENABLED = _get_int("EVENT_LOG_ENABLED", 1)
+EVENT_LOG_FILE = _get_str("EVENT_LOG_FILE", "events.jsonl")
+EVENT_LOG_BATCH = _get_int("EVENT_LOG_BATCH", 64)
+EVENT_LOG_FLUSH_SEC = _get_float("EVENT_LOG_FLUSH_SEC", 60.0)
+CANDLE_CACHE_FILE = _get_str("CANDLE_CACHE_FILE", "candles.sqlite")
+INDICATOR_CACHE_MB = _get_int("INDICATOR_CACHE_MB", 256)
+RESULT_STORE_FILE = _get_str("RESULT_STORE_FILE", "results.sqlite")
+RESULT_STORE_MB = _get_int("RESULT_STORE_MB", 512)
+METRICS_ENABLED = _get_int("METRICS_ENABLED", 0)
+METRICS_TEXTFILE = _get_str("METRICS_TEXTFILE", "")
+METRICS_JSON_FILE = _get_str("METRICS_JSON_FILE", "metrics.jsonl")
+METRICS_PORT = _get_int("METRICS_PORT", 0)
 
 UPBIT_ACCESS_KEY = _get_str("UPBIT_ACCESS_KEY", "")
 UPBIT_SECRET_KEY = _get_str("UPBIT_SECRET_KEY", "")
+UPBIT_API_URL = _get_str("UPBIT_API_URL", "https://api.upbit.com")
+BALANCE_REFRESH_SEC = _get_float("BALANCE_REFRESH_SEC", 20.0)
+ORDER_ASYNC = _get_int("ORDER_ASYNC", 0)
 
 CANDLE_INTERVAL = "minute5"
+DAEMON_WAKE_DELAY_SEC = 0.3
 
 MAX_INVEST_RATIO = 0.30
 STOP_LOSS_PCT = 0.03
@@ -0,0 +1,218 @@
+import argparse
+import atexit
+from collections import Counter
+from datetime import datetime
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+from loguru import logger
+
+from config import EVENT_LOG_FILE
+
+
+def event_file(path, day):
+    # events.jsonl -> events-2026-01-31.jsonl; one file per day (a date or
+    # its ISO string).
+    root, ext = os.path.splitext(path)
+    return f"{root}-{day}{ext}"
+
+
+class EventLog:
+    # Structured events (signals, orders, exits, cycle timings) as JSON
+    # lines. emit() only appends a dict to a buffer; the lines are encoded
+    # and appended with one write per day file when a batch fills up, when
+    # a cycle ends after flush_sec, or at exit. Off until configure(); main
+    # turns it on unless EVENT_LOG_ENABLED=0. Safe to call from the order
+    # threads: the buffer swap and the writes are serialized by locks.
+    def __init__(self):
+        self.path = None
+        self.batch = 64
+        self.flush_sec = 60.0
+        self.buffer = []
+        self._last_flush = time.monotonic()
+        self._cycle_start = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def configure(self, enabled, path=EVENT_LOG_FILE, batch=64, flush_sec=60.0):
+        self.path = path if enabled and path else None
+        self.batch = max(int(batch), 1)
+        self.flush_sec = float(flush_sec)
+
+    def emit(self, event, **fields):
+        if self.path is None:
+            return
+        record = {"time": datetime.now().isoformat(timespec="milliseconds"), "event": event}
+        record.update(fields)
+        with self._lock:
+            self.buffer.append(record)
+            full = len(self.buffer) >= self.batch
+        if full:
+            self.flush()
+
+    def start_cycle(self):
+        if self.path is not None:
+            self._cycle_start = time.perf_counter()
+
+    def finish_cycle(self, stages=None, **fields):
+        # One "cycle" event with the cycle's wall time and, when metrics
+        # are enabled, its per-stage timings.
+        if self.path is None or self._cycle_start is None:
+            return
+        seconds = time.perf_counter() - self._cycle_start
+        self._cycle_start = None
+        self.emit("cycle", seconds=seconds, stages=stages, **fields)
+        if time.monotonic() - self._last_flush >= self.flush_sec:
+            self.flush()
+
+    def flush(self):
+        # The write lock keeps batches in order when two threads flush.
+        with self._write_lock:
+            with self._lock:
+                self._last_flush = time.monotonic()
+                records, self.buffer = self.buffer, []
+            self._write(records)
+
+    def _write(self, records):
+        if not records or self.path is None:
+            return
+        by_file = {}
+        for record in records:
+            path = event_file(self.path, record["time"][:10])
+            by_file.setdefault(path, []).append(json.dumps(record, default=str))
+        for path, lines in by_file.items():
+            try:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            except OSError as exc:
+                logger.warning("Failed to write events to {}: {}", path, exc)
+
+
+events = EventLog()
+atexit.register(events.flush)
+
+
+def parse_time(text):
+    # "2026-01-31" stays a date, so a date-only --until covers that day.
+    if len(text) == 10:
+        return datetime.strptime(text, "%Y-%m-%d").date()
+    return datetime.fromisoformat(text)
+
+
+def time_range(since, until):
+    # Dates widen to whole days: since from 00:00, until through 23:59:59.999.
+    if since is not None and not isinstance(since, datetime):
+        since = datetime.combine(since, datetime.min.time())
+    if until is not None and not isinstance(until, datetime):
+        until = datetime.combine(until, datetime.max.time())
+    return since, until
+
+
+def event_files(path=EVENT_LOG_FILE, since=None, until=None):
+    # Day files overlapping [since, until], oldest first, picked by name
+    # so the other days are never opened.
+    since, until = time_range(since, until)
+    root, ext = os.path.splitext(path)
+    files = []
+    for name in glob.glob(glob.escape(root) + "-*" + ext):
+        try:
+            day = datetime.strptime(name[len(root) + 1: len(name) - len(ext)], "%Y-%m-%d").date()
+        except ValueError:
+            continue
+        if since is not None and day < since.date():
+            continue
+        if until is not None and day > until.date():
+            continue
+        files.append((day, name))
+    return [name for _, name in sorted(files)]
+
+
+def read_events(path=EVENT_LOG_FILE, since=None, until=None, kinds=None):
+    # Records as dicts. Lines of other kinds are skipped by a substring
+    # check before any JSON decoding.
+    since, until = time_range(since, until)
+    start = since.isoformat(timespec="milliseconds") if since is not None else None
+    end = until.isoformat(timespec="milliseconds") if until is not None else None
+    needles = [f'"event": {json.dumps(kind)}' for kind in kinds] if kinds else None
+    records = []
+    for name in event_files(path, since, until):
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                if needles is not None and not any(n in line for n in needles):
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if start is not None and record["time"] < start:
+                    continue
+                if end is not None and record["time"] > end:
+                    continue
+                records.append(record)
+    return records
+
+
+def load_events(path=EVENT_LOG_FILE, since=None, until=None, kinds=None):
+    # DataFrame indexed by event time; nested fields such as the order
+    # result or stage timings become dotted columns (result.price, ...).
+    import pandas as pd
+
+    records = read_events(path, since, until, kinds)
+    if not records:
+        return pd.DataFrame()
+    frame = pd.json_normalize(records)
+    frame["time"] = pd.to_datetime(frame["time"], format="ISO8601")
+    return frame.set_index("time")
+
+
+def summarize(records):
+    kinds = Counter(record["event"] for record in records)
+    print(f"{len(records)} event(s)")
+    for kind, count in sorted(kinds.items()):
+        print(f"  {kind:<12} {count}")
+    signals = Counter(r.get("signal") for r in records if r["event"] == "signal")
+    if signals:
+        print("signals: " + ", ".join(f"{k}={v}" for k, v in sorted(signals.items())))
+    fills = Counter(
+        r["result"].get("side")
+        for r in records
+        if r["event"] == "order" and isinstance(r.get("result"), dict)
+        and r["result"].get("status") == "filled"
+    )
+    if fills:
+        print("fills: " + ", ".join(f"{k}={v}" for k, v in sorted(fills.items())))
+    cycles = [r["seconds"] for r in records if r["event"] == "cycle"]
+    if cycles:
+        cycles.sort()
+        print(
+            f"cycle seconds: mean {sum(cycles) / len(cycles):.3f} "
+            f"p95 {cycles[int(0.95 * (len(cycles) - 1))]:.3f} max {cycles[-1]:.3f}"
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default=EVENT_LOG_FILE)
+    parser.add_argument("--since", type=parse_time, default=None)
+    parser.add_argument("--until", type=parse_time, default=None)
+    parser.add_argument("--kind", action="append", default=None)
+    parser.add_argument("--csv", default=None)
+    return parser.parse_args()
+
+
+def main(args):
+    if args.csv:
+        frame = load_events(args.path, args.since, args.until, args.kind)
+        frame.to_csv(args.csv)
+        print(f"{len(frame)} event(s) written to {args.csv}")
+        return 0
+    summarize(read_events(args.path, args.since, args.until, args.kind))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
@@ -0,0 +1,60 @@
+from collections import OrderedDict
+import threading
+
+from config import INDICATOR_CACHE_MB
+
+
+class IndicatorCache:
+    # LRU of indicator arrays keyed by (ticker, interval, name, period,
+    # data range). Entries are evicted oldest-first once their nbytes exceed
+    # max_bytes; an entry larger than the cap is returned but not kept.
+    def __init__(self, max_bytes=INDICATOR_CACHE_MB * 1024 * 1024):
+        self.max_bytes = int(max_bytes)
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            values = self.entries.get(key)
+            if values is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return values
+
+    def put(self, key, values):
+        size = values.nbytes
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            if size > self.max_bytes:
+                return values
+            values.setflags(write=False)
+            self.entries[key] = values
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+        return values
+
+    def get_or_compute(self, key, compute):
+        values = self.get(key)
+        if values is None:
+            values = self.put(key, compute())
+        return values
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+
+def data_range(df):
+    if df is None or df.empty:
+        return None
+    return (df.index[0], df.index[-1], len(df))
@@ -0,0 +1,230 @@
+from collections import deque
+import math
+
+import pandas as pd
+
+from strategy import RollingMean, divide, gain_loss
+
+CLOSE = ("close",)
+
+
+class IndicatorGraph:
+    # Memoized indicator nodes over one close series. Every node is keyed by
+    # (name, *args), with sources given as node keys, so strategies sharing
+    # a graph compute each diff, EMA or rolling window once.
+    def __init__(self, close):
+        if not isinstance(close, pd.Series):
+            close = pd.Series(close, dtype=float)
+        self.nodes = {CLOSE: close}
+        self.computed = 0
+
+    def _node(self, key, compute):
+        value = self.nodes.get(key)
+        if value is None:
+            value = self.nodes[key] = compute()
+            self.computed += 1
+        return value
+
+    def get(self, key):
+        if key == CLOSE:
+            return self.nodes[CLOSE]
+        return getattr(self, key[0])(*key[1:])
+
+    def close(self):
+        return self.nodes[CLOSE]
+
+    def diff(self):
+        return self._node(("diff",), lambda: self.close().diff())
+
+    def gain(self):
+        return self._node(("gain",), lambda: self.diff().clip(lower=0))
+
+    def loss(self):
+        return self._node(("loss",), lambda: -self.diff().clip(upper=0))
+
+    def sma(self, window, source=CLOSE):
+        return self._node(
+            ("sma", window, source),
+            lambda: self.get(source).rolling(window=window, min_periods=window).mean(),
+        )
+
+    def std(self, window, ddof=0, source=CLOSE):
+        return self._node(
+            ("std", window, ddof, source),
+            lambda: self.get(source).rolling(window=window, min_periods=window).std(ddof=ddof),
+        )
+
+    def ema(self, span, source=CLOSE):
+        return self._node(
+            ("ema", span, source),
+            lambda: self.get(source).ewm(span=span, adjust=False, min_periods=span).mean(),
+        )
+
+    def rma(self, period, source=CLOSE):
+        # Wilder smoothing: an EMA with alpha = 1 / period.
+        return self._node(
+            ("rma", period, source),
+            lambda: self.get(source)
+            .ewm(alpha=1 / period, adjust=False, min_periods=period)
+            .mean(),
+        )
+
+    def rsi(self, period):
+        # Same arithmetic as strategy.calculate_rsi.
+        def compute():
+            rs = self.sma(period, ("gain",)) / self.sma(period, ("loss",))
+            return 100 - (100 / (1 + rs))
+
+        return self._node(("rsi", period), compute)
+
+    def rsi_wilder(self, period):
+        def compute():
+            rs = self.rma(period, ("gain",)) / self.rma(period, ("loss",))
+            return 100 - (100 / (1 + rs))
+
+        return self._node(("rsi_wilder", period), compute)
+
+    def ema_spread(self, fast, slow):
+        # The MACD line; EMA-cross strategies share it.
+        return self._node(
+            ("ema_spread", fast, slow), lambda: self.ema(fast) - self.ema(slow)
+        )
+
+    def macd_hist(self, fast, slow, signal):
+        spread = ("ema_spread", fast, slow)
+        return self._node(
+            ("macd_hist", fast, slow, signal),
+            lambda: self.get(spread) - self.ema(signal, spread),
+        )
+
+
+class StreamingEMA:
+    # pandas ewm(adjust=False, ignore_na=False).mean() one value at a time,
+    # bit-identical to the vectorized node.
+    def __init__(self, span=None, alpha=None, min_periods=0):
+        com = (span - 1) / 2.0 if span is not None else 1.0 / alpha - 1.0
+        alpha = 1.0 / (1.0 + com)
+        self.old_wt_factor = 1.0 - alpha
+        self.new_wt = alpha
+        self.min_periods = max(min_periods, 1)
+        self.weighted = math.nan
+        self.old_wt = 1.0
+        self.nobs = 0
+
+    def update(self, value):
+        is_observation = value == value
+        self.nobs += is_observation
+        if self.weighted == self.weighted:
+            self.old_wt *= self.old_wt_factor
+            if is_observation:
+                if self.weighted != value:
+                    self.weighted = (self.old_wt * self.weighted + self.new_wt * value) / (
+                        self.old_wt + self.new_wt
+                    )
+                self.old_wt = 1.0
+        elif is_observation:
+            self.weighted = value
+        return self.weighted if self.nobs >= self.min_periods else math.nan
+
+
+class StreamingStd:
+    # Mirrors pandas' roll_var (Welford with Kahan-compensated mean) and the
+    # zero-clamped square root of rolling().std().
+    def __init__(self, window, ddof=0):
+        self.window = window
+        self.ddof = ddof
+        self.values = deque()
+        self.nobs = 0
+        self.mean_x = 0.0
+        self.ssqdm_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.same_count = 0
+        self.prev_value = math.nan
+
+    def _add(self, val):
+        self.nobs += 1
+        if val == self.prev_value:
+            self.same_count += 1
+        else:
+            self.same_count = 1
+        self.prev_value = val
+        prev_mean = self.mean_x - self.compensation_add
+        y = val - self.compensation_add
+        t = y - self.mean_x
+        self.compensation_add = t + self.mean_x - y
+        self.mean_x = self.mean_x + t / self.nobs
+        self.ssqdm_x = self.ssqdm_x + (val - prev_mean) * (val - self.mean_x)
+
+    def _remove(self, val):
+        self.nobs -= 1
+        if not self.nobs:
+            self.mean_x = 0.0
+            self.ssqdm_x = 0.0
+            return
+        prev_mean = self.mean_x - self.compensation_remove
+        y = val - self.compensation_remove
+        t = y - self.mean_x
+        self.compensation_remove = t + self.mean_x - y
+        self.mean_x = self.mean_x - t / self.nobs
+        self.ssqdm_x = self.ssqdm_x - (val - prev_mean) * (val - self.mean_x)
+
+    def push(self, val):
+        if len(self.values) == self.window:
+            old = self.values.popleft()
+            if old == old:
+                self._remove(old)
+        self.values.append(val)
+        if val == val:
+            self._add(val)
+
+        nobs = self.nobs
+        if nobs < self.window or nobs <= self.ddof:
+            return math.nan
+        if nobs == 1 or self.same_count >= nobs:
+            return 0.0
+        variance = self.ssqdm_x / (nobs - self.ddof)
+        return math.sqrt(variance) if variance > 0 else 0.0
+
+
+class StreamingWilderRSI:
+    def __init__(self, period):
+        self.period = period
+        self.prev_close = None
+        self.value = None
+        self._avg_gain = StreamingEMA(alpha=1 / period, min_periods=period)
+        self._avg_loss = StreamingEMA(alpha=1 / period, min_periods=period)
+
+    def update(self, close):
+        close = float(close)
+        delta = math.nan if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        gain, loss = gain_loss(delta)
+        rs = divide(self._avg_gain.update(gain), self._avg_loss.update(loss))
+        rsi = 100 - divide(100, 1 + rs)
+        self.value = None if rsi != rsi else float(rsi)
+        return self.value
+
+
+class StreamingMACD:
+    def __init__(self, fast, slow, signal):
+        self._fast = StreamingEMA(span=fast, min_periods=fast)
+        self._slow = StreamingEMA(span=slow, min_periods=slow)
+        self._signal = StreamingEMA(span=signal, min_periods=signal)
+
+    def update(self, close):
+        # Returns (MACD line, histogram); NaN until warmed up.
+        close = float(close)
+        spread = self._fast.update(close) - self._slow.update(close)
+        return spread, spread - self._signal.update(spread)
+
+
+class StreamingBollinger:
+    def __init__(self, window, ddof=0):
+        self._mean = RollingMean(window)
+        self._std = StreamingStd(window, ddof)
+
+    def update(self, close):
+        # Returns (middle band, standard deviation).
+        close = float(close)
+        return self._mean.push(close), self._std.push(close)
@@ -0,0 +1,202 @@
+from contextlib import nullcontext
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+import time
+
+from loguru import logger
+
+METRIC_PREFIX = "minimi"
+_NOOP = nullcontext()
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    # Stage timings and labelled counters for the live loop. Disabled by
+    # default: timer() hands back a shared no-op context and incr() returns
+    # before touching any state.
+    def __init__(self):
+        self.enabled = False
+        self.textfile = None
+        self.json_path = None
+        self.stages = {}
+        self.counters = {}
+        self._run_stages = None
+        self._run_counters = None
+        self._run_fields = None
+        self._run_start = None
+        self._lock = threading.Lock()
+        self._server = None
+
+    def configure(self, enabled, textfile=None, json_path=None, port=0):
+        self.enabled = bool(enabled)
+        self.textfile = textfile or None
+        self.json_path = json_path or None
+        if self.enabled and port and self._server is None:
+            self.serve(port)
+
+    def timer(self, stage):
+        if not self.enabled:
+            return _NOOP
+        return _Timer(self, stage)
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            stat = self.stages.get(stage)
+            if stat is None:
+                stat = self.stages[stage] = {"count": 0, "sum": 0.0, "max": 0.0, "last": 0.0}
+            stat["count"] += 1
+            stat["sum"] += seconds
+            stat["max"] = max(stat["max"], seconds)
+            stat["last"] = seconds
+            if self._run_stages is not None:
+                self._run_stages[stage] = self._run_stages.get(stage, 0.0) + seconds
+
+    def incr(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            if self._run_counters is not None:
+                self._run_counters[key] = self._run_counters.get(key, 0) + value
+
+    def start_run(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._run_stages = {}
+            self._run_counters = {}
+            self._run_fields = {}
+            self._run_start = time.perf_counter()
+
+    def note(self, **fields):
+        # Extra fields for the current run's JSON line (signal, price, ...).
+        if not self.enabled or self._run_fields is None:
+            return
+        self._run_fields.update(fields)
+
+    def finish_run(self, **fields):
+        # One JSON line per live cycle plus a refreshed textfile; returns
+        # the line's record.
+        if not self.enabled or self._run_stages is None:
+            return
+        with self._lock:
+            record = {
+                "time": datetime.now().isoformat(timespec="milliseconds"),
+                "seconds": time.perf_counter() - self._run_start,
+                "stages": self._run_stages,
+                "counters": {
+                    name + _labels(labels): value
+                    for (name, labels), value in self._run_counters.items()
+                },
+            }
+            record.update(self._run_fields)
+            self._run_stages = None
+            self._run_counters = None
+            self._run_fields = None
+        record.update(fields)
+        if self.json_path:
+            try:
+                with open(self.json_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, default=str) + "\n")
+            except OSError as exc:
+                logger.warning("Failed to write metrics line: {}", exc)
+        if self.textfile:
+            self.write_textfile(self.textfile)
+        return record
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            if self.stages:
+                name = f"{METRIC_PREFIX}_stage_seconds"
+                lines.append(f"# TYPE {name} summary")
+                for stage, stat in sorted(self.stages.items()):
+                    label = _labels([("stage", stage)])
+                    lines.append(f"{name}_sum{label} {stat['sum']:.6f}")
+                    lines.append(f"{name}_count{label} {stat['count']}")
+                for suffix in ("last", "max"):
+                    gauge = f"{METRIC_PREFIX}_stage_{suffix}_seconds"
+                    lines.append(f"# TYPE {gauge} gauge")
+                    for stage, stat in sorted(self.stages.items()):
+                        label = _labels([("stage", stage)])
+                        lines.append(f"{gauge}{label} {stat[suffix]:.6f}")
+            seen = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                full_name = f"{METRIC_PREFIX}_{name}"
+                if full_name not in seen:
+                    lines.append(f"# TYPE {full_name} counter")
+                    seen.add(full_name)
+                lines.append(f"{full_name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        # node_exporter may read at any time, so replace the file atomically.
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            logger.warning("Failed to write metrics textfile: {}", exc)
+
+    def serve(self, port, host="127.0.0.1"):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as exc:
+            logger.warning("Failed to start metrics endpoint on port {}: {}", port, exc)
+            return None
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        logger.info("Metrics endpoint on http://{}:{}/metrics", host, port)
+        return self._server
+
+
+metrics = Metrics()
@@ -2,16 +2,13 @@ import sys
 
 from loguru import logger
 
+LOG_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}"
+FILE_OPTIONS = {"rotation": "10 MB", "retention": "10 days", "encoding": "utf-8"}
 
-def setup_logger(log_file):
+
+def setup_logger(log_file, enqueue=False):
+    # enqueue hands records to loguru's writer thread, so the trading loop
+    # never waits on disk writes or rotation; loguru drains it at exit.
     logger.remove()
-    fmt = "{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}"
-    logger.add(sys.stdout, level="INFO", format=fmt)
-    logger.add(
-        log_file,
-        level="INFO",
-        format=fmt,
-        rotation="10 MB",
-        retention="10 days",
-        encoding="utf-8",
-    )
+    logger.add(sys.stdout, level="INFO", format=LOG_FORMAT, enqueue=enqueue)
+    logger.add(log_file, level="INFO", format=LOG_FORMAT, enqueue=enqueue, **FILE_OPTIONS)
@@ -1,139 +1,534 @@
+import argparse
+from collections import deque
+from datetime import timedelta
+import time
+
 from loguru import logger
 
 from config import (
+    BALANCE_REFRESH_SEC,
     CANDLE_INTERVAL,
-    DAILY_LOSS_LIMIT_PCT,
+    DAEMON_WAKE_DELAY_SEC,
+    EVENT_LOG_BATCH,
+    EVENT_LOG_ENABLED,
+    EVENT_LOG_FILE,
+    EVENT_LOG_FLUSH_SEC,
+    LOG_ENQUEUE,
     LOG_FILE,
     MAX_INVEST_RATIO,
+    METRICS_ENABLED,
+    METRICS_JSON_FILE,
+    METRICS_PORT,
+    METRICS_TEXTFILE,
+    ORDER_ASYNC,
+    PAPER_FSYNC_EVERY,
     PAPER_INITIAL_KRW,
+    PAPER_SNAPSHOT_EVERY,
     PAPER_STATE_FILE,
     RSI_PERIOD,
-    STOP_LOSS_PCT,
-    TAKE_PROFIT_PCT,
+    STRATEGY_STATE_FILE,
     TICKER,
     TRADE_AMOUNT_KRW,
     TRADE_MODE,
     UPBIT_ACCESS_KEY,
+    UPBIT_API_URL,
     UPBIT_SECRET_KEY,
 )
+from candle_time import floor_time, interval_to_minutes, now_kst
+from event_log import events
+from instrumentation import metrics
 from logger_setup import setup_logger
 from paper_broker import PaperBroker
-from strategy import get_signal
-from upbit_client import UpbitClient
+from quotation import MAX_CANDLES, fetch_minute_candles
+from strategy import StreamingRSI, signal_from_rsi
+from strategy_state import load_rsi_state, save_rsi_state
+from trading_rules import LIVE_RULES, apply_rules, exit_reason
+
+DAEMON_RETRY_SEC = 0.3
+DAEMON_MAX_RETRIES = 5
+
+
+def setup_metrics():
+    metrics.configure(
+        METRICS_ENABLED,
+        textfile=METRICS_TEXTFILE,
+        json_path=METRICS_JSON_FILE,
+        port=METRICS_PORT,
+    )
+
+
+def setup_run():
+    setup_logger(LOG_FILE, enqueue=LOG_ENQUEUE)
+    setup_metrics()
+    events.configure(
+        EVENT_LOG_ENABLED,
+        path=EVENT_LOG_FILE,
+        batch=EVENT_LOG_BATCH,
+        flush_sec=EVENT_LOG_FLUSH_SEC,
+    )
+
+
+def start_cycle():
+    metrics.start_run()
+    events.start_cycle()
+
+
+def finish_cycle(**fields):
+    record = metrics.finish_run(mode=TRADE_MODE, ticker=TICKER, **fields)
+    stages = record["stages"] if record is not None else None
+    events.finish_cycle(stages, mode=TRADE_MODE, ticker=TICKER, **fields)
+
+
+def note_signal(signal, rsi, last_price):
+    metrics.note(signal=signal, rsi=rsi, price=last_price)
+    events.emit(
+        "signal",
+        ticker=TICKER,
+        interval=CANDLE_INTERVAL,
+        signal=signal,
+        rsi=rsi,
+        price=last_price,
+    )
+    logger.info("Signal={} RSI={:.2f} Price={:.2f}", signal, rsi, last_price)
+
+
+def note_skip(reason):
+    metrics.incr("trades_skipped_total", reason=reason)
+    events.emit("skip", reason=reason)
+
+
+def make_client(refresh_sec=0, watch_fills=True):
+    # Imported here: pyupbit pulls in pandas, which a cron hold never needs.
+    from upbit_client import UpbitClient
+
+    return UpbitClient(
+        UPBIT_ACCESS_KEY,
+        UPBIT_SECRET_KEY,
+        base_url=UPBIT_API_URL,
+        refresh_sec=refresh_sec,
+        watch_fills=watch_fills,
+    )
+
+
+def start_client(client):
+    # Real mode only: warm the order connection and balance cache up front.
+    if TRADE_MODE != "real":
+        return
+    try:
+        client.start()
+    except Exception as exc:
+        logger.warning("Failed to preload Upbit balances: {}", exc)
+
+
+def make_broker():
+    with metrics.timer("broker_load"):
+        return PaperBroker(
+            initial_krw=PAPER_INITIAL_KRW,
+            state_path=PAPER_STATE_FILE,
+            snapshot_every=PAPER_SNAPSHOT_EVERY,
+            fsync_every=PAPER_FSYNC_EVERY,
+        )
+
+
+def count_outcome(event, result):
+    if event in ("stop_loss", "take_profit"):
+        metrics.incr("exits_total", reason=event)
+    if result is not None and result.get("status") == "filled":
+        metrics.incr("fills_total", side=result["side"])
+    else:
+        reason = event if result is None else result.get("reason", event)
+        metrics.incr("trades_skipped_total", reason=reason)
+
+
+def log_exit(reason, avg_buy_price, last_price):
+    change_pct = (last_price - avg_buy_price) / avg_buy_price
+    events.emit(
+        "exit",
+        reason=reason,
+        avg_buy_price=avg_buy_price,
+        price=last_price,
+        change_pct=change_pct,
+    )
+    label = "Stop-loss" if reason == "stop_loss" else "Take-profit"
+    logger.warning(
+        "{} triggered at {:.2f}% (avg={:.2f}, price={:.2f}).",
+        label,
+        change_pct * 100,
+        avg_buy_price,
+        last_price,
+    )
+
+
+def check_exit(broker, last_price):
+    # Tick-level exits: same day roll and daily loss block as handle_paper.
+    broker.refresh_day(last_price)
+    if broker.get_daily_loss_pct(last_price) <= -LIVE_RULES.daily_loss_limit_pct:
+        return None
+    reason = exit_reason(broker, last_price)
+    if reason is None:
+        return None
+    log_exit(reason, broker.avg_buy_price, last_price)
+    result = broker.sell_all(price=last_price)
+    count_outcome(reason, result)
+    events.emit(
+        "order", mode="paper", rule=reason, result=result, status=broker.get_status()
+    )
+    return result
+
+
+def handle_paper(broker, signal, last_price):
+    broker.refresh_day(last_price)
+    logger.info("Paper start: {}", broker.get_status())
+
+    avg_buy_price = broker.avg_buy_price
+    event, result = apply_rules(broker, signal, last_price)
+    count_outcome(event, result)
+    events.emit(
+        "order",
+        mode="paper",
+        signal=signal,
+        rule=event,
+        price=last_price,
+        result=result,
+        status=broker.get_status(),
+    )
+
+    if event == "daily_loss_limit":
+        logger.warning(
+            "Daily loss limit reached ({:.2f}%), trading blocked.",
+            broker.get_daily_loss_pct(last_price) * 100,
+        )
+        return
+
+    if event in ("stop_loss", "take_profit"):
+        log_exit(event, avg_buy_price, last_price)
+    elif event == "max_invest_ratio":
+        logger.warning(
+            "Max invest ratio reached; buy skipped. "
+            "holding={:.2f} max={:.2f} spend={:.2f}",
+            broker.coin_amount * last_price,
+            broker.get_total_equity(last_price) * MAX_INVEST_RATIO,
+            min(TRADE_AMOUNT_KRW, broker.krw_balance),
+        )
+
+    logger.info("Paper result: {}", result)
+    logger.info("Paper end: {}", broker.get_status())
+
+
+def log_order_future(signal, future):
+    exc = future.exception()
+    if exc is not None:
+        metrics.incr("order_errors_total", side=signal)
+        events.emit("order_error", mode="real", signal=signal, error=str(exc))
+        logger.error("Order failed: {}", exc)
+        return
+    events.emit("order", mode="real", signal=signal, result=future.result())
+    logger.info("Order final: {}", future.result())
+
+
+def submit_real(client, signal):
+    # Returns right away; the final order is logged once its fill is polled.
+    if signal == "buy":
+        future = client.submit_buy(TICKER, TRADE_AMOUNT_KRW)
+    else:
+        future = client.submit_sell(TICKER)
+    future.add_done_callback(lambda f: log_order_future(signal, f))
+    return future
+
+
+def handle_real(client, signal):
+    try:
+        if ORDER_ASYNC and signal in ("buy", "sell"):
+            submit_real(client, signal)
+            metrics.incr("orders_total", side=signal)
+            return
+        if signal == "buy":
+            result = client.buy_market_order(TICKER, TRADE_AMOUNT_KRW)
+        elif signal == "sell":
+            result = client.sell_market_order(TICKER)
+        else:
+            logger.info("Hold signal; no order sent.")
+            note_skip("hold")
+            return
+    except Exception as exc:
+        metrics.incr("order_errors_total", side=signal)
+        events.emit("order_error", mode="real", signal=signal, error=str(exc))
+        logger.exception("Order failed: {}", exc)
+        return
+
+    metrics.incr("orders_total", side=signal)
+    events.emit("order", mode="real", signal=signal, result=result)
+    logger.info("Order response: {}", result)
+
+
+def act(client, broker, signal, last_price):
+    if TRADE_MODE == "paper":
+        if broker is None:
+            broker = make_broker()
+        handle_paper(broker, signal, last_price)
+        return
+    if TRADE_MODE == "real":
+        if client is not None:
+            handle_real(client, signal)
+            return
+        # One-shot run: skip fill polling for sync orders and close here, so
+        # an async order's polling is bounded by this run, not left to exit.
+        client = make_client(watch_fills=False)
+        try:
+            handle_real(client, signal)
+        finally:
+            client.close()
+        return
+    logger.error("Unknown TRADE_MODE: {}", TRADE_MODE)
 
 
 def run_once():
-    setup_logger(LOG_FILE)
+    setup_run()
     logger.info("Start run | mode={} ticker={}", TRADE_MODE, TICKER)
 
-    client = UpbitClient(UPBIT_ACCESS_KEY, UPBIT_SECRET_KEY)
+    start_cycle()
+    try:
+        cycle_once()
+    finally:
+        finish_cycle()
+        events.flush()
+
+
+def cycle_once():
+    # RSI state over closed candles is persisted between runs, so each run
+    # fetches only the candles since the last one and updates in O(1).
+    minutes = interval_to_minutes(CANDLE_INTERVAL)
+    warmup = max(200, RSI_PERIOD * 3)
+    rsi_state, last_time = load_rsi_state(
+        STRATEGY_STATE_FILE, TICKER, CANDLE_INTERVAL, RSI_PERIOD
+    )
+    bar_start = floor_time(now_kst(), minutes)
+    count = warmup
+    if last_time is not None:
+        missed = int((bar_start - last_time).total_seconds() / 60 / minutes)
+        if missed + 1 <= MAX_CANDLES:
+            count = missed + 1
+        else:
+            rsi_state, last_time = StreamingRSI(RSI_PERIOD), None
 
     try:
-        df = client.get_ohlcv(
-            TICKER, interval=CANDLE_INTERVAL, count=max(200, RSI_PERIOD * 3)
-        )
+        with metrics.timer("fetch_ohlcv"):
+            candles = fetch_minute_candles(TICKER, minutes, count)
     except Exception as exc:
+        events.emit("error", stage="fetch_ohlcv", error=str(exc))
         logger.exception("Failed to fetch OHLCV: {}", exc)
         return
 
-    if df is None or df.empty:
+    if not candles:
         logger.error("No OHLCV data returned.")
         return
 
-    signal, rsi = get_signal(df, RSI_PERIOD)
+    with metrics.timer("rsi"):
+        for ts, close in candles:
+            if ts >= bar_start:
+                break
+            if last_time is None or ts > last_time:
+                rsi_state.update(close)
+                last_time = ts
+        last_ts, last_price = candles[-1]
+        # Like the full recompute, the still-forming candle counts as the
+        # latest close without being committed to the saved state.
+        rsi = rsi_state.peek(last_price) if last_ts >= bar_start else rsi_state.value
+    if last_time is not None:
+        save_rsi_state(STRATEGY_STATE_FILE, TICKER, CANDLE_INTERVAL, rsi_state, last_time)
+
     if rsi is None:
+        note_skip("rsi_not_ready")
         logger.warning("RSI not ready; skipping trade.")
         return
 
-    last_price = float(df["close"].iloc[-1])
-    logger.info("Signal={} RSI={:.2f} Price={:.2f}", signal, rsi, last_price)
+    signal = signal_from_rsi(rsi)
+    note_signal(signal, rsi, last_price)
+    act(None, None, signal, last_price)
+
+
+class CandleBuffer:
+    def __init__(self, period, maxlen):
+        self.rsi = StreamingRSI(period)
+        self.candles = deque(maxlen=maxlen)
+        self.last_time = None
+
+    def append(self, ts, close):
+        if self.last_time is not None and ts <= self.last_time:
+            return False
+        self.rsi.update(close)
+        self.candles.append((ts, float(close)))
+        self.last_time = ts
+        return True
+
+    def extend(self, df):
+        if df is None or df.empty:
+            return 0
+        return sum(self.append(ts, close) for ts, close in zip(df.index, df["close"]))
+
+
+def act_on_buffer(client, broker, buffer):
+    rsi = buffer.rsi.value
+    if rsi is None:
+        note_skip("rsi_not_ready")
+        logger.warning("RSI not ready; skipping trade.")
+        return
+    signal = signal_from_rsi(rsi)
+    last_price = buffer.candles[-1][1]
+    note_signal(signal, rsi, last_price)
+    act(client, broker, signal, last_price)
+
+
+def closed_candles(df, bar_start):
+    # Drop the candle that is still forming.
+    if df is None or df.empty:
+        return df
+    return df[df.index < bar_start]
+
 
+def run_daemon():
+    setup_run()
+    logger.info("Start daemon | mode={} ticker={}", TRADE_MODE, TICKER)
+
+    client = make_client(BALANCE_REFRESH_SEC)
+    start_client(client)
+    broker = None
     if TRADE_MODE == "paper":
-        broker = PaperBroker(
-            initial_krw=PAPER_INITIAL_KRW, state_path=PAPER_STATE_FILE
-        )
-        broker.refresh_day(last_price)
-        logger.info("Paper start: {}", broker.get_status())
-
-        daily_loss_pct = broker.get_daily_loss_pct(last_price)
-        if daily_loss_pct <= -DAILY_LOSS_LIMIT_PCT:
-            logger.warning(
-                "Daily loss limit reached ({:.2f}%), trading blocked.",
-                daily_loss_pct * 100,
-            )
-            return
+        broker = make_broker()
 
-        if broker.coin_amount > 0 and broker.avg_buy_price > 0:
-            change_pct = (last_price - broker.avg_buy_price) / broker.avg_buy_price
-            if change_pct <= -STOP_LOSS_PCT:
-                logger.warning(
-                    "Stop-loss triggered at {:.2f}% (avg={:.2f}, price={:.2f}).",
-                    change_pct * 100,
-                    broker.avg_buy_price,
-                    last_price,
-                )
-                result = broker.sell_all(price=last_price)
-                logger.info("Paper result: {}", result)
-                logger.info("Paper end: {}", broker.get_status())
-                return
-            if change_pct >= TAKE_PROFIT_PCT:
-                logger.warning(
-                    "Take-profit triggered at {:.2f}% (avg={:.2f}, price={:.2f}).",
-                    change_pct * 100,
-                    broker.avg_buy_price,
-                    last_price,
-                )
-                result = broker.sell_all(price=last_price)
-                logger.info("Paper result: {}", result)
-                logger.info("Paper end: {}", broker.get_status())
-                return
+    minutes = interval_to_minutes(CANDLE_INTERVAL)
+    warmup = max(200, RSI_PERIOD * 3)
+    buffer = CandleBuffer(RSI_PERIOD, warmup)
 
-        if signal == "buy":
-            total_equity = broker.get_total_equity(last_price)
-            current_coin_value = broker.coin_amount * last_price
-            spend = min(TRADE_AMOUNT_KRW, broker.krw_balance)
-            max_coin_value = total_equity * MAX_INVEST_RATIO
-
-            if current_coin_value >= max_coin_value or (
-                current_coin_value + spend > max_coin_value
-            ):
-                logger.warning(
-                    "Max invest ratio reached; buy skipped. "
-                    "holding={:.2f} max={:.2f} spend={:.2f}",
-                    current_coin_value,
-                    max_coin_value,
-                    spend,
-                )
-                result = {"status": "skipped", "reason": "max_invest_ratio"}
-            else:
-                result = broker.buy(price=last_price, amount_krw=TRADE_AMOUNT_KRW)
-        elif signal == "sell":
-            result = broker.sell_all(price=last_price)
+    while True:
+        start_cycle()
+        bar_start = floor_time(now_kst(), minutes)
+        if buffer.last_time is None:
+            count = warmup + 1
         else:
-            result = {"status": "skipped", "reason": "hold"}
+            missed = (bar_start - buffer.last_time).total_seconds() / 60 / minutes
+            count = min(int(missed) + 2, warmup + 1)
+
+        added = 0
+        for attempt in range(DAEMON_MAX_RETRIES):
+            if attempt:
+                metrics.incr("fetch_retries_total")
+            try:
+                df = client.get_ohlcv(TICKER, interval=CANDLE_INTERVAL, count=count)
+            except Exception as exc:
+                events.emit("error", stage="fetch_ohlcv", error=str(exc))
+                logger.exception("Failed to fetch OHLCV: {}", exc)
+                df = None
+            with metrics.timer("rsi"):
+                added = buffer.extend(closed_candles(df, bar_start))
+            if added or buffer.last_time is None:
+                break
+            if buffer.last_time >= bar_start - timedelta(minutes=minutes):
+                break
+            time.sleep(DAEMON_RETRY_SEC)
+
+        if added:
+            act_on_buffer(client, broker, buffer)
+        finish_cycle(candles_added=added)
+
+        next_bar = floor_time(now_kst(), minutes) + timedelta(minutes=minutes)
+        delay = (next_bar - now_kst()).total_seconds() + DAEMON_WAKE_DELAY_SEC
+        time.sleep(max(delay, 0.0))
+
+
+def run_stream():
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    import threading
+
+    from tick_feed import TradeStream, epoch_ms
+
+    setup_run()
+    logger.info("Start stream | mode={} ticker={}", TRADE_MODE, TICKER)
+
+    client = make_client(BALANCE_REFRESH_SEC)
+    start_client(client)
+    broker = None
+    if TRADE_MODE == "paper":
+        broker = make_broker()
 
-        logger.info("Paper result: {}", result)
-        logger.info("Paper end: {}", broker.get_status())
+    minutes = interval_to_minutes(CANDLE_INTERVAL)
+    warmup = max(200, RSI_PERIOD * 3)
+    buffer = CandleBuffer(RSI_PERIOD, warmup)
+    try:
+        df = client.get_ohlcv(TICKER, interval=CANDLE_INTERVAL, count=warmup + 1)
+    except Exception as exc:
+        events.emit("error", stage="fetch_ohlcv", error=str(exc))
+        logger.exception("Failed to fetch OHLCV: {}", exc)
         return
+    buffer.extend(closed_candles(df, floor_time(now_kst(), minutes)))
 
-    if TRADE_MODE == "real":
+    # The event loop only reads trades. Decisions, journal writes and orders
+    # run in order on one worker thread, so a slow fill never stalls the
+    # feed; ticks queued behind it collapse into the latest price.
+    worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream")
+    tick_lock = threading.Lock()
+    latest_tick = [None]
+
+    def run_logged(handler, *args):
         try:
-            if signal == "buy":
-                result = client.buy_market_order(TICKER, TRADE_AMOUNT_KRW)
-            elif signal == "sell":
-                result = client.sell_market_order(TICKER)
-            else:
-                logger.info("Hold signal; no order sent.")
-                return
+            handler(*args)
         except Exception as exc:
-            logger.exception("Order failed: {}", exc)
+            logger.exception("Stream handler failed: {}", exc)
+
+    def handle_candle(candle):
+        start_cycle()
+        with metrics.timer("rsi"):
+            added = buffer.append(candle["time"], candle["close"])
+        if added:
+            act_on_buffer(client, broker, buffer)
+        finish_cycle()
+
+    def handle_tick():
+        # Stop-loss/take-profit react to every trade instead of bar closes.
+        with tick_lock:
+            price, latest_tick[0] = latest_tick[0], None
+        if price is None or broker.coin_amount <= 0:
             return
+        result = check_exit(broker, price)
+        if result is not None:
+            logger.info("Paper result: {}", result)
+            logger.info("Paper end: {}", broker.get_status())
 
-        logger.info("Order response: {}", result)
-        return
+    def on_candle(candle):
+        worker.submit(run_logged, handle_candle, candle)
 
-    logger.error("Unknown TRADE_MODE: {}", TRADE_MODE)
+    def on_tick(price):
+        if broker is None:
+            return
+        with tick_lock:
+            queued = latest_tick[0] is not None
+            latest_tick[0] = price
+        if not queued:
+            worker.submit(run_logged, handle_tick)
+
+    stream = TradeStream(TICKER, minutes, on_candle=on_candle, on_tick=on_tick)
+    if buffer.last_time is not None:
+        stream.builder.last_closed = epoch_ms(buffer.last_time)
+    try:
+        asyncio.run(stream.run())
+    finally:
+        worker.shutdown(wait=True)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--daemon", action="store_true")
+    mode.add_argument("--stream", action="store_true")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    run_once()
+    args = parse_args()
+    if args.daemon:
+        run_daemon()
+    elif args.stream:
+        run_stream()
+    else:
+        run_once()
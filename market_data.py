@@ -0,0 +1,234 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import math
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from candle_time import (
+    KST_OFFSET,
+    floor_time,
+    interval_to_minutes,
+    now_kst,
+    to_datetime,
+)
+from instrumentation import metrics
+
+PAGE_SIZE = 200
+FETCH_WORKERS = 4
+QUOTATION_RATE_PER_SEC = 8
+MAX_PAGE_RETRIES = 3
+RETRY_BACKOFF_SEC = 0.25
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                elapsed = now - self.updated
+                self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+QUOTATION_LIMITER = TokenBucket(QUOTATION_RATE_PER_SEC)
+
+
+def merge_candles(dfs):
+    dfs = [df for df in dfs if df is not None and not df.empty]
+    if not dfs:
+        return None
+
+    result = pd.concat(dfs).sort_index()
+    result = result[~result.index.duplicated(keep="last")]
+    return result
+
+
+def find_gaps(df, interval):
+    if df is None or len(df) < 2:
+        return []
+    step = np.timedelta64(interval_to_minutes(interval), "m")
+    index = df.index.values
+    positions = np.flatnonzero(np.diff(index) > step)
+    return [(df.index[i], df.index[i + 1]) for i in positions]
+
+
+def page_boundaries(interval, count, to=None):
+    # (end, size) per page, newest first; `end` is exclusive like Upbit's `to`.
+    minutes = interval_to_minutes(interval)
+    step = timedelta(minutes=minutes)
+    if to is None:
+        end = floor_time(now_kst(), minutes) + step
+    else:
+        end = to_datetime(to)
+
+    pages = []
+    remaining = max(count, 1)
+    while remaining > 0:
+        size = min(PAGE_SIZE, remaining)
+        pages.append((end, size))
+        end = end - step * size
+        remaining -= size
+    return pages
+
+
+def fetch_page(ticker, interval, end, size, get_ohlcv, limiter):
+    # Errors and None (pyupbit's answer to both throttling and an empty
+    # range) are retried with backoff; an empty frame is returned as is,
+    # since it means there is no history before `end`. A page that still
+    # fails raises, so callers never get (or cache) a partial range.
+    for attempt in range(MAX_PAGE_RETRIES + 1):
+        limiter.acquire()
+        try:
+            df = get_ohlcv(ticker, interval=interval, count=size, to=end - KST_OFFSET)
+        except Exception as exc:
+            logger.warning("OHLCV page request failed: {}", exc)
+            df = None
+        if df is not None:
+            return df
+        if attempt < MAX_PAGE_RETRIES:
+            metrics.incr("fetch_retries_total")
+            time.sleep(RETRY_BACKOFF_SEC * 2**attempt)
+    metrics.incr("fetch_failures_total")
+    raise RuntimeError(
+        f"No OHLCV returned for {ticker} {interval} before {end} "
+        f"after {MAX_PAGE_RETRIES} retries"
+    )
+
+
+def fetch_ohlcv_pages(
+    ticker,
+    interval,
+    count,
+    to=None,
+    get_ohlcv=None,
+    workers=FETCH_WORKERS,
+    limiter=None,
+):
+    limiter = limiter or QUOTATION_LIMITER
+    if get_ohlcv is None:
+        from quotation import fetch_candles
+
+        get_ohlcv = fetch_candles
+    pages = page_boundaries(interval, count, to=to)
+    start = pages[-1][0] - timedelta(minutes=interval_to_minutes(interval)) * pages[-1][1]
+    listing_start = []
+
+    def fetch(page):
+        # An empty or short page is the start of the market's history, so
+        # older pages are skipped instead of requested.
+        end, size = page
+        if listing_start and end <= max(listing_start):
+            return None
+        df = fetch_page(ticker, interval, end, size, get_ohlcv, limiter)
+        if df is not None and len(df) < size:
+            listing_start.append(to_datetime(df.index[0]) if len(df) else end)
+        return df
+
+    if workers <= 1 or len(pages) == 1:
+        dfs = [fetch(page) for page in pages]
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(pages))) as pool:
+            dfs = list(pool.map(fetch, pages))
+
+    result = merge_candles(dfs)
+    if result is None:
+        return None
+    # Pages over sparse markets reach past their slice; keep the exact range.
+    result = result[(result.index >= start) & (result.index < pages[0][0])]
+
+    gaps = find_gaps(result, interval)
+    if gaps:
+        logger.warning(
+            "Detected {} gap(s) in {} {} candles; first {} -> {}",
+            len(gaps),
+            ticker,
+            interval,
+            gaps[0][0],
+            gaps[0][1],
+        )
+    return result
+
+
+def top_up_tail(store, ticker, interval, get_ohlcv=None):
+    # Re-fetch from the last stored candle so a candle cached while still
+    # forming is replaced by its final values.
+    bounds = store.bounds(ticker, interval)
+    if bounds is None:
+        return None
+    last = to_datetime(bounds[1])
+    minutes = interval_to_minutes(interval)
+    end = floor_time(now_kst(), minutes) + timedelta(minutes=minutes)
+    count = max(int(round((end - last).total_seconds() / 60 / minutes)), 1)
+    df = fetch_ohlcv_pages(ticker, interval, count, get_ohlcv=get_ohlcv)
+    store.save(ticker, interval, df)
+    return df
+
+
+def fetch_ohlcv_cached(store, ticker, interval, count, get_ohlcv=None):
+    if store.bounds(ticker, interval) is None:
+        df = fetch_ohlcv_pages(ticker, interval, count, get_ohlcv=get_ohlcv)
+        store.save(ticker, interval, df)
+    else:
+        top_up_tail(store, ticker, interval, get_ohlcv=get_ohlcv)
+
+    df = store.load_last(ticker, interval, count)
+    missing = count - (0 if df is None else len(df))
+    if df is not None and missing > 0:
+        head = fetch_ohlcv_pages(
+            ticker, interval, missing, to=df.index[0], get_ohlcv=get_ohlcv
+        )
+        if head is not None:
+            store.save(ticker, interval, head)
+            df = store.load_last(ticker, interval, count)
+    return df
+
+
+def fetch_ohlcv_days(ticker, interval, days, store=None, get_ohlcv=None):
+    minutes = interval_to_minutes(interval)
+    total_needed = int(days * 24 * 60 / minutes)
+
+    if store is None:
+        return fetch_ohlcv_pages(ticker, interval, total_needed, get_ohlcv=get_ohlcv)
+
+    start = now_kst() - timedelta(days=days)
+    bounds = store.bounds(ticker, interval)
+    if bounds is None:
+        df = fetch_ohlcv_pages(ticker, interval, total_needed, get_ohlcv=get_ohlcv)
+        store.save(ticker, interval, df)
+        store.mark_coverage(ticker, interval, start)
+        return store.load(ticker, interval, start=start)
+
+    top_up_tail(store, ticker, interval, get_ohlcv=get_ohlcv)
+
+    covered_from = store.coverage_start(ticker, interval)
+    first = to_datetime(bounds[0])
+    if covered_from is None or covered_from > start:
+        missing = (first - start).total_seconds() / 60 / minutes
+        if missing > 0:
+            head = fetch_ohlcv_pages(
+                ticker,
+                interval,
+                int(math.ceil(missing)),
+                to=first,
+                get_ohlcv=get_ohlcv,
+            )
+            store.save(ticker, interval, head)
+        store.mark_coverage(ticker, interval, start)
+
+    return store.load(ticker, interval, start=start)
@@ -4,20 +4,44 @@ from datetime import datetime
 
 from loguru import logger
 
+from instrumentation import metrics
+
 DEFAULT_INITIAL_KRW = 1_000_000.0
 DEFAULT_STATE_PATH = "paper_account.json"
+DEFAULT_SNAPSHOT_EVERY = 100
+DEFAULT_FSYNC_EVERY = 1
+JOURNAL_SUFFIX = ".journal"
+BACKUP_SUFFIX = ".bad"
 
 
 class PaperBroker:
-    def __init__(self, initial_krw=DEFAULT_INITIAL_KRW, state_path=DEFAULT_STATE_PATH):
+    def __init__(
+        self,
+        initial_krw=DEFAULT_INITIAL_KRW,
+        state_path=DEFAULT_STATE_PATH,
+        snapshot_every=DEFAULT_SNAPSHOT_EVERY,
+        fsync_every=DEFAULT_FSYNC_EVERY,
+        persist=True,
+    ):
+        self.persist = persist
         self.state_path = state_path or DEFAULT_STATE_PATH
+        self.journal_path = self.state_path + JOURNAL_SUFFIX
+        self.snapshot_every = int(snapshot_every)
+        self.fsync_every = int(fsync_every)
         self.default_krw = float(initial_krw)
         self.krw_balance = self.default_krw
         self.coin_amount = 0.0
         self.avg_buy_price = 0.0
         self.last_day = None
         self.day_start_equity = 0.0
-        self._load_or_initialize()
+        self.seq = 0
+        self._snapshot_seq = 0
+        self._unsynced = 0
+        self._journal = None
+        if persist:
+            self._load_or_initialize()
+        else:
+            self._apply_state(self._default_state())
 
     def _default_state(self):
         today = datetime.now().date().isoformat()
@@ -63,9 +87,62 @@ class PaperBroker:
             with open(self.state_path, "r", encoding="utf-8") as f:
                 data = json.load(f)
             self._apply_state(data)
+            self.seq = self._snapshot_seq = int(data.get("seq", 0))
         except Exception as exc:
             logger.warning("Failed to load paper account; resetting: {}", exc)
+            # Resetting truncates the journal, so set both files aside first.
+            self._keep_backup(self.state_path)
+            self._keep_backup(self.journal_path)
             self._reset_to_defaults()
+            return
+
+        self._replay_journal()
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+
+        bad = False
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    if entry["seq"] <= self.seq:
+                        continue
+                    self._apply_entry(entry)
+                except (ValueError, KeyError, TypeError) as exc:
+                    # A torn final line from a crash mid-append, or an entry
+                    # this version cannot apply; later entries are skipped.
+                    logger.warning("Stopping paper journal replay at a bad entry: {}", exc)
+                    bad = True
+                    break
+                self.seq = entry["seq"]
+
+        if bad:
+            # Compact now so new entries are not appended after the bad one.
+            self._keep_backup(self.journal_path)
+            self.save()
+
+    def _keep_backup(self, path):
+        if not os.path.exists(path):
+            return
+        try:
+            os.replace(path, path + BACKUP_SUFFIX)
+            logger.warning("Kept a copy of {} as {}", path, path + BACKUP_SUFFIX)
+        except OSError as exc:
+            logger.warning("Failed to back up {}: {}", path, exc)
+
+    def _apply_entry(self, entry):
+        op = entry["op"]
+        if op == "buy":
+            self._apply_buy(entry["price"], entry["spend"])
+        elif op == "sell_all":
+            self._apply_sell_all(entry["price"])
+        elif op == "day":
+            self.last_day = entry["day"]
+            self.day_start_equity = entry["equity"]
+        else:
+            raise ValueError(f"Unknown paper journal op: {op}")
 
     def _reset_to_defaults(self):
         self._apply_state(self._default_state())
@@ -75,15 +152,90 @@ class PaperBroker:
         data = self.get_status()
         data["last_day"] = self.last_day
         data["day_start_equity"] = self.day_start_equity
+        data["seq"] = self.seq
         return data
 
+    def _record(self, entry):
+        # Write-ahead: the entry reaches the OS before the fill is applied.
+        if not self.persist:
+            self._apply_entry(entry)
+            return
+        self.seq += 1
+        entry["seq"] = self.seq
+        try:
+            with metrics.timer("broker_journal"):
+                if self._journal is None:
+                    self._journal = open(self.journal_path, "a", encoding="utf-8")
+                self._journal.write(json.dumps(entry) + "\n")
+                self._journal.flush()
+                self._unsynced += 1
+                if self.fsync_every > 0 and self._unsynced >= self.fsync_every:
+                    self.flush()
+        except Exception as exc:
+            logger.warning("Failed to write paper journal: {}", exc)
+        self._apply_entry(entry)
+        if self.snapshot_every > 0 and self.seq - self._snapshot_seq >= self.snapshot_every:
+            self.save()
+
+    def flush(self):
+        if self._journal is not None and self._unsynced:
+            os.fsync(self._journal.fileno())
+            self._unsynced = 0
+
+    def close(self):
+        if self._journal is not None:
+            self.flush()
+            self._journal.close()
+            self._journal = None
+
     def save(self):
+        # Compacts the journal into an atomically replaced snapshot.
+        if not self.persist:
+            return
+        with metrics.timer("broker_save"):
+            self._save_snapshot()
+
+    def _save_snapshot(self):
         data = self._state_payload()
+        tmp_path = self.state_path + ".tmp"
         try:
-            with open(self.state_path, "w", encoding="utf-8") as f:
+            with open(tmp_path, "w", encoding="utf-8") as f:
                 json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.state_path)
         except Exception as exc:
             logger.warning("Failed to save paper account: {}", exc)
+            return
+
+        self._snapshot_seq = self.seq
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self._unsynced = 0
+        try:
+            with open(self.journal_path, "w", encoding="utf-8"):
+                pass
+        except Exception as exc:
+            logger.warning("Failed to truncate paper journal: {}", exc)
+
+    def _apply_buy(self, price, spend):
+        qty = spend / price
+        total_cost = self.avg_buy_price * self.coin_amount + spend
+        total_qty = self.coin_amount + qty
+
+        self.avg_buy_price = total_cost / total_qty
+        self.coin_amount = total_qty
+        self.krw_balance -= spend
+        return qty
+
+    def _apply_sell_all(self, price):
+        proceeds = self.coin_amount * price
+
+        self.krw_balance += proceeds
+        self.coin_amount = 0.0
+        self.avg_buy_price = 0.0
+        return proceeds
 
     def buy(self, price, amount_krw):
         price = float(price)
@@ -97,14 +249,7 @@ class PaperBroker:
             return {"status": "rejected", "reason": "insufficient_krw"}
 
         qty = spend / price
-        total_cost = self.avg_buy_price * self.coin_amount + spend
-        total_qty = self.coin_amount + qty
-
-        self.avg_buy_price = total_cost / total_qty
-        self.coin_amount = total_qty
-        self.krw_balance -= spend
-
-        self.save()
+        self._record({"op": "buy", "price": price, "spend": spend})
         return {
             "status": "filled",
             "side": "buy",
@@ -123,12 +268,7 @@ class PaperBroker:
 
         qty = self.coin_amount
         proceeds = qty * price
-
-        self.krw_balance += proceeds
-        self.coin_amount = 0.0
-        self.avg_buy_price = 0.0
-
-        self.save()
+        self._record({"op": "sell_all", "price": price})
         return {
             "status": "filled",
             "side": "sell",
@@ -155,9 +295,8 @@ class PaperBroker:
             now = datetime.now()
         today = now.date().isoformat()
         if self.last_day != today:
-            self.last_day = today
-            self.day_start_equity = self.get_total_equity(current_price)
-            self.save()
+            equity = self.get_total_equity(current_price)
+            self._record({"op": "day", "day": today, "equity": equity})
 
     def get_daily_loss_pct(self, current_price):
         if self.day_start_equity <= 0:
@@ -0,0 +1,66 @@
+from datetime import datetime
+import json
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from config import UPBIT_API_URL
+
+HTTP_TIMEOUT_SEC = 5.0
+MAX_CANDLES = 200
+CANDLE_FIELDS = {
+    "opening_price": "open",
+    "high_price": "high",
+    "low_price": "low",
+    "trade_price": "close",
+    "candle_acc_trade_volume": "volume",
+    "candle_acc_trade_price": "value",
+}
+
+
+def _get_json(path, params, base_url):
+    url = f"{base_url.rstrip('/')}{path}?{urlencode(params)}"
+    request = Request(url, headers={"Accept": "application/json"})
+    with urlopen(request, timeout=HTTP_TIMEOUT_SEC) as response:
+        return json.load(response)
+
+
+def fetch_minute_candles(ticker, minutes, count, base_url=UPBIT_API_URL):
+    # One quotation request with the standard library: no pandas/pyupbit
+    # import on the cron path. Returns [(kst_time, close), ...] oldest first;
+    # the last entry may still be forming.
+    rows = _get_json(
+        f"/v1/candles/minutes/{minutes}",
+        {"market": ticker, "count": min(int(count), MAX_CANDLES)},
+        base_url,
+    )
+    return [
+        (datetime.fromisoformat(row["candle_date_time_kst"]), float(row["trade_price"]))
+        for row in reversed(rows)
+    ]
+
+
+def fetch_candles(
+    ticker, interval="minute1", count=MAX_CANDLES, to=None, base_url=UPBIT_API_URL
+):
+    # OHLCV page shaped like pyupbit.get_ohlcv (naive KST index), ending
+    # before `to` (naive UTC). Unlike pyupbit, a range with no candles gives
+    # an empty frame and a throttled or failed request raises, so callers
+    # can tell the start of history from an error.
+    import pandas as pd
+
+    from candle_time import interval_to_minutes
+
+    params = {"market": ticker, "count": min(int(count), MAX_CANDLES)}
+    if to is not None:
+        params["to"] = to.strftime("%Y-%m-%d %H:%M:%S")
+    rows = _get_json(
+        f"/v1/candles/minutes/{interval_to_minutes(interval)}", params, base_url
+    )
+    index = pd.DatetimeIndex(
+        [datetime.fromisoformat(row["candle_date_time_kst"]) for row in reversed(rows)]
+    )
+    data = {
+        column: [float(row[field]) for row in reversed(rows)]
+        for field, column in CANDLE_FIELDS.items()
+    }
+    return pd.DataFrame(data, index=index, columns=list(CANDLE_FIELDS.values()))
@@ -1,11 +1,28 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import csv
 from datetime import datetime, timedelta
 import math
 import os
 
+import numpy as np
+import pandas as pd
+
 from config import PAPER_INITIAL_KRW
+from trade_columns import (
+    EQUITY_COLUMNS,
+    FLOAT_COLUMNS,
+    SIGNAL_CODES,
+    load_columns,
+    load_trade_columns,
+)
 
 TRADES_CSV = "trades.csv"
+ROBUSTNESS_METHODS = ("bootstrap", "permute")
+ROBUSTNESS_PERCENTILES = (5, 50, 95)
+# Cells (resamples x trades) per batch; bounds memory at ~8 bytes each.
+ROBUSTNESS_BATCH_CELLS = 4_000_000
+ROBUSTNESS_PARALLEL_CELLS = 20_000_000
 
 
 def parse_float(value, default=0.0):
@@ -49,102 +66,373 @@ def load_trades(path):
     return trades
 
 
+EMPTY_METRICS = {
+    "trade_count": 0,
+    "wins": 0,
+    "losses": 0,
+    "win_rate": 0.0,
+    "avg_win": 0.0,
+    "avg_loss": 0.0,
+    "risk_reward": 0.0,
+    "total_fees": 0.0,
+    "total_pnl": 0.0,
+    "cumulative_return": 0.0,
+    "mdd": 0.0,
+    "avg_holding": None,
+    "final_equity": PAPER_INITIAL_KRW,
+}
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def _running_sum(start, values):
+    # np.cumsum adds left to right, matching a Python `+=` loop bit for bit.
+    if len(values) == 0:
+        return start
+    return float(np.cumsum(np.concatenate(([start], values)))[-1])
+
+
+class MetricsAccumulator:
+    def __init__(self):
+        self.rows = 0
+        self.total_fees = 0.0
+        self.total_pnl = 0.0
+        self.win_sum = 0.0
+        self.loss_sum = 0.0
+        self.trade_count = 0
+        self.wins = 0
+        self.losses = 0
+        self.peak = -math.inf
+        self.mdd = 0.0
+        self.final_equity = PAPER_INITIAL_KRW
+        self.prev_position = 0.0
+        self.entry_us = None
+        self.holding_us = 0
+        self.holding_count = 0
+
+    def update(self, time_us, signal, price, fee, balance, position, pnl):
+        # time_us: int64 microseconds; signal: 1 buy, -1 sell, 0 other.
+        n = len(signal)
+        if n == 0:
+            return
+        time_us = np.asarray(time_us, dtype=np.int64)
+        signal = np.asarray(signal)
+        position = np.asarray(position, dtype=np.float64)
+        pnl = np.asarray(pnl, dtype=np.float64)
+
+        equity = np.asarray(balance, dtype=np.float64) + position * np.asarray(
+            price, dtype=np.float64
+        )
+        self.rows += n
+        self.final_equity = float(equity[-1])
+        self.total_fees = _running_sum(self.total_fees, np.asarray(fee, dtype=np.float64))
+
+        peaks = np.maximum(np.maximum.accumulate(equity), self.peak)
+        positive = peaks > 0
+        if positive.any():
+            drawdowns = (equity[positive] - peaks[positive]) / peaks[positive]
+            self.mdd = min(self.mdd, float(drawdowns.min()))
+        self.peak = float(peaks[-1])
+
+        is_sell = signal == -1
+        sell_pnls = pnl[is_sell]
+        self.trade_count += len(sell_pnls)
+        self.total_pnl = _running_sum(self.total_pnl, sell_pnls)
+        gains = sell_pnls[sell_pnls > 0]
+        setbacks = sell_pnls[sell_pnls < 0]
+        self.wins += len(gains)
+        self.losses += len(setbacks)
+        self.win_sum = _running_sum(self.win_sum, gains)
+        self.loss_sum = _running_sum(self.loss_sum, setbacks)
+
+        prev_position = np.empty(n)
+        prev_position[0] = self.prev_position
+        prev_position[1:] = position[:-1]
+        self.prev_position = float(position[-1])
+        is_entry = (signal == 1) & (prev_position == 0) & (position > 0)
+        is_exit = is_sell & (prev_position > 0) & (position == 0)
+
+        # Each exit pairs with the latest entry since the previous exit; an
+        # exit with no entry in this chunk falls back to the carried one.
+        rows = np.arange(n)
+        last_entry = np.maximum.accumulate(np.where(is_entry, rows, -1))
+        exits = np.flatnonzero(is_exit)
+        if len(exits):
+            entries = last_entry[exits]
+            prev_exits = np.concatenate(([-1], exits[:-1]))
+            paired = entries > prev_exits
+            durations = time_us[exits[paired]] - time_us[entries[paired]]
+            self.holding_us += int(durations.sum())
+            self.holding_count += len(durations)
+            if not paired[0] and self.entry_us is not None:
+                self.holding_us += int(time_us[exits[0]]) - self.entry_us
+                self.holding_count += 1
+
+        last_exit = exits[-1] if len(exits) else -1
+        if last_entry[-1] > last_exit:
+            self.entry_us = int(time_us[last_entry[-1]])
+        elif last_exit >= 0:
+            self.entry_us = None
+
+    def result(self):
+        if self.rows == 0:
+            return dict(EMPTY_METRICS)
+
+        trade_count = self.trade_count
+        wins = self.wins
+        losses = self.losses
+        final_equity = self.final_equity
+        cumulative_return = (final_equity - PAPER_INITIAL_KRW) / PAPER_INITIAL_KRW
+        win_rate = wins / trade_count if trade_count > 0 else 0.0
+        avg_win = self.win_sum / wins if wins > 0 else 0.0
+        avg_loss = abs(self.loss_sum) / losses if losses > 0 else 0.0
+        risk_reward = avg_win / avg_loss if avg_loss > 0 else (math.inf if wins > 0 else 0.0)
+
+        avg_holding = None
+        if self.holding_count:
+            avg_holding = timedelta(microseconds=self.holding_us) / self.holding_count
+
+        return {
+            "trade_count": trade_count,
+            "wins": wins,
+            "losses": losses,
+            "win_rate": win_rate,
+            "avg_win": avg_win,
+            "avg_loss": avg_loss,
+            "risk_reward": risk_reward,
+            "total_fees": self.total_fees,
+            "total_pnl": self.total_pnl,
+            "cumulative_return": cumulative_return,
+            "mdd": self.mdd,
+            "avg_holding": avg_holding,
+            "final_equity": final_equity,
+        }
+
+
 def compute_metrics(trades):
     if not trades:
+        return dict(EMPTY_METRICS)
+
+    count = len(trades)
+    accumulator = MetricsAccumulator()
+    accumulator.update(
+        pd.DatetimeIndex([t["time"] for t in trades]).as_unit("us").asi8,
+        np.fromiter(
+            (SIGNAL_CODES.get(t["signal"], 0) for t in trades), dtype=np.int8, count=count
+        ),
+        *(
+            np.fromiter((t[name] for t in trades), dtype=np.float64, count=count)
+            for name in FLOAT_COLUMNS
+            if name != "qty"
+        ),
+    )
+    return accumulator.result()
+
+
+def compute_metrics_columns(columns, chunk_size=DEFAULT_CHUNK_ROWS):
+    # Works on memory-mapped columns chunk by chunk, so memory stays bounded.
+    accumulator = MetricsAccumulator()
+    total = len(columns["signal"])
+    for start in range(0, total, chunk_size):
+        end = start + chunk_size
+        accumulator.update(
+            np.asarray(columns["time"][start:end], dtype=np.int64) * 1_000_000,
+            columns["signal"][start:end],
+            columns["price"][start:end],
+            columns["fee"][start:end],
+            columns["balance"][start:end],
+            columns["position"][start:end],
+            columns["pnl"][start:end],
+        )
+    return accumulator.result()
+
+
+def _parse_floats(series):
+    # astype(float) rounds exactly like float(); pd.to_numeric does not.
+    try:
+        return series.astype(np.float64).to_numpy()
+    except ValueError:
+        return np.array([parse_float(v) for v in series], dtype=np.float64)
+
+
+def compute_metrics_csv(path, chunk_size=DEFAULT_CHUNK_ROWS):
+    if not os.path.exists(path):
+        print(f"Missing {path}. Run backtest first.")
+        return dict(EMPTY_METRICS)
+
+    accumulator = MetricsAccumulator()
+    chunks = pd.read_csv(
+        path,
+        chunksize=chunk_size,
+        dtype=str,
+        keep_default_na=False,
+        encoding="utf-8",
+    )
+    for chunk in chunks:
+        times = pd.to_datetime(chunk["time"], format="ISO8601", errors="coerce")
+        valid = times.notna().to_numpy()
+        chunk = chunk[valid]
+        values = {
+            name: _parse_floats(chunk[name])
+            for name in ["price", "fee", "balance", "position", "pnl"]
+        }
+        accumulator.update(
+            times[valid].to_numpy().astype("datetime64[us]").astype(np.int64),
+            chunk["signal"].map(SIGNAL_CODES).fillna(0).to_numpy(dtype=np.int8),
+            values["price"],
+            values["fee"],
+            values["balance"],
+            values["position"],
+            values["pnl"],
+        )
+    return accumulator.result()
+
+
+def compute_curve_metrics(curve):
+    # Per-bar MDD, exposure and time under water from the equity curve that
+    # backtest.py --equity writes; bars are marked at their close.
+    equity = np.asarray(curve["equity"], dtype=np.float64)
+    if len(equity) == 0:
         return {
-            "trade_count": 0,
-            "wins": 0,
-            "losses": 0,
-            "win_rate": 0.0,
-            "avg_win": 0.0,
-            "avg_loss": 0.0,
-            "risk_reward": 0.0,
-            "total_fees": 0.0,
-            "total_pnl": 0.0,
-            "cumulative_return": 0.0,
             "mdd": 0.0,
-            "avg_holding": None,
-            "final_equity": PAPER_INITIAL_KRW,
+            "exposure": 0.0,
+            "time_under_water": 0.0,
+            "max_underwater": None,
         }
 
-    equity_curve = []
-    sell_pnls = []
-    total_fees = 0.0
-    total_pnl = 0.0
-    trade_count = 0
-    wins = 0
-    losses = 0
-
-    prev_position = 0.0
-    entry_time = None
-    holding_durations = []
-
-    for trade in trades:
-        equity = trade["balance"] + trade["position"] * trade["price"]
-        equity_curve.append(equity)
-        total_fees += trade["fee"]
-
-        if trade["signal"] == "sell":
-            trade_count += 1
-            pnl = trade["pnl"]
-            total_pnl += pnl
-            sell_pnls.append(pnl)
-            if pnl > 0:
-                wins += 1
-            elif pnl < 0:
-                losses += 1
-
-        if trade["signal"] == "buy" and prev_position == 0 and trade["position"] > 0:
-            entry_time = trade["time"]
-        if trade["signal"] == "sell" and prev_position > 0 and trade["position"] == 0:
-            if entry_time:
-                holding_durations.append(trade["time"] - entry_time)
-            entry_time = None
-
-        prev_position = trade["position"]
-
-    final_equity = equity_curve[-1] if equity_curve else PAPER_INITIAL_KRW
-    cumulative_return = (final_equity - PAPER_INITIAL_KRW) / PAPER_INITIAL_KRW
-
-    peak = -math.inf
+    peaks = np.maximum.accumulate(equity)
+    positive = peaks > 0
     mdd = 0.0
-    for equity in equity_curve:
-        if equity > peak:
-            peak = equity
-        if peak > 0:
-            drawdown = (equity - peak) / peak
-            if drawdown < mdd:
-                mdd = drawdown
-
-    win_rate = wins / trade_count if trade_count > 0 else 0.0
-    avg_win = sum(p for p in sell_pnls if p > 0) / wins if wins > 0 else 0.0
-    avg_loss = (
-        abs(sum(p for p in sell_pnls if p < 0)) / losses if losses > 0 else 0.0
-    )
-    risk_reward = avg_win / avg_loss if avg_loss > 0 else (math.inf if wins > 0 else 0.0)
-
-    avg_holding = None
-    if holding_durations:
-        total = sum(holding_durations, timedelta())
-        avg_holding = total / len(holding_durations)
+    if positive.any():
+        mdd = min(0.0, float(((equity[positive] - peaks[positive]) / peaks[positive]).min()))
+
+    under = equity < peaks
+    max_underwater = None
+    if under.any():
+        times = np.asarray(curve["time"], dtype=np.int64)
+        bars = np.arange(len(equity))
+        last_peak = np.maximum.accumulate(np.where(under, 0, bars))
+        seconds = int((times[under] - times[last_peak[under]]).max())
+        max_underwater = timedelta(seconds=seconds)
 
     return {
-        "trade_count": trade_count,
-        "wins": wins,
-        "losses": losses,
-        "win_rate": win_rate,
-        "avg_win": avg_win,
-        "avg_loss": avg_loss,
-        "risk_reward": risk_reward,
-        "total_fees": total_fees,
-        "total_pnl": total_pnl,
-        "cumulative_return": cumulative_return,
         "mdd": mdd,
-        "avg_holding": avg_holding,
+        "exposure": float(np.count_nonzero(np.asarray(curve["position"]) > 0)) / len(equity),
+        "time_under_water": float(np.count_nonzero(under)) / len(equity),
+        "max_underwater": max_underwater,
+    }
+
+
+def sell_pnls_csv(path, chunk_size=DEFAULT_CHUNK_ROWS):
+    if not os.path.exists(path):
+        print(f"Missing {path}. Run backtest first.")
+        return np.empty(0)
+    parts = []
+    chunks = pd.read_csv(
+        path,
+        chunksize=chunk_size,
+        usecols=["time", "signal", "pnl"],
+        dtype=str,
+        keep_default_na=False,
+        encoding="utf-8",
+    )
+    for chunk in chunks:
+        valid = pd.to_datetime(chunk["time"], format="ISO8601", errors="coerce").notna()
+        chunk = chunk[valid.to_numpy() & (chunk["signal"] == "sell").to_numpy()]
+        parts.append(_parse_floats(chunk["pnl"]))
+    return np.concatenate(parts) if parts else np.empty(0)
+
+
+def longest_runs(mask):
+    # Longest run of True per row, without a Python loop over rows.
+    counts = np.cumsum(mask, axis=1, dtype=np.int32)
+    resets = np.maximum.accumulate(np.where(mask, 0, counts), axis=1)
+    return (counts - resets).max(axis=1, initial=0)
+
+
+def resample_batch(pnls, rows, method, seed, initial_krw=PAPER_INITIAL_KRW):
+    # Final equity, MDD and longest win/loss streaks of `rows` resampled
+    # closed-trade equity paths.
+    rng = np.random.default_rng(seed)
+    count = len(pnls)
+    if method == "bootstrap":
+        paths = pnls[rng.integers(0, count, size=(rows, count))]
+    else:
+        paths = rng.permuted(np.broadcast_to(pnls, (rows, count)), axis=1)
+    wins = longest_runs(paths > 0)
+    losses = longest_runs(paths < 0)
+    # Seeding the first column keeps the sums identical to a `+=` loop.
+    paths[:, 0] += initial_krw
+    np.cumsum(paths, axis=1, out=paths)
+    peaks = np.maximum(np.maximum.accumulate(paths, axis=1), initial_krw)
+    mdd = np.minimum(((paths - peaks) / peaks).min(axis=1), 0.0)
+    return paths[:, -1].copy(), mdd, wins, losses
+
+
+def _resample_task(task):
+    return resample_batch(*task)
+
+
+def run_robustness(pnls, resamples, method="bootstrap", seed=None, workers=None):
+    # Resamples are split into fixed-size batches with spawned seeds, so the
+    # result for a given seed does not depend on the worker count.
+    pnls = np.ascontiguousarray(pnls, dtype=np.float64)
+    if len(pnls) == 0 or resamples <= 0:
+        return None
+    rows = max(1, ROBUSTNESS_BATCH_CELLS // len(pnls))
+    sizes = [min(rows, resamples - start) for start in range(0, resamples, rows)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(pnls, size, method, child) for size, child in zip(sizes, seeds)]
+    parallel = (
+        len(tasks) > 1
+        and workers != 1
+        and resamples * len(pnls) >= ROBUSTNESS_PARALLEL_CELLS
+    )
+    if parallel:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            batches = list(pool.map(_resample_task, tasks))
+    else:
+        batches = [_resample_task(task) for task in tasks]
+    final_equity, mdd, win_streak, loss_streak = (np.concatenate(part) for part in zip(*batches))
+    return {
+        "method": method,
+        "resamples": resamples,
+        "trades": len(pnls),
         "final_equity": final_equity,
+        "mdd": mdd,
+        "win_streak": win_streak,
+        "loss_streak": loss_streak,
     }
 
 
+def _distribution(values):
+    return [float(np.mean(values))] + [
+        float(v) for v in np.percentile(values, ROBUSTNESS_PERCENTILES)
+    ]
+
+
+def print_robustness(result):
+    if result is None:
+        print("No closed trades to resample.")
+        return
+    labels = " | ".join(f"{p}%" for p in ROBUSTNESS_PERCENTILES)
+    print(
+        f"Robustness ({result['resamples']} {result['method']} resamples "
+        f"of {result['trades']} trades)"
+    )
+    print("================")
+    print(f"Percentiles: mean | {labels}")
+    rows = [
+        ("Final Equity", result["final_equity"], "{:.0f}"),
+        ("MDD", result["mdd"] * 100, "{:.2f}%"),
+        ("Longest Win Streak", result["win_streak"], "{:.1f}"),
+        ("Longest Loss Streak", result["loss_streak"], "{:.1f}"),
+    ]
+    for name, values, fmt in rows:
+        print(f"{name}: " + " | ".join(fmt.format(v) for v in _distribution(values)))
+    losing = np.count_nonzero(result["final_equity"] < PAPER_INITIAL_KRW)
+    print(f"Probability of Loss: {losing / result['resamples'] * 100:.2f}%")
+
+
 def format_duration(td):
     if td is None:
         return "N/A"
@@ -200,13 +488,59 @@ def print_report(metrics):
     print(f"Trade Count: {metrics['trade_count']}")
     print(f"Average Holding Time: {format_duration(metrics['avg_holding'])}")
     print(f"Total Fees: {metrics['total_fees']:.2f}")
+    if "exposure" in metrics:
+        print(f"Exposure: {metrics['exposure'] * 100:.2f}%")
+        print(f"Time Under Water: {metrics['time_under_water'] * 100:.2f}%")
+        print(f"Longest Drawdown: {format_duration(metrics['max_underwater'])}")
     print("")
     print("Main Reasons for Underperformance")
     for reason in diagnose(metrics):
         print(f"- {reason}")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trades", default=TRADES_CSV)
+    parser.add_argument("--columns", default=None)
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--equity", default=None)
+    parser.add_argument("--robustness", type=int, default=0)
+    parser.add_argument("--method", choices=ROBUSTNESS_METHODS, default="bootstrap")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    trades = load_trades(TRADES_CSV)
-    metrics = compute_metrics(trades)
+    args = parse_args()
+    chunk_size = args.chunk_size or DEFAULT_CHUNK_ROWS
+    if args.columns:
+        columns = load_trade_columns(args.columns)
+        if columns is None:
+            print(f"Missing columnar trades in {args.columns}. Run backtest with --columnar.")
+            columns = {"signal": [], "pnl": []}
+        metrics = compute_metrics_columns(columns, chunk_size)
+        if args.robustness:
+            pnls = np.asarray(columns["pnl"])[np.asarray(columns["signal"]) == -1]
+    elif args.chunk_size:
+        metrics = compute_metrics_csv(args.trades, chunk_size)
+        if args.robustness:
+            pnls = sell_pnls_csv(args.trades, chunk_size)
+    else:
+        trades = load_trades(args.trades)
+        metrics = compute_metrics(trades)
+        pnls = np.array([t["pnl"] for t in trades if t["signal"] == "sell"])
+    if args.equity:
+        curve = load_columns(args.equity, EQUITY_COLUMNS)
+        if curve is None:
+            print(f"Missing equity curve in {args.equity}. Run backtest with --equity.")
+        else:
+            metrics.update(compute_curve_metrics(curve))
     print_report(metrics)
+    if args.robustness:
+        print("")
+        print_robustness(
+            run_robustness(
+                pnls, args.robustness, args.method, seed=args.seed, workers=args.workers
+            )
+        )
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from candle_store import COLUMNS
+from market_data import KST_OFFSET
+
+BASE_INTERVAL = "minute1"
+UNIT_MINUTES = {"minute": 1, "hour": 60, "day": 1440}
+KST_OFFSET_MINUTES = int(KST_OFFSET.total_seconds() // 60)
+
+
+def timeframe_minutes(interval):
+    # minuteN, hourN or dayN (N defaults to 1).
+    for unit, minutes in UNIT_MINUTES.items():
+        if interval.startswith(unit):
+            count = interval[len(unit):]
+            if count and not count.isdigit():
+                break
+            count = int(count) if count else 1
+            if count > 0:
+                return minutes * count
+    raise ValueError(f"Unsupported interval: {interval}")
+
+
+def resample_ohlcv(df, minutes, source_minutes=1):
+    # Candles aligned to UTC like Upbit's own (day candles open at 09:00
+    # KST). A leading bucket that starts before the data is dropped since
+    # part of it was never fetched, and so is a trailing bucket the data
+    # does not reach the end of: it is still forming, and its close would
+    # be a price from after the bar it is traded on.
+    if df is None or df.empty or minutes == source_minutes:
+        return df
+    index_minutes = df.index.values.astype("datetime64[m]").astype(np.int64)
+    utc_minutes = index_minutes - KST_OFFSET_MINUTES
+    buckets = utc_minutes - utc_minutes % minutes
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    if buckets[0] != utc_minutes[0]:
+        starts = starts[1:]
+        if len(starts) == 0:
+            return df.iloc[:0]
+        df = df.iloc[starts[0]:]
+        buckets = buckets[starts[0]:]
+        starts = starts - starts[0]
+    if utc_minutes[-1] + source_minutes < buckets[starts[-1]] + minutes:
+        cut = starts[-1]
+        if cut == 0:
+            return df.iloc[:0]
+        df = df.iloc[:cut]
+        buckets = buckets[:cut]
+        starts = starts[:-1]
+    ends = np.r_[starts[1:], len(df)] - 1
+
+    frame = df.reindex(columns=COLUMNS)
+    values = {col: frame[col].to_numpy(dtype=np.float64) for col in COLUMNS}
+    columns = {
+        "open": values["open"][starts],
+        "high": np.maximum.reduceat(values["high"], starts),
+        "low": np.minimum.reduceat(values["low"], starts),
+        "close": values["close"][ends],
+        "volume": np.add.reduceat(values["volume"], starts),
+        "value": np.add.reduceat(values["value"], starts),
+    }
+    index = pd.DatetimeIndex(
+        (buckets[starts] + KST_OFFSET_MINUTES).astype("datetime64[m]")
+    ).as_unit(df.index.unit)
+    return pd.DataFrame(columns, index=index)
+
+
+class Timeframes:
+    # Higher intervals derived from one minute1 frame. Each interval is
+    # built on first use from the coarsest memoized frame that divides it
+    # (minute60 from minute15, not from minute1) and then kept.
+    def __init__(self, base):
+        self.base = base
+        self.frames = {1: base}
+
+    def get(self, interval):
+        minutes = timeframe_minutes(interval)
+        frame = self.frames.get(minutes)
+        if frame is None:
+            source = max(m for m in self.frames if minutes % m == 0)
+            frame = self.frames[minutes] = resample_ohlcv(
+                self.frames[source], minutes, source
+            )
+        return frame
+
+    def clear(self):
+        self.frames = {1: self.base}
@@ -0,0 +1,370 @@
+import argparse
+from datetime import datetime, timedelta
+import hashlib
+import io
+import json
+import sqlite3
+import sys
+import zlib
+
+import numpy as np
+
+from candle_store import COLUMNS
+from config import RESULT_STORE_FILE, RESULT_STORE_MB
+from report import compute_metrics, format_duration
+from trade_columns import FLOAT_COLUMNS, SIGNAL_NAMES, trades_to_columns
+
+# Bump when simulator output changes so stale results stop matching.
+RESULT_STORE_VERSION = 1
+COMPARE_METRICS = ["cumulative_return", "mdd", "win_rate", "risk_reward", "trade_count"]
+
+
+def data_fingerprint(df):
+    # Hash of every candle (time and OHLCV), so a top-up or a corrected
+    # candle gives a new key.
+    digest = hashlib.sha256()
+    if df is not None and not df.empty:
+        digest.update(np.ascontiguousarray(df.index.as_unit("s").asi8).tobytes())
+        for col in COLUMNS:
+            if col in df:
+                digest.update(col.encode())
+                digest.update(np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+
+def result_key(config):
+    payload = json.dumps(
+        {"version": RESULT_STORE_VERSION, "config": config}, sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _encode_metrics(metrics):
+    data = dict(metrics)
+    if isinstance(data.get("avg_holding"), timedelta):
+        data["avg_holding"] = data["avg_holding"].total_seconds()
+    return json.dumps(data)
+
+
+def _decode_metrics(text):
+    data = json.loads(text)
+    if data.get("avg_holding") is not None:
+        data["avg_holding"] = timedelta(seconds=data["avg_holding"])
+    return data
+
+
+def _encode_trades(trades):
+    buffer = io.BytesIO()
+    np.savez(buffer, **trades_to_columns(trades))
+    return buffer.getvalue()
+
+
+def _decode_trades(blob):
+    with np.load(io.BytesIO(blob)) as data:
+        times = data["time"].astype("datetime64[s]").astype(object).tolist()
+        signals = [SIGNAL_NAMES[code] for code in data["signal"].tolist()]
+        floats = {name: data[name].tolist() for name in FLOAT_COLUMNS}
+    return [
+        {"time": ts, "signal": signal, **{name: floats[name][i] for name in FLOAT_COLUMNS}}
+        for i, (ts, signal) in enumerate(zip(times, signals))
+    ]
+
+
+class ResultStore:
+    # Backtest results keyed by a hash of their full config (including the
+    # candle fingerprint). Least recently used entries are evicted once
+    # the stored bytes exceed max_bytes.
+    def __init__(self, path=RESULT_STORE_FILE, max_bytes=RESULT_STORE_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, kind TEXT NOT NULL, created REAL NOT NULL, "
+            "last_used REAL NOT NULL, size INTEGER NOT NULL, config TEXT NOT NULL, "
+            "metrics TEXT NOT NULL, trades BLOB, csv BLOB)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_used ON results (last_used)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, key, with_trades=False):
+        # (metrics, trades or None, trades CSV bytes or None); decoding the
+        # trade rows is the slow part, so it is skipped unless asked for.
+        column = "trades" if with_trades else "NULL"
+        row = self.conn.execute(
+            f"SELECT metrics, {column}, csv FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute(
+                "UPDATE results SET last_used = ? WHERE key = ?",
+                (datetime.now().timestamp(), key),
+            )
+        metrics, trades, csv_blob = row
+        return (
+            _decode_metrics(metrics),
+            _decode_trades(trades) if trades is not None else None,
+            zlib.decompress(csv_blob) if csv_blob is not None else None,
+        )
+
+    def get_metrics(self, keys):
+        # {key: metrics} for the stored keys, touched in one update.
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT key, metrics FROM results WHERE key IN ({marks})", chunk
+            ).fetchall()
+            found.update((key, _decode_metrics(metrics)) for key, metrics in rows)
+        if found:
+            now = datetime.now().timestamp()
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE results SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+        return found
+
+    def put_many(self, items):
+        # items: (key, kind, config, metrics, trades or None, CSV bytes or None)
+        now = datetime.now().timestamp()
+        rows = []
+        for key, kind, config, metrics, trades, csv_bytes in items:
+            config_text = json.dumps(config, sort_keys=True, default=str)
+            metrics_text = _encode_metrics(metrics)
+            blob = _encode_trades(trades) if trades is not None else None
+            csv_blob = zlib.compress(csv_bytes, 1) if csv_bytes is not None else None
+            size = len(config_text) + len(metrics_text)
+            size += sum(len(b) for b in (blob, csv_blob) if b is not None)
+            rows.append((key, kind, now, now, size, config_text, metrics_text, blob, csv_blob))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results "
+                "(key, kind, created, last_used, size, config, metrics, trades, csv) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        self.prune(self.max_bytes)
+
+    def put(self, key, kind, config, metrics, trades=None, csv_bytes=None):
+        self.put_many([(key, kind, config, metrics, trades, csv_bytes)])
+
+    def entries(self, kind=None):
+        query = "SELECT key, kind, created, last_used, size, config, metrics FROM results"
+        params = []
+        if kind:
+            query += " WHERE kind = ?"
+            params.append(kind)
+        rows = self.conn.execute(query + " ORDER BY last_used DESC", params).fetchall()
+        return [
+            {
+                "key": key,
+                "kind": kind,
+                "created": datetime.fromtimestamp(created),
+                "last_used": datetime.fromtimestamp(last_used),
+                "size": size,
+                "config": json.loads(config),
+                "metrics": _decode_metrics(metrics),
+            }
+            for key, kind, created, last_used, size, config, metrics in rows
+        ]
+
+    def resolve(self, prefix):
+        rows = self.conn.execute(
+            "SELECT key FROM results WHERE key LIKE ? LIMIT 2", (prefix + "%",)
+        ).fetchall()
+        if len(rows) != 1:
+            raise KeyError(f"{'Ambiguous' if rows else 'Unknown'} result key: {prefix}")
+        return rows[0][0]
+
+    def total_bytes(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def prune(self, max_bytes=None, older_than=None):
+        # Drops entries unused since `older_than` (a datetime), then the
+        # least recently used ones until the store fits in max_bytes.
+        removed = 0
+        with self.conn:
+            if older_than is not None:
+                removed += self.conn.execute(
+                    "DELETE FROM results WHERE last_used < ?", (older_than.timestamp(),)
+                ).rowcount
+            if max_bytes is not None:
+                excess = self.total_bytes() - max_bytes
+                if excess > 0:
+                    doomed = []
+                    for key, size in self.conn.execute(
+                        "SELECT key, size FROM results ORDER BY last_used"
+                    ):
+                        if excess <= 0:
+                            break
+                        doomed.append((key,))
+                        excess -= size
+                    self.conn.executemany("DELETE FROM results WHERE key = ?", doomed)
+                    removed += len(doomed)
+        return removed
+
+    def clear(self):
+        with self.conn:
+            return self.conn.execute("DELETE FROM results").rowcount
+
+
+class RunCache:
+    # One backtest's shared config (ticker, costs, candle fingerprint, ...)
+    # bound to a store; run() adds the per-result params to form the key.
+    def __init__(self, store=None, config=None):
+        self.store = store
+        self.config = dict(config or {})
+        self.reused = 0
+
+    def child(self, **config):
+        return RunCache(self.store, dict(self.config, **config))
+
+    def run(self, params, compute, path, write_csv, need_trades=False):
+        # Leaves the trades CSV at `path` and returns (trades, metrics, key).
+        # On a hit the stored CSV bytes are written back as they are, key is
+        # the stored key, and trades is None unless need_trades is set.
+        if self.store is None:
+            trades = compute()
+            write_csv(trades, path)
+            return trades, compute_metrics(trades), None
+        config = dict(self.config, **params)
+        key = result_key(config)
+        hit = self.store.get(key, with_trades=need_trades)
+        if hit is not None and hit[2] is not None and (hit[1] is not None or not need_trades):
+            metrics, trades, csv_bytes = hit
+            with open(path, "wb") as f:
+                f.write(csv_bytes)
+            return trades, metrics, key
+        trades = compute()
+        metrics = compute_metrics(trades)
+        write_csv(trades, path)
+        with open(path, "rb") as f:
+            csv_bytes = f.read()
+        self.store.put(key, "backtest", config, metrics, trades, csv_bytes)
+        return trades, metrics, None
+
+    def metrics_many(self, kind, params_list, compute, **shared):
+        # Metrics only, for many parameter sets (sweep grid points,
+        # walk-forward windows): stored ones are reused, the rest come from
+        # one compute(missing params) call and are stored with one put_many.
+        # shared adds config common to this batch (a window's bar range).
+        if self.store is None:
+            return compute(params_list)
+        base = dict(self.config, **shared)
+        configs = [dict(base, **params) for params in params_list]
+        keys = [result_key(config) for config in configs]
+        found = self.store.get_metrics(keys)
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        self.reused += len(keys) - len(missing)
+        if missing:
+            computed = compute([params_list[i] for i in missing])
+            items = []
+            for i, metrics in zip(missing, computed):
+                found[keys[i]] = metrics
+                items.append((keys[i], kind, configs[i], metrics, None, None))
+            self.store.put_many(items)
+        return [found[key] for key in keys]
+
+
+def _describe(config):
+    parts = [config.get("ticker", ""), config.get("interval", "")]
+    if config.get("strategy"):
+        parts.append(config["strategy"])
+    elif "period" in config:
+        parts.append(
+            f"p={config['period']} {config.get('buy_threshold')}/{config.get('sell_threshold')}"
+        )
+    if config.get("window"):
+        parts.append("bars {}-{}".format(*config["window"]))
+    return " ".join(str(part) for part in parts if part)
+
+
+def print_entries(entries):
+    print(f"{'key':<12} {'kind':<12} {'last used':<19} {'size':>9} {'return':>9} {'trades':>7}  run")
+    for entry in entries:
+        metrics = entry["metrics"]
+        print(
+            f"{entry['key'][:12]:<12} {entry['kind']:<12} "
+            f"{entry['last_used']:%Y-%m-%d %H:%M:%S} {entry['size']:>9} "
+            f"{metrics['cumulative_return'] * 100:>8.2f}% {metrics['trade_count']:>7}  "
+            f"{_describe(entry['config'])}"
+        )
+
+
+def print_comparison(entries):
+    keys = sorted({name for entry in entries for name in entry["config"]})
+    varying = [
+        name for name in keys if len({str(e["config"].get(name)) for e in entries}) > 1
+    ]
+    print(f"{'':<20}" + "".join(f"{e['key'][:12]:>16}" for e in entries))
+    for name in varying:
+        print(f"{name:<20}" + "".join(f"{str(e['config'].get(name))[:15]:>16}" for e in entries))
+    for name in COMPARE_METRICS:
+        values = [e["metrics"][name] for e in entries]
+        if name in ("cumulative_return", "mdd", "win_rate"):
+            cells = [f"{v * 100:.2f}%" for v in values]
+        elif name == "risk_reward":
+            cells = [f"{v:.2f}" for v in values]
+        else:
+            cells = [str(v) for v in values]
+        print(f"{name:<20}" + "".join(f"{cell:>16}" for cell in cells))
+    holding = [format_duration(e["metrics"]["avg_holding"]) for e in entries]
+    print(f"{'avg_holding':<20}" + "".join(f"{cell:>16}" for cell in holding))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--store", default=RESULT_STORE_FILE)
+    commands = parser.add_subparsers(dest="command", required=True)
+    listing = commands.add_parser("list")
+    listing.add_argument("--kind", default=None)
+    show = commands.add_parser("show")
+    show.add_argument("key")
+    compare = commands.add_parser("compare")
+    compare.add_argument("keys", nargs="+")
+    prune = commands.add_parser("prune")
+    prune.add_argument("--max-mb", type=float, default=None)
+    prune.add_argument("--older-than-days", type=float, default=None)
+    commands.add_parser("clear")
+    return parser.parse_args()
+
+
+def main(args):
+    store = ResultStore(args.store)
+    try:
+        if args.command == "list":
+            entries = store.entries(args.kind)
+            print_entries(entries)
+            print(f"{len(entries)} result(s), {store.total_bytes() / 1024 / 1024:.2f} MB")
+        elif args.command == "show":
+            entry = next(e for e in store.entries() if e["key"] == store.resolve(args.key))
+            print(json.dumps({k: entry[k] for k in ("key", "kind", "config")}, indent=2, default=str))
+            print_comparison([entry])
+        elif args.command == "compare":
+            wanted = [store.resolve(key) for key in args.keys]
+            by_key = {e["key"]: e for e in store.entries()}
+            print_comparison([by_key[key] for key in wanted])
+        elif args.command == "prune":
+            max_bytes = None if args.max_mb is None else int(args.max_mb * 1024 * 1024)
+            older_than = None
+            if args.older_than_days is not None:
+                older_than = datetime.now() - timedelta(days=args.older_than_days)
+            print(f"Removed {store.prune(max_bytes, older_than)} result(s).")
+        elif args.command == "clear":
+            print(f"Removed {store.clear()} result(s).")
+    except KeyError as exc:
+        print(exc.args[0])
+        return 1
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
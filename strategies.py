@@ -0,0 +1,280 @@
+import argparse
+import re
+
+import numpy as np
+
+from config import RSI_PERIOD
+from indicators import (
+    IndicatorGraph,
+    StreamingBollinger,
+    StreamingMACD,
+    StreamingWilderRSI,
+)
+from strategy import BUY_THRESHOLD, SELL_THRESHOLD, StreamingRSI, signals_from_rsi
+
+
+def cross_signals(values):
+    # 1 where values cross above zero, -1 where they cross below.
+    values = np.asarray(values, dtype=float)
+    prev = np.empty_like(values)
+    prev[:1] = np.nan
+    prev[1:] = values[:-1]
+    signals = np.zeros(len(values), dtype=np.int8)
+    signals[(values > 0) & (prev <= 0)] = 1
+    signals[(values < 0) & (prev >= 0)] = -1
+    return signals
+
+
+def cross_signal(value, prev):
+    if value > 0 and prev <= 0:
+        return 1
+    if value < 0 and prev >= 0:
+        return -1
+    return 0
+
+
+def threshold_signal(value, buy_threshold, sell_threshold):
+    # Scalar signals_from_rsi: the sell rule wins when both match.
+    if value >= sell_threshold:
+        return -1
+    if value <= buy_threshold:
+        return 1
+    return 0
+
+
+class Strategy:
+    # Subclasses set name/defaults and implement signals(graph), returning
+    # int8 signals (1 buy, -1 sell, 0 hold), and stream(), returning an
+    # object whose update(close) gives the same signal bar by bar.
+    name = None
+    defaults = {}
+
+    def __init__(self, **params):
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"Unknown {self.name} parameters: {sorted(unknown)}")
+        self.params = dict(self.defaults)
+        self.params.update(params)
+
+    @property
+    def label(self):
+        return self._join(lambda v: f"{v:g}")
+
+    @property
+    def spec(self):
+        # Full precision, for result keys; label rounds for display.
+        return self._join(repr)
+
+    def _join(self, fmt):
+        args = ",".join(f"{k}={fmt(v)}" for k, v in self.params.items())
+        return f"{self.name}:{args}"
+
+    def signals(self, graph):
+        raise NotImplementedError
+
+    def stream(self):
+        raise NotImplementedError
+
+
+class _Stream:
+    def __init__(self, update):
+        self.update = update
+
+
+class RSIStrategy(Strategy):
+    name = "rsi"
+    defaults = {"period": RSI_PERIOD, "buy": BUY_THRESHOLD, "sell": SELL_THRESHOLD}
+    indicator = StreamingRSI
+
+    def _series(self, graph):
+        return graph.rsi(self.params["period"])
+
+    def signals(self, graph):
+        rsi = self._series(graph).to_numpy()
+        return signals_from_rsi(rsi, self.params["buy"], self.params["sell"])
+
+    def stream(self):
+        rsi = self.indicator(self.params["period"])
+        buy, sell = self.params["buy"], self.params["sell"]
+
+        def update(close):
+            value = rsi.update(close)
+            return 0 if value is None else threshold_signal(value, buy, sell)
+
+        return _Stream(update)
+
+
+class WilderRSIStrategy(RSIStrategy):
+    name = "rsi_wilder"
+    indicator = StreamingWilderRSI
+
+    def _series(self, graph):
+        return graph.rsi_wilder(self.params["period"])
+
+
+class EMACrossStrategy(Strategy):
+    name = "ema_cross"
+    defaults = {"fast": 12, "slow": 26}
+
+    def signals(self, graph):
+        return cross_signals(graph.ema_spread(self.params["fast"], self.params["slow"]))
+
+    def stream(self):
+        fast, slow = self.params["fast"], self.params["slow"]
+        # The histogram's signal span is irrelevant here; only the line is used.
+        macd = StreamingMACD(fast, slow, 1)
+        prev = [np.nan]
+
+        def update(close):
+            spread, _ = macd.update(close)
+            signal = cross_signal(spread, prev[0])
+            prev[0] = spread
+            return signal
+
+        return _Stream(update)
+
+
+class MACDStrategy(Strategy):
+    name = "macd"
+    defaults = {"fast": 12, "slow": 26, "signal": 9}
+
+    def signals(self, graph):
+        p = self.params
+        return cross_signals(graph.macd_hist(p["fast"], p["slow"], p["signal"]))
+
+    def stream(self):
+        p = self.params
+        macd = StreamingMACD(p["fast"], p["slow"], p["signal"])
+        prev = [np.nan]
+
+        def update(close):
+            _, hist = macd.update(close)
+            signal = cross_signal(hist, prev[0])
+            prev[0] = hist
+            return signal
+
+        return _Stream(update)
+
+
+class BollingerStrategy(Strategy):
+    name = "bollinger"
+    defaults = {"window": 20, "k": 2.0}
+
+    def signals(self, graph):
+        window, k = self.params["window"], self.params["k"]
+        close = graph.close().to_numpy(dtype=float)
+        middle = graph.sma(window).to_numpy()
+        width = k * graph.std(window).to_numpy()
+        signals = np.zeros(len(close), dtype=np.int8)
+        signals[close <= middle - width] = 1
+        signals[close >= middle + width] = -1
+        return signals
+
+    def stream(self):
+        window, k = self.params["window"], self.params["k"]
+        bands = StreamingBollinger(window)
+
+        def update(close):
+            close = float(close)
+            middle, std = bands.update(close)
+            width = k * std
+            if close >= middle + width:
+                return -1
+            if close <= middle - width:
+                return 1
+            return 0
+
+        return _Stream(update)
+
+
+class ComboStrategy(Strategy):
+    # "all": every part must agree; "any": one part fires and none opposes.
+    name = "combo"
+
+    def __init__(self, parts, mode="all"):
+        if mode not in ("all", "any"):
+            raise ValueError(f"Unknown combo mode: {mode}")
+        self.parts = list(parts)
+        self.mode = mode
+        self.params = {}
+
+    @property
+    def label(self):
+        joiner = "+" if self.mode == "all" else "|"
+        return joiner.join(part.label for part in self.parts)
+
+    @property
+    def spec(self):
+        joiner = "+" if self.mode == "all" else "|"
+        return joiner.join(part.spec for part in self.parts)
+
+    def _combine(self, stacked):
+        buys = stacked == 1
+        sells = stacked == -1
+        if self.mode == "all":
+            buy, sell = buys.all(axis=0), sells.all(axis=0)
+        else:
+            buy = buys.any(axis=0) & ~sells.any(axis=0)
+            sell = sells.any(axis=0) & ~buys.any(axis=0)
+        return (buy.astype(np.int8) - sell.astype(np.int8)).astype(np.int8)
+
+    def signals(self, graph):
+        return self._combine(np.vstack([part.signals(graph) for part in self.parts]))
+
+    def stream(self):
+        streams = [part.stream() for part in self.parts]
+
+        def update(close):
+            stacked = np.array([[s.update(close)] for s in streams])
+            return int(self._combine(stacked)[0])
+
+        return _Stream(update)
+
+
+STRATEGIES = {
+    cls.name: cls
+    for cls in (
+        RSIStrategy,
+        WilderRSIStrategy,
+        EMACrossStrategy,
+        MACDStrategy,
+        BollingerStrategy,
+    )
+}
+
+
+def _parse_one(text):
+    name, _, args = text.strip().partition(":")
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {name} (choose from {sorted(STRATEGIES)})")
+    cls = STRATEGIES[name]
+    params = {}
+    for item in filter(None, args.split(",")):
+        key, _, value = item.partition("=")
+        if key not in cls.defaults:
+            raise ValueError(f"Unknown {name} parameter: {key}")
+        params[key] = type(cls.defaults[key])(float(value))
+    return cls(**params)
+
+
+def parse_strategy(text):
+    # "name[:k=v,...]", joined with "+" (all agree) or "|" (any fires).
+    if "+" in text and "|" in text:
+        raise argparse.ArgumentTypeError(
+            "Combine strategies with either '+' or '|', not both."
+        )
+    parts = re.split(r"[+|]", text)
+    try:
+        if len(parts) == 1:
+            return _parse_one(parts[0])
+        return ComboStrategy(
+            [_parse_one(part) for part in parts], "any" if "|" in text else "all"
+        )
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from exc
+
+
+def evaluate_strategies(close, strategies):
+    # One shared graph, so common sub-expressions are computed once.
+    graph = IndicatorGraph(close)
+    return [strategy.signals(graph) for strategy in strategies]
@@ -1,3 +1,10 @@
+from collections import deque
+import math
+
+BUY_THRESHOLD = 30
+SELL_THRESHOLD = 70
+
+
 def calculate_rsi(close_series, period):
     delta = close_series.diff()
     gain = delta.clip(lower=0)
@@ -9,7 +16,182 @@ def calculate_rsi(close_series, period):
     return rsi
 
 
-def get_signal(df, period):
+def divide(numerator, denominator):
+    # IEEE 754 division, matching the pandas `avg_gain / avg_loss` step.
+    if denominator != 0 or numerator != numerator or denominator != denominator:
+        return numerator / denominator
+    if numerator == 0:
+        return math.nan
+    return math.copysign(math.inf, numerator) * math.copysign(1.0, denominator)
+
+
+class RollingMean:
+    # Mirrors pandas' fixed-window roll_mean (Kahan-compensated running sum)
+    # so the streaming values are bit-identical to `rolling().mean()`.
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.same_count = 0
+        self.prev_value = math.nan
+
+    def _add(self, val):
+        self.nobs += 1
+        y = val - self.compensation_add
+        t = self.sum_x + y
+        self.compensation_add = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0:
+            self.neg_ct += 1
+        if val == self.prev_value:
+            self.same_count += 1
+        else:
+            self.same_count = 1
+        self.prev_value = val
+
+    def _remove(self, val):
+        self.nobs -= 1
+        y = -val - self.compensation_remove
+        t = self.sum_x + y
+        self.compensation_remove = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0:
+            self.neg_ct -= 1
+
+    def push(self, val):
+        if len(self.values) == self.window:
+            old = self.values.popleft()
+            if old == old:
+                self._remove(old)
+        self.values.append(val)
+        if val == val:
+            self._add(val)
+        return self.mean()
+
+    def mean(self):
+        nobs = self.nobs
+        if nobs < self.window or nobs <= 0:
+            return math.nan
+        result = self.sum_x / nobs
+        if self.same_count >= nobs:
+            result = self.prev_value
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self.neg_ct == nobs and result > 0:
+            result = 0.0
+        return result
+
+    def state(self):
+        return {
+            "values": list(self.values),
+            "nobs": self.nobs,
+            "neg_ct": self.neg_ct,
+            "sum_x": self.sum_x,
+            "compensation_add": self.compensation_add,
+            "compensation_remove": self.compensation_remove,
+            "same_count": self.same_count,
+            "prev_value": self.prev_value,
+        }
+
+    def restore(self, state):
+        self.values = deque(float(v) for v in state["values"])
+        for name in ("nobs", "neg_ct", "same_count"):
+            setattr(self, name, int(state[name]))
+        for name in ("sum_x", "compensation_add", "compensation_remove", "prev_value"):
+            setattr(self, name, float(state[name]))
+
+
+def gain_loss(delta):
+    # Same values (and signed zeros) as the pandas clip() calls.
+    if delta != delta:
+        return math.nan, math.nan
+    if delta > 0:
+        return delta, -0.0
+    return 0.0, (-delta if delta < 0 else -0.0)
+
+
+class StreamingRSI:
+    def __init__(self, period):
+        self.period = period
+        self.prev_close = None
+        self.value = None
+        self._avg_gain = RollingMean(period)
+        self._avg_loss = RollingMean(period)
+
+    def update(self, close):
+        close = float(close)
+        if self.prev_close is None:
+            delta = math.nan
+        else:
+            delta = close - self.prev_close
+        self.prev_close = close
+
+        gain, loss = gain_loss(delta)
+        avg_gain = self._avg_gain.push(gain)
+        avg_loss = self._avg_loss.push(loss)
+        rs = divide(avg_gain, avg_loss)
+        rsi = 100 - divide(100, 1 + rs)
+        self.value = None if rsi != rsi else float(rsi)
+        return self.value
+
+    def peek(self, close):
+        # RSI as if `close` were the next value, e.g. a still-forming candle.
+        probe = StreamingRSI(self.period)
+        probe.restore(self.state())
+        return probe.update(close)
+
+    def state(self):
+        # Full running state (window values and compensation terms) so a
+        # restored instance continues bit-identically.
+        return {
+            "period": self.period,
+            "prev_close": self.prev_close,
+            "value": self.value,
+            "avg_gain": self._avg_gain.state(),
+            "avg_loss": self._avg_loss.state(),
+        }
+
+    def restore(self, state):
+        if int(state["period"]) != self.period:
+            raise ValueError("RSI state was saved with a different period.")
+        self.prev_close = state["prev_close"]
+        self.value = state["value"]
+        self._avg_gain.restore(state["avg_gain"])
+        self._avg_loss.restore(state["avg_loss"])
+
+
+def signals_from_rsi(rsi, buy_threshold=BUY_THRESHOLD, sell_threshold=SELL_THRESHOLD):
+    # numpy is imported here so the live cron path never loads it.
+    import numpy as np
+
+    rsi = np.asarray(rsi, dtype=float)
+    signals = np.zeros(len(rsi), dtype=np.int8)
+    signals[rsi <= buy_threshold] = 1
+    signals[rsi >= sell_threshold] = -1
+    return signals
+
+
+def calculate_signals(
+    close_series, period, buy_threshold=BUY_THRESHOLD, sell_threshold=SELL_THRESHOLD
+):
+    rsi = calculate_rsi(close_series, period).to_numpy()
+    return signals_from_rsi(rsi, buy_threshold, sell_threshold)
+
+
+def signal_from_rsi(rsi, buy_threshold=BUY_THRESHOLD, sell_threshold=SELL_THRESHOLD):
+    if rsi <= buy_threshold:
+        return "buy"
+    if rsi >= sell_threshold:
+        return "sell"
+    return "hold"
+
+
+def get_signal(df, period, buy_threshold=BUY_THRESHOLD, sell_threshold=SELL_THRESHOLD):
     if df is None or df.empty:
         return "hold", None
 
@@ -19,8 +201,4 @@ def get_signal(df, period):
     if latest != latest:
         return "hold", None
 
-    if latest <= 30:
-        return "buy", float(latest)
-    if latest >= 70:
-        return "sell", float(latest)
-    return "hold", float(latest)
+    return signal_from_rsi(latest, buy_threshold, sell_threshold), float(latest)
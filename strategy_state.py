@@ -0,0 +1,41 @@
+from datetime import datetime
+import json
+import os
+
+from loguru import logger
+
+from strategy import StreamingRSI
+
+
+def load_rsi_state(path, ticker, interval, period):
+    # Returns (rsi, last closed candle time); a fresh StreamingRSI and None
+    # when there is no usable state for this ticker/interval/period.
+    rsi = StreamingRSI(period)
+    if not os.path.exists(path):
+        return rsi, None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("ticker") != ticker or data.get("interval") != interval:
+            return rsi, None
+        rsi.restore(data["rsi"])
+        return rsi, datetime.fromisoformat(data["last_time"])
+    except Exception as exc:
+        logger.warning("Failed to load strategy state; rebuilding: {}", exc)
+        return StreamingRSI(period), None
+
+
+def save_rsi_state(path, ticker, interval, rsi, last_time):
+    data = {
+        "ticker": ticker,
+        "interval": interval,
+        "last_time": last_time.isoformat(),
+        "rsi": rsi.state(),
+    }
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        logger.warning("Failed to save strategy state: {}", exc)
@@ -0,0 +1,200 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from functools import lru_cache
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from backtest import (
+    DEFAULT_DAYS,
+    DEFAULT_INTERVAL,
+    build_grid,
+    grid_config,
+    parse_range,
+    rank_results,
+    simulate_vectorized,
+)
+from candle_store import CandleStore
+from config import CANDLE_CACHE_FILE, RSI_PERIOD, TRADE_AMOUNT_KRW
+from market_data import fetch_ohlcv_days
+from report import compute_metrics, format_duration
+from result_store import ResultStore, RunCache
+from strategy import BUY_THRESHOLD, SELL_THRESHOLD, calculate_rsi
+
+SWEEP_CSV = "sweep_results.csv"
+PARAM_FIELDS = [
+    "period",
+    "buy_threshold",
+    "sell_threshold",
+    "trade_amount",
+    "stop_loss_pct",
+    "take_profit_pct",
+]
+METRIC_FIELDS = [
+    "cumulative_return",
+    "mdd",
+    "win_rate",
+    "risk_reward",
+    "trade_count",
+    "total_fees",
+    "total_pnl",
+    "final_equity",
+    "avg_holding",
+]
+
+_candles = None
+
+
+def share_candles(df, directory):
+    # Workers memory-map these instead of receiving the frame per task.
+    index_path = os.path.join(directory, "index.npy")
+    close_path = os.path.join(directory, "close.npy")
+    np.save(index_path, df.index.values.astype("datetime64[ns]").view("int64"))
+    np.save(close_path, df["close"].to_numpy(dtype=float))
+    return index_path, close_path
+
+
+def _attach(index_path, close_path):
+    global _candles
+    index = np.load(index_path, mmap_mode="r")
+    close = np.load(close_path, mmap_mode="r")
+    _candles = pd.DataFrame(
+        {"close": close},
+        index=pd.DatetimeIndex(index.view("datetime64[ns]")),
+        copy=False,
+    )
+    _rsi.cache_clear()
+
+
+@lru_cache(maxsize=16)
+def _rsi(period):
+    return calculate_rsi(_candles["close"], period).to_numpy()
+
+
+def _evaluate(params):
+    trades = simulate_vectorized(_candles, rsi=_rsi(params["period"]), **params)
+    return compute_metrics(trades)
+
+
+def run_grid(df, grid, workers=None):
+    with tempfile.TemporaryDirectory() as directory:
+        paths = share_candles(df, directory)
+        if workers == 1:
+            _attach(*paths)
+            return [_evaluate(params) for params in grid]
+
+        chunksize = max(1, len(grid) // ((workers or os.cpu_count() or 1) * 4))
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_attach, initargs=paths
+        ) as pool:
+            return list(pool.map(_evaluate, grid, chunksize=chunksize))
+
+
+def sweep_grid(df, grid, workers=None, results=None):
+    # Params plus metrics per grid point. Points already in the result
+    # store are reused; only the rest are simulated.
+    results = results if results is not None else RunCache()
+    metrics = results.metrics_many(
+        "sweep", grid, lambda todo: run_grid(df, todo, workers=workers)
+    )
+    return [dict(params, **m) for params, m in zip(grid, metrics)]
+
+
+def write_results_csv(results, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["rank"] + PARAM_FIELDS + METRIC_FIELDS)
+        writer.writeheader()
+        for rank, result in enumerate(results, start=1):
+            row = {"rank": rank}
+            row.update({field: result[field] for field in PARAM_FIELDS})
+            row.update({field: result[field] for field in METRIC_FIELDS})
+            row["avg_holding"] = format_duration(result["avg_holding"])
+            writer.writerow(row)
+
+
+def print_results(results, top):
+    print(
+        f"{'#':>4} {'period':>6} {'buy':>5} {'sell':>5} {'amount':>10} "
+        f"{'sl':>6} {'tp':>6} {'return':>9} {'mdd':>8} {'win':>7} {'trades':>7}"
+    )
+    for rank, r in enumerate(results[:top], start=1):
+        print(
+            f"{rank:>4} {r['period']:>6} {r['buy_threshold']:>5g} "
+            f"{r['sell_threshold']:>5g} {r['trade_amount']:>10.0f} "
+            f"{r['stop_loss_pct'] or 0:>6.3f} {r['take_profit_pct'] or 0:>6.3f} "
+            f"{r['cumulative_return'] * 100:>8.2f}% {r['mdd'] * 100:>7.2f}% "
+            f"{r['win_rate'] * 100:>6.2f}% {r['trade_count']:>7}"
+        )
+
+
+def run_sweep(args):
+    store = None if args.no_cache else CandleStore(CANDLE_CACHE_FILE)
+    try:
+        df = fetch_ohlcv_days(args.ticker, args.interval, args.days, store=store)
+    except Exception as exc:
+        logger.error("Failed to fetch OHLCV: {}", exc)
+        return 1
+    finally:
+        if store is not None:
+            store.close()
+
+    if df is None or df.empty:
+        logger.error("No OHLCV data returned.")
+        return 1
+
+    grid = build_grid(
+        args.periods,
+        args.buy,
+        args.sell,
+        args.trade_amount,
+        args.stop_loss,
+        args.take_profit,
+    )
+    if not grid:
+        logger.error("Parameter grid is empty.")
+        return 1
+
+    logger.info("Sweeping {} combinations over {} candles", len(grid), len(df))
+    store = None if args.no_results else ResultStore()
+    try:
+        cache = RunCache(store, grid_config(args.ticker, args.days, args.interval, df))
+        results = rank_results(sweep_grid(df, grid, args.workers, cache))
+    finally:
+        if store is not None:
+            store.close()
+    if cache.reused:
+        logger.info("Reused {} stored results", cache.reused)
+    write_results_csv(results, args.output)
+    print_results(results, args.top)
+    logger.info("Sweep finished. Results written to {}", args.output)
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ticker", default="KRW-BTC")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    parser.add_argument("--interval", default=DEFAULT_INTERVAL)
+    parser.add_argument(
+        "--periods", type=lambda t: parse_range(t, int), default=[RSI_PERIOD]
+    )
+    parser.add_argument("--buy", type=parse_range, default=[BUY_THRESHOLD])
+    parser.add_argument("--sell", type=parse_range, default=[SELL_THRESHOLD])
+    parser.add_argument("--trade-amount", type=parse_range, default=[TRADE_AMOUNT_KRW])
+    parser.add_argument("--stop-loss", type=parse_range, default=[0.0])
+    parser.add_argument("--take-profit", type=parse_range, default=[0.0])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--output", default=SWEEP_CSV)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--no-results", action="store_true")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(run_sweep(parse_args()))
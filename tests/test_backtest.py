@@ -0,0 +1,160 @@
+import sys
+
+import pytest
+
+import backtest
+from benchmarks.synthetic import synthetic_ohlcv
+from config import PAPER_INITIAL_KRW, RSI_PERIOD, STOP_LOSS_PCT, TAKE_PROFIT_PCT
+from paper_broker import PaperBroker
+from resample import Timeframes
+from strategy import calculate_rsi, signal_from_rsi
+from trading_rules import RiskRules, apply_rules
+
+
+def parse(argv, monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["backtest.py"] + argv)
+    return backtest.parse_args()
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--intrabar", "--engine", "replay"],
+        ["--stop-loss", "0.02,0.03"],
+        ["--take-profit", "0.01:0.05:0.01"],
+        ["--periods", "7"],
+        ["--buy", "25", "--sell", "75"],
+        ["--trade-amount", "5000"],
+    ],
+)
+def test_plain_run_rejects_unusable_options(argv, monkeypatch):
+    with pytest.raises(SystemExit):
+        parse(argv, monkeypatch)
+
+
+def test_plain_run_takes_single_exit_levels(monkeypatch):
+    args = parse(["--intrabar", "--stop-loss", "0.02", "--take-profit", "0"], monkeypatch)
+    assert backtest.single_value(args.stop_loss) == 0.02
+    assert backtest.single_value(args.take_profit) == 0.0
+
+
+def test_walk_forward_keeps_exit_grids(monkeypatch):
+    args = parse(["--walk-forward", "--stop-loss", "0,0.03"], monkeypatch)
+    assert args.stop_loss == [0.0, 0.03]
+    assert args.take_profit is None
+
+
+def test_rsi_grids_default_to_the_configured_settings(monkeypatch):
+    args = parse(["--walk-forward", "--periods", "7:21:7"], monkeypatch)
+    assert args.periods == [7, 14, 21]
+    assert args.buy == [backtest.BUY_THRESHOLD]
+    args = parse(["--tickers", "KRW-BTC,KRW-ETH", "--trade-amount", "5000"], monkeypatch)
+    assert args.trade_amount == [5000.0]
+    assert args.periods == [backtest.RSI_PERIOD]
+
+
+def test_exit_levels_defaults():
+    assert backtest.exit_levels("stream", False) == {
+        "stop_loss_pct": None,
+        "take_profit_pct": None,
+    }
+    assert backtest.exit_levels("vectorized", True) == {
+        "stop_loss_pct": STOP_LOSS_PCT,
+        "take_profit_pct": TAKE_PROFIT_PCT,
+    }
+    assert backtest.exit_levels("replay", False, 0.02, 0) == {
+        "stop_loss_pct": 0.02,
+        "take_profit_pct": None,
+    }
+
+
+def test_bar_close_and_intrabar_runs_share_exit_levels():
+    base = synthetic_ohlcv(5 * 1440, interval="minute1", seed=6)
+    df = Timeframes(base).get("minute15")
+    exits = backtest.exit_levels("vectorized", False, 0.01, 0.01)
+    bar_close = backtest.simulate_frame(df, "vectorized", **exits)
+    intrabar = backtest.simulate_frame(df, "vectorized", sub_df=base, **exits)
+    plain = backtest.simulate_frame(df, "vectorized")
+
+    assert bar_close == backtest.simulate_vectorized(
+        df, stop_loss_pct=0.01, take_profit_pct=0.01
+    )
+    assert bar_close != plain
+    assert intrabar != bar_close
+
+
+def test_result_key_covers_exit_levels():
+    df = synthetic_ohlcv(100, seed=1)
+    configs = []
+    for stop_loss in (None, 0.02):
+        exits = backtest.exit_levels("vectorized", False, stop_loss)
+        configs.append(
+            backtest.backtest_config("KRW-BTC", 1, "minute5", "vectorized", False, df, exits)
+        )
+    assert configs[0]["stop_loss_pct"] is None
+    assert configs[1]["stop_loss_pct"] == 0.02
+
+
+@pytest.mark.parametrize("regime", ["normal", "volatile"])
+@pytest.mark.parametrize("exits", [(None, None), (0.01, 0.01), (0.005, None)])
+def test_stream_and_vectorized_write_identical_trades(regime, exits, tmp_path):
+    df = synthetic_ohlcv(3000, regime=regime, seed=3)
+    stop_loss, take_profit = exits
+    paths = []
+    for simulate in (backtest.simulate_stream, backtest.simulate_vectorized):
+        trades = simulate(df, stop_loss_pct=stop_loss, take_profit_pct=take_profit)
+        assert trades
+        paths.append(tmp_path / f"{simulate.__name__}.csv")
+        backtest.write_trades_csv(trades, paths[-1])
+    assert paths[0].read_bytes() == paths[1].read_bytes()
+
+
+def paper_run(df, rules):
+    # The live handle_paper path, one candle per cycle: refresh_day, then
+    # apply_rules on the RSI signal once it is ready.
+    broker = PaperBroker(initial_krw=PAPER_INITIAL_KRW, persist=False)
+    rsi = calculate_rsi(df["close"], RSI_PERIOD).tolist()
+    events, trades = [], []
+    for ts, price, value in zip(df.index, df["close"].tolist(), rsi):
+        if value != value:
+            continue
+        broker.refresh_day(price, now=ts)
+        avg_buy_price = broker.avg_buy_price
+        event, result = apply_rules(broker, signal_from_rsi(value), price, rules)
+        events.append((ts, event, broker.coin_amount * price))
+        if result is None or result["status"] != "filled":
+            continue
+        pnl = (price - avg_buy_price) * result["qty"] if result["side"] == "sell" else 0.0
+        trades.append(
+            {
+                "time": ts.to_pydatetime(),
+                "signal": result["side"],
+                "price": price,
+                "qty": result["qty"],
+                "fee": 0.0,
+                "balance": broker.krw_balance,
+                "position": broker.coin_amount,
+                "pnl": pnl,
+            }
+        )
+    return events, trades
+
+
+def test_replay_matches_the_live_paper_rules():
+    trade_amount = 150_000
+    rules = RiskRules(trade_amount=trade_amount, stop_loss_pct=0.03, take_profit_pct=0.05)
+    df = synthetic_ohlcv(1500, interval="minute15", regime="volatile", seed=0)
+    # Crash 25% right after the position nears the invest cap, so the daily
+    # loss limit trips before the stop-loss can.
+    events, _ = paper_run(df, rules)
+    loaded = next(ts for ts, _, value in events if value > 250_000)
+    df.iloc[df.index.get_loc(loaded) + 1 :, df.columns.get_loc("close")] *= 0.75
+
+    events, expected = paper_run(df, rules)
+    assert {"daily_loss_limit", "stop_loss", "take_profit", "max_invest_ratio"} <= {
+        event for _, event, _ in events
+    }
+    trades = backtest.simulate_replay(
+        df, trade_amount=trade_amount, stop_loss_pct=0.03, take_profit_pct=0.05
+    )
+    assert trades == expected
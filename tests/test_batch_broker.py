@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+import types
+
+import numpy as np
+import pytest
+
+from batch_broker import EVENT_NAMES, RESULT_NAMES, BatchPaperBroker
+from paper_broker import PaperBroker
+from trading_rules import RiskRules, apply_rules
+
+SIGNAL_NAMES = {1: "buy", -1: "sell", 0: "hold"}
+
+
+def outcome(result):
+    if result is None:
+        return "none"
+    if result["status"] in ("filled", "skipped"):
+        return result["status"]
+    return result["reason"]
+
+
+def test_matches_paper_brokers_bit_for_bit(tmp_path):
+    rng = np.random.default_rng(7)
+    count, steps = 60, 1500
+    stops = rng.choice([0.0, 0.01, 0.03], count)
+    takes = rng.choice([0.0, 0.02, 0.05], count)
+    amounts = rng.choice([5000.0, 10000.0, 300000.0], count)
+    limits = rng.choice([0.01, 0.05], count)
+    ratios = rng.choice([0.3, 0.9], count)
+    rules = [
+        RiskRules(
+            trade_amount=amounts[i],
+            max_invest_ratio=ratios[i],
+            stop_loss_pct=stops[i],
+            take_profit_pct=takes[i],
+            daily_loss_limit_pct=limits[i],
+        )
+        for i in range(count)
+    ]
+    per_account = types.SimpleNamespace(
+        trade_amount=amounts,
+        max_invest_ratio=ratios,
+        stop_loss_pct=stops,
+        take_profit_pct=takes,
+        daily_loss_limit_pct=limits,
+    )
+    brokers = [PaperBroker(initial_krw=1e6, persist=False) for _ in range(count)]
+    batch = BatchPaperBroker(count, initial_krw=1e6)
+    now = datetime(2026, 1, 1)
+    prices = 1e8 * np.exp(np.cumsum(rng.normal(0, 0.01, (steps, count)), axis=0))
+
+    for step in range(steps):
+        now += timedelta(minutes=37)
+        price = prices[step]
+        signals = rng.choice([1, -1, 0], count, p=[0.4, 0.2, 0.4])
+        mask = rng.random(count) < 0.8
+        selected = np.flatnonzero(mask)
+        kind = step % 10
+        if kind == 0:
+            batch.refresh_day(price, now=now, mask=mask)
+            for i in selected:
+                brokers[i].refresh_day(price[i], now=now)
+        elif kind == 1:
+            results, qty, spent = batch.buy(price, amounts, mask)
+            for i in selected:
+                result = brokers[i].buy(price[i], amounts[i])
+                assert RESULT_NAMES[results[i]] == outcome(result)
+                if result["status"] == "filled":
+                    assert (result["qty"], result["krw_spent"]) == (qty[i], spent[i])
+        elif kind == 2:
+            # Index masks select the same accounts as the bool mask.
+            results, qty, received = batch.sell_all(price, selected.tolist())
+            for i in selected:
+                result = brokers[i].sell_all(price[i])
+                assert RESULT_NAMES[results[i]] == outcome(result)
+                if result["status"] == "filled":
+                    assert (result["qty"], result["krw_received"]) == (qty[i], received[i])
+        else:
+            events, results, qty = batch.apply_rules(signals, price, per_account, mask)
+            for i in range(count):
+                if not mask[i]:
+                    assert EVENT_NAMES[events[i]] == "none"
+                    continue
+                signal = SIGNAL_NAMES[signals[i]]
+                event, result = apply_rules(brokers[i], signal, price[i], rules[i])
+                assert EVENT_NAMES[events[i]] == event
+                assert RESULT_NAMES[results[i]] == outcome(result)
+                if result is not None and result["status"] == "filled":
+                    assert qty[i] == result["qty"]
+
+    for i, broker in enumerate(brokers):
+        assert broker.krw_balance == batch.krw_balance[i]
+        assert broker.coin_amount == batch.coin_amount[i]
+        assert broker.avg_buy_price == batch.avg_buy_price[i]
+        assert broker.day_start_equity == batch.day_start_equity[i]
+        assert broker.last_day == str(batch.last_day[i])
+
+    path = str(tmp_path / "accounts.npz")
+    batch.save(path)
+    reloaded = BatchPaperBroker(count, state_path=path)
+    for name, values in batch.columns().items():
+        assert np.array_equal(getattr(reloaded, name), values)
+    assert np.array_equal(reloaded.last_day, batch.last_day)
+
+
+@pytest.mark.parametrize("mask", [[], np.array([], dtype=np.int64), (), [0, 2]])
+def test_index_masks(mask):
+    batch = BatchPaperBroker(3, initial_krw=100_000)
+    results, qty, spent = batch.buy(100.0, 10_000, mask)
+    chosen = np.zeros(3, dtype=bool)
+    chosen[list(mask)] = True
+    assert all(RESULT_NAMES[code] == "none" for code in results[~chosen])
+    assert all(RESULT_NAMES[code] == "filled" for code in results[chosen])
+    assert np.array_equal(spent > 0, chosen)
+
+
+def test_snapshot_with_other_account_count_resets(tmp_path):
+    path = str(tmp_path / "accounts.npz")
+    batch = BatchPaperBroker(4, initial_krw=1e6)
+    batch.buy(100.0, 1000.0)
+    batch.save(path)
+    other = BatchPaperBroker(5, initial_krw=2e6, state_path=path)
+    assert np.array_equal(other.krw_balance, np.full(5, 2e6))
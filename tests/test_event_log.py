@@ -0,0 +1,63 @@
+from datetime import date, datetime
+import json
+import threading
+
+from event_log import EventLog, event_file, parse_time, read_events
+
+
+def test_concurrent_emits_are_all_written(tmp_path):
+    path = str(tmp_path / "events.jsonl")
+    log = EventLog()
+    log.configure(True, path=path, batch=7)
+    threads = [
+        threading.Thread(
+            target=lambda worker=worker: [
+                log.emit("order", worker=worker, n=n) for n in range(500)
+            ]
+        )
+        for worker in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    log.flush()
+
+    records = read_events(path)
+    assert len(records) == 8 * 500
+    for worker in range(8):
+        ns = [r["n"] for r in records if r["worker"] == worker]
+        assert ns == list(range(500))
+
+
+def test_disabled_log_writes_nothing(tmp_path):
+    path = str(tmp_path / "events.jsonl")
+    log = EventLog()
+    log.configure(False, path=path)
+    log.emit("signal", signal="buy")
+    log.flush()
+    assert log.buffer == []
+    assert read_events(path) == []
+
+
+def test_read_events_filters_by_kind_and_time(tmp_path):
+    path = str(tmp_path / "events.jsonl")
+    log = EventLog()
+    log.configure(True, path=path)
+    log.emit("signal", signal="buy")
+    log.emit("order", result={"status": "filled", "side": "buy"})
+    log.flush()
+    assert [r["event"] for r in read_events(path, kinds=["order"])] == ["order"]
+    assert read_events(path, since=datetime(2999, 1, 1)) == []
+
+    days = {"2026-01-31": ["08:00:00.000", "23:59:59.999"], "2026-02-01": ["00:00:00.000"]}
+    for day, times in days.items():
+        with open(event_file(path, day), "w", encoding="utf-8") as f:
+            for t in times:
+                f.write(json.dumps({"time": f"{day}T{t}", "event": "cycle"}) + "\n")
+    until = parse_time("2026-01-31")
+    assert until == date(2026, 1, 31)
+    january = read_events(path, since=parse_time("2026-01-31"), until=until)
+    assert [r["time"][11:] for r in january] == ["08:00:00.000", "23:59:59.999"]
+    assert len(read_events(path, until=datetime(2026, 1, 31, 12))) == 1
+    assert len(read_events(path, since=date(2026, 2, 1), until=date(2026, 2, 1))) == 1
@@ -0,0 +1,29 @@
+import main
+from paper_broker import PaperBroker
+
+
+def bought_broker():
+    broker = PaperBroker(initial_krw=1_000_000, persist=False)
+    broker.buy(price=100.0, amount_krw=900_000)
+    broker.refresh_day(100.0)
+    return broker
+
+
+def test_tick_exit_respects_daily_loss_limit():
+    broker = bought_broker()
+    # -10% on the position is a stop-loss, but -9% on the day blocks it.
+    assert main.check_exit(broker, 90.0) is None
+    assert broker.coin_amount > 0
+
+
+def test_tick_exit_sells_on_stop_loss():
+    broker = bought_broker()
+    result = main.check_exit(broker, 96.0)
+    assert result["status"] == "filled"
+    assert broker.coin_amount == 0
+
+
+def test_tick_exit_holds_inside_the_band():
+    broker = bought_broker()
+    assert main.check_exit(broker, 99.0) is None
+    assert broker.coin_amount > 0
@@ -0,0 +1,335 @@
+from datetime import datetime, timedelta
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from candle_store import CandleStore
+import market_data
+from market_data import (
+    KST_OFFSET,
+    TokenBucket,
+    fetch_ohlcv_cached,
+    fetch_ohlcv_days,
+    fetch_ohlcv_pages,
+    find_gaps,
+)
+from quotation import fetch_candles
+
+END = datetime(2024, 3, 1, 12, 0)
+MINUTE = timedelta(minutes=1)
+
+
+def market(start, end, missing=()):
+    index = pd.date_range(start, end - MINUTE, freq="1min")
+    index = index[~index.isin(pd.DatetimeIndex(list(missing)))]
+    close = np.arange(len(index), dtype=float) + 100.0
+    return pd.DataFrame(
+        {
+            "open": close,
+            "high": close + 1,
+            "low": close - 1,
+            "close": close,
+            "volume": np.ones(len(index)),
+            "value": close,
+        },
+        index=index,
+    )
+
+
+class FakeOhlcv:
+    # pyupbit.get_ohlcv over a fixed frame: the last `count` candles before
+    # `to` (naive UTC). `failures` lists call numbers that return None or
+    # raise, like a throttled request.
+    def __init__(self, df, failures=None):
+        self.df = df
+        self.failures = dict(failures or {})
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, ticker, interval, count, to):
+        with self.lock:
+            number = len(self.calls)
+            self.calls.append(to)
+        failure = self.failures.get(number)
+        if failure == "none":
+            return None
+        if failure == "raise":
+            raise RuntimeError("429 Too Many Requests")
+        return self.df[self.df.index < to + KST_OFFSET].iloc[-count:]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(market_data, "RETRY_BACKOFF_SEC", 0.0)
+
+
+def fetch(fake, count, workers=1):
+    return fetch_ohlcv_pages(
+        "KRW-BTC",
+        "minute1",
+        count,
+        to=END,
+        get_ohlcv=fake,
+        workers=workers,
+        limiter=TokenBucket(1e6),
+    )
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_pages_cover_the_exact_range(workers):
+    fake = FakeOhlcv(market(END - timedelta(days=2), END + timedelta(hours=1)))
+    df = fetch(fake, 450, workers)
+    assert len(df) == 450
+    assert df.index[0] == END - 450 * MINUTE
+    assert df.index[-1] == END - MINUTE
+    assert not find_gaps(df, "minute1")
+    # `to` is sent as naive UTC, one request per page.
+    assert sorted(fake.calls, reverse=True) == [
+        END - KST_OFFSET,
+        END - KST_OFFSET - 200 * MINUTE,
+        END - KST_OFFSET - 400 * MINUTE,
+    ]
+
+
+def test_gaps_are_kept_and_reported():
+    missing = [END - 10 * MINUTE, END - 11 * MINUTE, END - 300 * MINUTE]
+    fake = FakeOhlcv(market(END - timedelta(days=1), END, missing))
+    df = fetch(fake, 400)
+    # Sparse pages reach further back; only the requested range is kept.
+    assert df.index[0] >= END - 400 * MINUTE
+    assert len(df) == 400 - len(missing)
+    assert not df.index.duplicated().any()
+    assert [gap[0] for gap in find_gaps(df, "minute1")] == [
+        END - 301 * MINUTE,
+        END - 12 * MINUTE,
+    ]
+
+
+def test_throttled_pages_are_retried():
+    fake = FakeOhlcv(market(END - timedelta(days=1), END), {0: "none", 1: "raise"})
+    df = fetch(fake, 150)
+    assert len(df) == 150
+    assert len(fake.calls) == 3
+
+
+def test_history_start_stops_paging_without_retries():
+    listing = END - 250 * MINUTE
+    fake = FakeOhlcv(market(listing, END))
+    df = fetch(fake, 1000)
+    assert len(df) == 250
+    assert df.index[0] == listing
+    # Full page, short page, then the older pages are never requested.
+    assert len(fake.calls) == 2
+
+
+def test_empty_pages_are_not_retried_in_parallel():
+    listing = END - 250 * MINUTE
+    fake = FakeOhlcv(market(listing, END))
+    df = fetch(fake, 1000, workers=4)
+    assert len(df) == 250
+    assert len(fake.calls) <= 5
+
+
+def test_empty_range_returns_none_after_one_request():
+    fake = FakeOhlcv(market(END + MINUTE, END + timedelta(hours=1)))
+    assert fetch(fake, 600) is None
+    assert len(fake.calls) == 1
+
+
+class CandleHandler(BaseHTTPRequestHandler):
+    status = 200
+    requests = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        CandleHandler.requests.append((url.path, query))
+        if CandleHandler.status != 200:
+            self.send_error(CandleHandler.status)
+            return
+        to = datetime.fromisoformat(query["to"][0]) + KST_OFFSET
+        count = int(query["count"][0])
+        rows = []
+        for i in range(1, count + 1):
+            ts = to - i * MINUTE
+            if ts < END - 3 * MINUTE:
+                break
+            rows.append(
+                {
+                    "candle_date_time_kst": ts.isoformat(),
+                    "opening_price": 1.0,
+                    "high_price": 2.0,
+                    "low_price": 0.5,
+                    "trade_price": float(i),
+                    "candle_acc_trade_volume": 3.0,
+                    "candle_acc_trade_price": 4.0,
+                }
+            )
+        body = json.dumps(rows).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def quotation_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CandleHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    CandleHandler.status = 200
+    CandleHandler.requests = []
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_candles_matches_pyupbit_shape(quotation_server):
+    df = fetch_candles(
+        "KRW-BTC", "minute1", 2, to=END - KST_OFFSET, base_url=quotation_server
+    )
+    path, query = CandleHandler.requests[0]
+    assert path == "/v1/candles/minutes/1"
+    assert query["to"] == [(END - KST_OFFSET).strftime("%Y-%m-%d %H:%M:%S")]
+    assert list(df.columns) == ["open", "high", "low", "close", "volume", "value"]
+    assert list(df.index) == [END - 2 * MINUTE, END - MINUTE]
+    assert list(df["close"]) == [2.0, 1.0]
+
+
+def test_fetch_candles_empty_range_and_throttling(quotation_server):
+    get_ohlcv = partial(fetch_candles, base_url=quotation_server)
+    assert get_ohlcv("KRW-BTC", "minute1", 5, to=END - 10 * MINUTE - KST_OFFSET).empty
+    CandleHandler.status = 429
+    with pytest.raises(HTTPError):
+        get_ohlcv("KRW-BTC", "minute1", 5, to=END - KST_OFFSET)
+
+
+def test_quotation_pages_end_at_history_start(quotation_server):
+    get_ohlcv = partial(fetch_candles, base_url=quotation_server)
+    df = fetch_ohlcv_pages(
+        "KRW-BTC", "minute1", 400, to=END, get_ohlcv=get_ohlcv, limiter=TokenBucket(1e6)
+    )
+    assert list(df.index) == [END - 3 * MINUTE, END - 2 * MINUTE, END - MINUTE]
+    # Two pages at most (fetched in parallel), each requested once.
+    assert len(CandleHandler.requests) <= 2
+
+
+def test_page_failing_after_retries_fails_the_whole_fetch(monkeypatch):
+    monkeypatch.setattr(market_data, "MAX_PAGE_RETRIES", 1)
+    fake = FakeOhlcv(market(END - timedelta(days=1), END), {2: "none", 3: "raise"})
+    with pytest.raises(RuntimeError, match="No OHLCV returned"):
+        fetch(fake, 450)
+
+
+def live_market(days):
+    end = market_data.floor_time(market_data.now_kst(), 1) + MINUTE
+    return market(end - timedelta(days=days), end + timedelta(hours=1))
+
+
+def test_days_fetch_saves_and_covers_after_a_retried_page(tmp_path):
+    store = CandleStore(str(tmp_path / "candles.sqlite"))
+    fake = FakeOhlcv(live_market(2), {1: "raise"})
+    df = fetch_ohlcv_days("KRW-BTC", "minute1", 0.5, store=store, get_ohlcv=fake)
+    assert len(df) >= 719
+    assert find_gaps(df, "minute1") == []
+    assert store.coverage_start("KRW-BTC", "minute1") is not None
+    store.close()
+
+
+def test_days_fetch_with_a_failed_page_caches_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(market_data, "MAX_PAGE_RETRIES", 0)
+    store = CandleStore(str(tmp_path / "candles.sqlite"))
+    fake = FakeOhlcv(live_market(2), {1: "raise"})
+    with pytest.raises(RuntimeError):
+        fetch_ohlcv_days("KRW-BTC", "minute1", 0.5, store=store, get_ohlcv=fake)
+    assert store.bounds("KRW-BTC", "minute1") is None
+    assert store.coverage_start("KRW-BTC", "minute1") is None
+
+    # A head extension that fails leaves the old range and coverage alone.
+    monkeypatch.setattr(market_data, "MAX_PAGE_RETRIES", 3)
+    fetch_ohlcv_days("KRW-BTC", "minute1", 0.25, store=store, get_ohlcv=fake)
+    covered = store.coverage_start("KRW-BTC", "minute1")
+    first = store.bounds("KRW-BTC", "minute1")[0]
+    monkeypatch.setattr(market_data, "MAX_PAGE_RETRIES", 0)
+    fake.failures = {len(fake.calls) + 1: "none"}
+    with pytest.raises(RuntimeError):
+        fetch_ohlcv_days("KRW-BTC", "minute1", 1, store=store, get_ohlcv=fake)
+    assert store.coverage_start("KRW-BTC", "minute1") == covered
+    assert store.bounds("KRW-BTC", "minute1")[0] == first
+    store.close()
+
+
+def test_cached_fetch_reuses_the_store_and_extends_both_ends(tmp_path):
+    store = CandleStore(str(tmp_path / "candles.sqlite"))
+    source = live_market(2)
+    fake = FakeOhlcv(source)
+    df = fetch_ohlcv_cached(store, "KRW-BTC", "minute1", 300, get_ohlcv=fake)
+    assert len(df) == 300
+    assert len(fake.calls) == 2
+
+    # Tail: the last stored candle may have been cached while forming, so it
+    # is re-fetched and replaced; the rest comes from the store.
+    last = df.iloc[[-1]].copy()
+    last["close"] = -1.0
+    store.save("KRW-BTC", "minute1", last)
+    fake.calls.clear()
+    df = fetch_ohlcv_cached(store, "KRW-BTC", "minute1", 300, get_ohlcv=fake)
+    assert len(fake.calls) == 1
+    assert df["close"].to_list() == source.loc[df.index, "close"].to_list()
+
+    # Head: only the missing older candles are requested, ending at the
+    # first stored one.
+    first = df.index[0]
+    fake.calls.clear()
+    df = fetch_ohlcv_cached(store, "KRW-BTC", "minute1", 500, get_ohlcv=fake)
+    assert len(df) == 500
+    assert find_gaps(df, "minute1") == []
+    assert len(fake.calls) == 2
+    assert fake.calls[1] == first - KST_OFFSET
+    store.close()
+
+
+def test_days_fetch_coverage(tmp_path):
+    store = CandleStore(str(tmp_path / "candles.sqlite"))
+    fake = FakeOhlcv(live_market(2))
+    fetch_ohlcv_days("KRW-BTC", "minute1", 0.25, store=store, get_ohlcv=fake)
+    covered = store.coverage_start("KRW-BTC", "minute1")
+    assert abs(market_data.now_kst() - timedelta(hours=6) - covered) < MINUTE
+
+    fake.calls.clear()
+    df = fetch_ohlcv_days("KRW-BTC", "minute1", 0.25, store=store, get_ohlcv=fake)
+    assert len(fake.calls) == 1
+    assert df.index[0] >= covered
+
+    fake.calls.clear()
+    df = fetch_ohlcv_days("KRW-BTC", "minute1", 0.5, store=store, get_ohlcv=fake)
+    assert len(fake.calls) == 3
+    assert len(df) >= 719
+    assert find_gaps(df, "minute1") == []
+    assert store.coverage_start("KRW-BTC", "minute1") < covered
+    store.close()
+
+
+def test_days_fetch_coverage_stops_at_the_listing(tmp_path):
+    store = CandleStore(str(tmp_path / "candles.sqlite"))
+    listing = market_data.floor_time(market_data.now_kst(), 1) - timedelta(hours=3)
+    fake = FakeOhlcv(live_market(2).loc[listing:])
+    df = fetch_ohlcv_days("KRW-BTC", "minute1", 1, store=store, get_ohlcv=fake)
+    assert df.index[0] == listing
+
+    # History before the listing is known to be empty, so it is not asked for.
+    fake.calls.clear()
+    fetch_ohlcv_days("KRW-BTC", "minute1", 1, store=store, get_ohlcv=fake)
+    assert len(fake.calls) == 1
+    store.close()
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from paper_broker import BACKUP_SUFFIX, PaperBroker
+
+
+@pytest.fixture
+def state_path(tmp_path):
+    return str(tmp_path / "paper_account.json")
+
+
+def traded_broker(state_path):
+    broker = PaperBroker(initial_krw=1_000_000, state_path=state_path)
+    broker.buy(price=100.0, amount_krw=500_000)
+    broker.buy(price=50.0, amount_krw=100_000)
+    broker.close()
+    return broker
+
+
+def test_journal_replays_after_restart(state_path):
+    broker = traded_broker(state_path)
+    reloaded = PaperBroker(state_path=state_path)
+    assert reloaded.get_status() == broker.get_status()
+    assert reloaded.seq == broker.seq
+
+
+def test_torn_last_line_is_dropped_and_compacted(state_path):
+    traded_broker(state_path)
+    with open(state_path + ".journal", "a", encoding="utf-8") as f:
+        f.write('{"op": "sell_all", "pri')
+    reloaded = PaperBroker(state_path=state_path)
+    assert reloaded.coin_amount == pytest.approx(7_000.0)
+    with open(state_path + ".journal", encoding="utf-8") as f:
+        assert f.read() == ""
+    with open(state_path, encoding="utf-8") as f:
+        assert json.load(f)["coin_amount"] == pytest.approx(7_000.0)
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        {"op": "sell_all", "price": 120.0},
+        {"op": "split", "price": 120.0, "seq": 3},
+        {"op": "buy", "seq": 3},
+        ["not", "an", "entry"],
+    ],
+)
+def test_bad_entry_stops_replay_and_keeps_the_journal(state_path, line):
+    traded_broker(state_path)
+    journal = state_path + ".journal"
+    with open(journal, encoding="utf-8") as f:
+        original = f.read()
+    with open(journal, "a", encoding="utf-8") as f:
+        f.write(json.dumps(line) + "\n")
+        f.write(json.dumps({"op": "sell_all", "price": 130.0, "seq": 4}) + "\n")
+
+    reloaded = PaperBroker(state_path=state_path)
+    assert reloaded.coin_amount == pytest.approx(7_000.0)
+    assert reloaded.seq == 2
+    with open(journal + BACKUP_SUFFIX, encoding="utf-8") as f:
+        assert f.read().startswith(original)
+    reloaded.sell_all(price=110.0)
+    reloaded.close()
+    assert PaperBroker(state_path=state_path).coin_amount == 0
+
+
+def test_corrupt_snapshot_is_backed_up_before_reset(state_path):
+    traded_broker(state_path)
+    journal = state_path + ".journal"
+    with open(journal, encoding="utf-8") as f:
+        entries = f.read()
+    with open(state_path, "w", encoding="utf-8") as f:
+        f.write("{not json")
+
+    broker = PaperBroker(initial_krw=1_000_000, state_path=state_path)
+    assert broker.krw_balance == 1_000_000
+    assert broker.coin_amount == 0
+    with open(state_path + BACKUP_SUFFIX, encoding="utf-8") as f:
+        assert f.read() == "{not json"
+    with open(journal + BACKUP_SUFFIX, encoding="utf-8") as f:
+        assert f.read() == entries
@@ -0,0 +1,62 @@
+import sys
+
+import pytest
+
+import backtest
+from benchmarks.synthetic import synthetic_ohlcv
+from strategy import calculate_rsi, signals_from_rsi
+
+
+def market(ticker, df, buy=30, sell=70):
+    signals = signals_from_rsi(calculate_rsi(df["close"], 14).to_numpy(), buy, sell)
+    events = signals.nonzero()[0]
+    return {
+        "ticker": ticker,
+        "times": df.index.values[events].astype("datetime64[ns]").view("int64"),
+        "signals": signals[events],
+        "prices": df["close"].to_numpy(dtype=float)[events],
+        "index": df.index[events],
+    }
+
+
+def test_single_market_portfolio_matches_vectorized():
+    df = synthetic_ohlcv(5000, seed=3)
+    expected = backtest.simulate_vectorized(df, trade_amount=50_000.0)
+    trades = backtest.simulate_portfolio([market("KRW-BTC", df)], trade_amount=50_000.0)
+    assert expected
+    assert [{k: v for k, v in t.items() if k != "ticker"} for t in trades] == expected
+
+
+def test_portfolio_shares_cash_across_markets():
+    markets = [
+        market("KRW-BTC", synthetic_ohlcv(3000, seed=1)),
+        market("KRW-ETH", synthetic_ohlcv(3000, seed=2)),
+    ]
+    trades = backtest.simulate_portfolio(markets, trade_amount=400_000.0)
+    assert {t["ticker"] for t in trades} == {"KRW-BTC", "KRW-ETH"}
+    # Buys are capped by the shared cash (up to float rounding).
+    assert min(t["balance"] for t in trades) > -1e-6
+    assert any(t["balance"] < backtest.MIN_ORDER_KRW for t in trades)
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--tickers", "KRW-BTC", "--engine", "replay"],
+        ["--tickers", "KRW-BTC", "--intrabar"],
+        ["--all-krw", "--stop-loss", "0.03"],
+        ["--tickers", "KRW-BTC", "--buy", "20,30"],
+    ],
+)
+def test_portfolio_rejects_ignored_options(argv, monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["backtest.py"] + argv)
+    with pytest.raises(SystemExit):
+        backtest.parse_args()
+
+
+def test_portfolio_accepts_single_settings(monkeypatch):
+    argv = ["--tickers", "KRW-BTC", "--buy", "25", "--trade-amount", "20000"]
+    monkeypatch.setattr(sys, "argv", ["backtest.py"] + argv)
+    args = backtest.parse_args()
+    assert args.buy == [25.0]
+    assert args.trade_amount == [20000.0]
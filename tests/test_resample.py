@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_ohlcv
+from resample import Timeframes, resample_ohlcv
+
+AGG = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum", "value": "sum"}
+
+
+def reference(df, minutes):
+    # pandas resample on UTC-aligned buckets, keeping complete buckets only.
+    frame = df.resample(f"{minutes}min", origin=pd.Timestamp("2000-01-01 09:00")).agg(AGG)
+    counts = df["close"].resample(f"{minutes}min", origin=pd.Timestamp("2000-01-01 09:00")).count()
+    return frame[counts == minutes]
+
+
+@pytest.mark.parametrize("minutes", [5, 15, 60, 240])
+def test_resample_keeps_only_complete_buckets(minutes):
+    # Starts and ends mid-bucket: both partial buckets are dropped.
+    df = synthetic_ohlcv(3 * 1440 + 7, interval="minute1", seed=4).iloc[3:]
+    got = resample_ohlcv(df, minutes)
+    expected = reference(df, minutes)
+    pd.testing.assert_frame_equal(got, expected, check_freq=False, check_index_type=False)
+    assert got.index[-1] + pd.Timedelta(minutes=minutes) <= df.index[-1] + pd.Timedelta(minutes=1)
+
+
+def test_forming_bucket_is_dropped():
+    df = synthetic_ohlcv(60 + 30, interval="minute1", start="2026-01-01 09:00", seed=1)
+    hourly = resample_ohlcv(df, 60)
+    assert list(hourly.index) == [pd.Timestamp("2026-01-01 09:00")]
+    assert hourly["close"].iloc[0] == df["close"].iloc[59]
+    assert resample_ohlcv(df.iloc[:59], 60).empty
+
+
+def test_chained_timeframes_match_direct_resample():
+    df = synthetic_ohlcv(2 * 1440 + 50, interval="minute1", seed=7)
+    timeframes = Timeframes(df)
+    timeframes.get("minute15")
+    chained = timeframes.get("minute60")
+    pd.testing.assert_frame_equal(chained, resample_ohlcv(df, 60))
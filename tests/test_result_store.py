@@ -0,0 +1,78 @@
+import pytest
+
+import backtest
+from benchmarks.synthetic import synthetic_ohlcv
+from indicator_cache import IndicatorCache
+from result_store import ResultStore, RunCache, result_key
+import sweep
+from strategies import parse_strategy
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite"))
+    yield store
+    store.close()
+
+
+def counting(compute):
+    calls = []
+
+    def wrapped(todo):
+        calls.append(list(todo))
+        return compute(todo)
+
+    return wrapped, calls
+
+
+def test_sweep_reuses_stored_grid_points(store):
+    df = synthetic_ohlcv(3000, seed=8)
+    config = backtest.grid_config("KRW-BTC", 10, "minute5", df)
+    grid = backtest.build_grid([7, 14], [25, 30], [70], [10_000.0], [0.0], [0.0])
+    fresh = sweep.sweep_grid(df, grid, workers=1)
+
+    first = RunCache(store, config)
+    assert sweep.sweep_grid(df, grid, 1, first) == fresh
+    assert first.reused == 0
+    assert {e["kind"] for e in store.entries()} == {"sweep"}
+
+    wider = grid + backtest.build_grid([21], [30], [70], [10_000.0], [0.0], [0.0])
+    second = RunCache(store, config)
+    compute, calls = counting(lambda todo: sweep.run_grid(df, todo, workers=1))
+    metrics = second.metrics_many("sweep", wider, compute)
+    assert second.reused == len(grid)
+    assert calls == [wider[len(grid):]]
+    assert [dict(p, **m) for p, m in zip(grid, metrics)] == fresh
+
+
+def test_walk_forward_reuses_stored_windows(store):
+    df = synthetic_ohlcv(2000, seed=9)
+    grid = backtest.build_grid([7, 14], [30], [70], [10_000.0], [0.0], [0.0])
+    config = backtest.grid_config("KRW-BTC", 7, "minute5", df)
+    plain = backtest.walk_forward(df, grid, 800, 400, cache=IndicatorCache())
+
+    first = RunCache(store, config)
+    assert backtest.walk_forward(df, grid, 800, 400, results=first) == plain
+    kinds = {e["kind"] for e in store.entries()}
+    assert kinds == {"walk_forward"}
+
+    second = RunCache(store, config)
+    assert backtest.walk_forward(df, grid, 800, 400, results=second) == plain
+    windows = len(plain)
+    assert second.reused == windows * (len(grid) + 1)
+
+
+def test_store_without_backing_computes_everything():
+    cache = RunCache()
+    assert cache.metrics_many("sweep", [{"a": 1}], lambda todo: [{"n": len(todo)}]) == [{"n": 1}]
+    assert cache.reused == 0
+
+
+def test_strategy_keys_keep_full_precision():
+    a = parse_strategy("bollinger:window=20,k=1.5")
+    b = parse_strategy("bollinger:window=20,k=1.5000001")
+    assert a.label == b.label
+    assert a.spec != b.spec
+    assert result_key({"strategy": a.spec}) != result_key({"strategy": b.spec})
+    combo = parse_strategy("macd|bollinger:k=1.5000001")
+    assert combo.spec == "macd:fast=12,slow=26,signal=9|bollinger:window=20,k=1.5000001"
@@ -0,0 +1,53 @@
+import argparse
+import os
+
+import numpy as np
+import pytest
+
+import backtest
+from benchmarks.synthetic import synthetic_ohlcv
+from indicators import IndicatorGraph
+from report import load_trades
+from strategies import parse_strategy
+from trade_columns import load_trade_columns
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["nope", "macd:speed=3", "bollinger:k=wide", "rsi+macd|bollinger"],
+)
+def test_parse_strategy_rejects_bad_specs_for_argparse(text):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_strategy(text)
+
+
+def test_parse_strategy_combo():
+    combo = parse_strategy("macd+bollinger:window=30,k=1.5")
+    assert combo.mode == "all"
+    assert combo.label == "macd:fast=12,slow=26,signal=9+bollinger:window=30,k=1.5"
+
+
+@pytest.mark.parametrize("spec", ["rsi", "rsi_wilder", "ema_cross", "macd", "bollinger"])
+def test_stream_matches_vectorized_signals(spec):
+    df = synthetic_ohlcv(2000, seed=5)
+    strategy = parse_strategy(spec)
+    expected = strategy.signals(IndicatorGraph(df["close"]))
+    stream = strategy.stream()
+    got = np.array([stream.update(close) for close in df["close"]], dtype=np.int8)
+    np.testing.assert_array_equal(got, expected)
+
+
+def test_strategies_write_columnar_and_equity_outputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    df = synthetic_ohlcv(3000, seed=2)
+    strategies = [parse_strategy("macd"), parse_strategy("bollinger")]
+    backtest.run_strategies(df, strategies, columnar=True, equity=True)
+
+    for strategy in strategies:
+        slug = backtest.strategy_slug(strategy)
+        trades = load_trades(f"trades_{slug}.csv")
+        columns = load_trade_columns(f"{backtest.TRADE_COLUMNS_DIR}_{slug}")
+        assert trades
+        assert len(columns["time"]) == len(trades)
+        equity_dir = f"{backtest.EQUITY_COLUMNS_DIR}_{slug}"
+        assert os.path.exists(os.path.join(equity_dir, "equity.npy"))
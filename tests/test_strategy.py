@@ -0,0 +1,43 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_ohlcv
+from strategy import StreamingRSI, calculate_rsi
+
+
+def streamed(closes, period):
+    rsi = StreamingRSI(period)
+    values = [rsi.update(close) for close in closes]
+    return np.array([math.nan if v is None else v for v in values])
+
+
+def assert_bit_identical(closes, period):
+    expected = calculate_rsi(pd.Series(closes, dtype=float), period).to_numpy()
+    actual = streamed(closes, period)
+    missing = np.isnan(expected)
+    assert np.array_equal(np.isnan(actual), missing)
+    # Bit patterns, so 0.0 and -0.0 or a last-ulp difference also fail.
+    assert actual[~missing].view(np.int64).tolist() == (
+        expected[~missing].view(np.int64).tolist()
+    )
+
+
+@pytest.mark.parametrize("period", [2, 14, 50])
+def test_streaming_rsi_matches_pandas(period):
+    closes = synthetic_ohlcv(5000, regime="volatile", seed=11)["close"].to_numpy()
+    assert_bit_identical(closes, period)
+
+
+def test_streaming_rsi_flat_and_one_sided_prices():
+    closes = [100.0] * 30 + [101.0 + i for i in range(20)] + [90.0 - i for i in range(20)]
+    closes += [90.0] * 20
+    assert_bit_identical(closes, 14)
+
+
+def test_streaming_rsi_skips_missing_closes():
+    closes = synthetic_ohlcv(400, seed=5)["close"].to_numpy(copy=True)
+    closes[[3, 50, 51, 200]] = math.nan
+    assert_bit_identical(closes, 14)
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_ohlcv
+from strategy import StreamingRSI, calculate_rsi
+from strategy_state import load_rsi_state, save_rsi_state
+
+TICKER = "KRW-BTC"
+INTERVAL = "minute5"
+
+
+def saved_state(tmp_path, closes, period=14):
+    path = str(tmp_path / "strategy_state.json")
+    rsi = StreamingRSI(period)
+    for close in closes:
+        rsi.update(close)
+    last_time = datetime(2024, 1, 1, 9, 0) + timedelta(minutes=5 * (len(closes) - 1))
+    save_rsi_state(path, TICKER, INTERVAL, rsi, last_time)
+    return path, last_time
+
+
+def test_restored_state_continues_bit_identically(tmp_path):
+    closes = synthetic_ohlcv(2000, regime="volatile", seed=8)["close"].tolist()
+    path, last_time = saved_state(tmp_path, closes[:1200])
+
+    rsi, restored_time = load_rsi_state(path, TICKER, INTERVAL, 14)
+    assert restored_time == last_time
+    continued = [rsi.update(close) for close in closes[1200:]]
+
+    expected = calculate_rsi(pd.Series(closes), 14).iloc[1200:].tolist()
+    assert continued == expected
+    # A second save/load round trip mid-stream changes nothing either.
+    save_rsi_state(path, TICKER, INTERVAL, rsi, last_time)
+    again, _ = load_rsi_state(path, TICKER, INTERVAL, 14)
+    assert again.state() == rsi.state()
+
+
+def test_state_for_another_period_or_market_is_rejected(tmp_path):
+    closes = synthetic_ohlcv(100, seed=2)["close"].tolist()
+    path, _ = saved_state(tmp_path, closes)
+    for ticker, interval, period in [
+        (TICKER, INTERVAL, 7),
+        ("KRW-ETH", INTERVAL, 14),
+        (TICKER, "minute15", 14),
+    ]:
+        rsi, last_time = load_rsi_state(path, ticker, interval, period)
+        assert last_time is None
+        assert rsi.period == period
+        assert rsi.prev_close is None
+        assert rsi.value is None
+
+
+def test_missing_or_corrupt_state_starts_fresh(tmp_path):
+    path = str(tmp_path / "strategy_state.json")
+    rsi, last_time = load_rsi_state(path, TICKER, INTERVAL, 14)
+    assert last_time is None
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"ticker": "KRW-BTC", "interval": "minute5", "rsi": ')
+    rsi, last_time = load_rsi_state(path, TICKER, INTERVAL, 14)
+    assert last_time is None
+    assert rsi.prev_close is None
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import time
+
+import pandas as pd
+import pytest
+from websockets.asyncio.server import serve
+
+import tick_feed
+from tick_feed import TradeStream, epoch_ms, kst_time
+
+TICKER = "KRW-BTC"
+MINUTE_MS = 60_000
+
+
+def trade(timestamp_ms, price, volume=1.0, code=TICKER):
+    return json.dumps(
+        {
+            "type": "trade",
+            "code": code,
+            "trade_timestamp": timestamp_ms,
+            "trade_price": price,
+            "trade_volume": volume,
+        }
+    )
+
+
+class ReplayServer:
+    # Local trade feed: each connection replays the next batch of messages,
+    # then closes, so the stream has to reconnect for the following one.
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.subscriptions = []
+
+    async def handler(self, ws):
+        self.subscriptions.append(json.loads(await ws.recv()))
+        if not self.batches:
+            await ws.wait_closed()
+            return
+        for message in self.batches.pop(0):
+            await ws.send(message)
+
+    async def run(self, stream, timeout=5.0):
+        async with serve(self.handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            stream.url = f"ws://127.0.0.1:{port}"
+            await asyncio.wait_for(stream.run(), timeout)
+
+
+@pytest.fixture(autouse=True)
+def fast_reconnect(monkeypatch):
+    monkeypatch.setattr(tick_feed, "RECONNECT_MIN_SEC", 0.01)
+
+
+def future_bucket(minutes=1):
+    # Buckets an hour ahead, so the close clock never fires during a test.
+    now_ms = int(time.time() * 1000) + 3_600_000
+    return now_ms - now_ms % (minutes * MINUTE_MS)
+
+
+def collect(stream, candles, ticks, stop_after):
+    def on_candle(candle):
+        candles.append(candle)
+        if len(candles) >= stop_after:
+            stream.stop()
+
+    stream.on_candle = on_candle
+    stream.on_tick = ticks.append
+
+
+def test_stream_builds_candles_from_trades():
+    start = future_bucket()
+    batch = [
+        trade(start + 1_000, 100.0, 1.0),
+        trade(start + 2_000, 105.0, 2.0),
+        trade(start + 3_000, 95.0, 1.0, code="KRW-ETH"),
+        trade(start + 4_000, 98.0, 1.0),
+        trade(start + MINUTE_MS + 1_000, 101.0, 0.5),
+        trade(start + 2 * MINUTE_MS + 1_000, 102.0, 1.0),
+    ]
+    stream = TradeStream(TICKER)
+    candles, ticks = [], []
+    collect(stream, candles, ticks, stop_after=2)
+    server = ReplayServer([batch])
+    asyncio.run(server.run(stream))
+
+    assert server.subscriptions[0][1]["codes"] == [TICKER]
+    first, second = candles
+    assert first == {
+        "time": kst_time(start),
+        "open": 100.0,
+        "high": 105.0,
+        "low": 98.0,
+        "close": 98.0,
+        "volume": 4.0,
+        "value": 100.0 + 210.0 + 98.0,
+    }
+    assert second["time"] == kst_time(start + MINUTE_MS)
+    assert second["open"] == second["close"] == 101.0
+    assert ticks == [100.0, 105.0, 98.0, 101.0, 102.0]
+    assert stream.builder.current["open"] == 102.0
+
+
+def test_stream_reconnects_and_drops_late_trades():
+    start = future_bucket()
+    first = [
+        trade(start + 1_000, 100.0),
+        trade(start + MINUTE_MS + 1_000, 110.0),
+    ]
+    # A replayed trade from the closed bucket after the reconnect is late.
+    second = [
+        trade(start + 2_000, 90.0),
+        trade(start + MINUTE_MS + 2_000, 120.0),
+        trade(start + 2 * MINUTE_MS + 1_000, 130.0),
+    ]
+    stream = TradeStream(TICKER)
+    candles, ticks = [], []
+    collect(stream, candles, ticks, stop_after=2)
+    server = ReplayServer([first, second])
+    asyncio.run(server.run(stream))
+
+    assert len(server.subscriptions) == 2
+    assert [c["time"] for c in candles] == [kst_time(start), kst_time(start + MINUTE_MS)]
+    assert candles[0]["low"] == 100.0
+    assert candles[1]["open"] == 110.0
+    assert candles[1]["close"] == 120.0
+    assert stream.builder.late_trades == 1
+
+
+def test_backfill_emits_missed_candles_and_seeds_the_forming_one():
+    minutes = 60
+    bucket_ms = minutes * MINUTE_MS
+    now_ms = int(time.time() * 1000)
+    current = now_ms - now_ms % bucket_ms
+    starts = [current - 3 * bucket_ms, current - 2 * bucket_ms, current - bucket_ms, current]
+    df = pd.DataFrame(
+        {
+            "open": [10.0, 11.0, 12.0, 13.0],
+            "high": [10.5, 11.5, 12.5, 13.5],
+            "low": [9.5, 10.5, 11.5, 12.5],
+            "close": [10.2, 11.2, 12.2, 13.2],
+            "volume": [1.0, 2.0, 3.0, 4.0],
+            "value": [10.0, 22.0, 36.0, 52.0],
+        },
+        index=pd.DatetimeIndex([kst_time(ms) for ms in starts]),
+    )
+    calls = []
+
+    def get_ohlcv(ticker, interval, count):
+        calls.append((ticker, interval, count))
+        return df
+
+    stream = TradeStream(TICKER, minutes, get_ohlcv=get_ohlcv)
+    stream.builder.last_closed = starts[0]
+    candles, ticks = [], []
+    collect(stream, candles, ticks, stop_after=3)
+    # The live trade lands in the forming candle seeded from REST.
+    server = ReplayServer([[trade(now_ms, 14.0, 1.0)]])
+    stream.on_tick = lambda price: (ticks.append(price), stream.stop())
+    asyncio.run(server.run(stream))
+
+    assert calls == [(TICKER, f"minute{minutes}", 4)]
+    assert [c["close"] for c in candles] == [11.2, 12.2]
+    assert stream.builder.last_closed == starts[2]
+    assert stream.builder.bucket_start == current
+    forming = stream.builder.current
+    assert forming["open"] == 13.0
+    assert forming["high"] == 14.0
+    assert forming["close"] == 14.0
+    assert forming["volume"] == 5.0
+    assert ticks == [14.0]
+
+
+def test_bad_frames_and_failing_callbacks_do_not_stop_the_stream():
+    start = future_bucket()
+    batch = [
+        "not json",
+        json.dumps(["trade"]),
+        json.dumps({"type": "trade", "code": TICKER, "trade_price": 1.0}),
+        json.dumps(
+            {
+                "type": "trade",
+                "code": TICKER,
+                "trade_timestamp": start,
+                "trade_price": None,
+                "trade_volume": 1.0,
+            }
+        ),
+        trade(start + 1_000, 100.0),
+        trade(start + MINUTE_MS + 1_000, 110.0),
+        trade(start + 2 * MINUTE_MS + 1_000, 120.0),
+        trade(start + 3 * MINUTE_MS + 1_000, 130.0),
+    ]
+    stream = TradeStream(TICKER)
+    candles, ticks = [], []
+
+    def on_candle(candle):
+        candles.append(candle)
+        if len(candles) == 1:
+            raise RuntimeError("strategy failed")
+        if len(candles) >= 3:
+            stream.stop()
+
+    def on_tick(price):
+        ticks.append(price)
+        raise ValueError("tick handler failed")
+
+    stream.on_candle = on_candle
+    stream.on_tick = on_tick
+    server = ReplayServer([batch])
+    asyncio.run(server.run(stream))
+
+    assert len(server.subscriptions) == 1
+    assert [c["open"] for c in candles] == [100.0, 110.0, 120.0]
+    assert ticks == [100.0, 110.0, 120.0, 130.0]
+
+
+def test_failed_backfill_reconnects_and_retries():
+    minutes = 60
+    bucket_ms = minutes * MINUTE_MS
+    now_ms = int(time.time() * 1000)
+    current = now_ms - now_ms % bucket_ms
+    starts = [current - 2 * bucket_ms, current - bucket_ms]
+    df = pd.DataFrame(
+        {
+            "open": [10.0, 11.0],
+            "high": [10.5, 11.5],
+            "low": [9.5, 10.5],
+            "close": [10.2, 11.2],
+            "volume": [1.0, 2.0],
+            "value": [10.0, 22.0],
+        },
+        index=pd.DatetimeIndex([kst_time(ms) for ms in starts]),
+    )
+    calls = []
+
+    def get_ohlcv(ticker, interval, count):
+        calls.append(count)
+        if len(calls) == 1:
+            raise ValueError("REST timeout")
+        return df
+
+    stream = TradeStream(TICKER, minutes, get_ohlcv=get_ohlcv)
+    stream.builder.last_closed = starts[0]
+    candles, ticks = [], []
+    collect(stream, candles, ticks, stop_after=1)
+    server = ReplayServer([[], []])
+    asyncio.run(server.run(stream))
+
+    assert len(calls) == 2
+    assert len(server.subscriptions) == 2
+    assert [c["close"] for c in candles] == [11.2]
+
+
+def test_epoch_round_trip():
+    ms = 1_767_225_600_000
+    assert epoch_ms(kst_time(ms)) == ms
+    assert epoch_ms(pd.Timestamp(kst_time(ms))) == ms
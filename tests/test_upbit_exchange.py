@@ -0,0 +1,245 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from urllib.parse import parse_qs, urlparse
+import uuid
+
+import jwt
+import pytest
+
+from upbit_exchange import UpbitAPIError, UpbitExchange
+
+ACCESS_KEY = "access"
+SECRET_KEY = "test-secret-key-for-the-local-mock-server"
+
+
+class FakeUpbit:
+    # In-memory exchange state behind the mock /v1 endpoints. Market orders
+    # stay "wait" for wait_polls lookups, then fill at price.
+    def __init__(self, krw=1_000_000.0, coin=0.0, price=100.0, wait_polls=1):
+        self.accounts = {"KRW": krw, "BTC": coin}
+        self.price = price
+        self.wait_polls = wait_polls
+        self.fee_rate = 0.0005
+        self.orders = {}
+        self.polls = {}
+        self.requests = []
+        self.fail_accounts = 0
+        self.lock = threading.Lock()
+
+    def get_accounts(self):
+        if self.fail_accounts:
+            self.fail_accounts -= 1
+            return 500, {"error": {"message": "unavailable"}}
+        return 200, [
+            {"currency": currency, "balance": str(balance), "locked": "0", "avg_buy_price": "0"}
+            for currency, balance in self.accounts.items()
+        ]
+
+    def place_order(self, body):
+        order = {
+            "uuid": str(uuid.uuid4()),
+            "market": body["market"],
+            "side": body["side"],
+            "ord_type": body["ord_type"],
+            "state": "wait",
+            "executed_volume": "0",
+            "paid_fee": "0",
+            "trades": [],
+            "request": body,
+        }
+        self.orders[order["uuid"]] = order
+        self.polls[order["uuid"]] = 0
+        return 200, {k: v for k, v in order.items() if k != "request"}
+
+    def get_order(self, order_uuid):
+        order = self.orders.get(order_uuid)
+        if order is None:
+            return 404, {"error": {"message": "order not found"}}
+        self.polls[order_uuid] += 1
+        if order["state"] == "wait" and self.polls[order_uuid] >= self.wait_polls:
+            self._fill(order)
+        return 200, {k: v for k, v in order.items() if k != "request"}
+
+    def _fill(self, order):
+        body = order["request"]
+        if order["side"] == "bid":
+            funds = float(body["price"])
+            volume = funds / self.price
+            fee = funds * self.fee_rate
+            self.accounts["KRW"] -= funds + fee
+            self.accounts["BTC"] += volume
+        else:
+            volume = float(body["volume"])
+            funds = volume * self.price
+            fee = funds * self.fee_rate
+            self.accounts["BTC"] -= volume
+            self.accounts["KRW"] += funds - fee
+        order.update(
+            state="done",
+            executed_volume=str(volume),
+            paid_fee=str(fee),
+            trades=[{"price": str(self.price), "volume": str(volume), "funds": str(funds)}],
+        )
+
+
+class UpbitHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self):
+        header = self.headers.get("Authorization", "")
+        if not header.startswith("Bearer "):
+            return False
+        payload = jwt.decode(header[7:], SECRET_KEY, algorithms=["HS256"])
+        return payload["access_key"] == ACCESS_KEY
+
+    def _handle(self, method):
+        fake = self.server.fake
+        url = urlparse(self.path)
+        if not self._authorized():
+            self._reply(401, {"error": {"message": "unauthorized"}})
+            return
+        with fake.lock:
+            fake.requests.append((method, url.path))
+            if method == "GET" and url.path == "/v1/accounts":
+                status, payload = fake.get_accounts()
+            elif method == "POST" and url.path == "/v1/orders":
+                length = int(self.headers.get("Content-Length", 0))
+                status, payload = fake.place_order(json.loads(self.rfile.read(length)))
+            elif method == "GET" and url.path == "/v1/order":
+                status, payload = fake.get_order(parse_qs(url.query)["uuid"][0])
+            else:
+                status, payload = 404, {"error": {"message": "not found"}}
+        self._reply(status, payload)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+
+@pytest.fixture
+def fake():
+    fake = FakeUpbit()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), UpbitHandler)
+    server.fake = fake
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    fake.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+
+def make_exchange(fake, **kwargs):
+    kwargs.setdefault("poll_sec", 0.01)
+    kwargs.setdefault("poll_timeout_sec", 2.0)
+    return UpbitExchange(ACCESS_KEY, SECRET_KEY, base_url=fake.url, **kwargs)
+
+
+def order_posts(fake):
+    return [r for r in fake.requests if r == ("POST", "/v1/orders")]
+
+
+def test_buy_returns_accepted_order_and_fill_updates_cache(fake):
+    exchange = make_exchange(fake)
+    exchange.start()
+    order = exchange.buy_market_order("KRW-BTC", 10_000)
+    assert order["state"] == "wait"
+    assert order["side"] == "bid"
+    exchange.close()
+
+    assert exchange.balances.balance("BTC") == pytest.approx(100.0)
+    assert exchange.balances.balance("KRW") == pytest.approx(1_000_000 - 10_000 * 1.0005)
+    assert ("GET", "/v1/order") in fake.requests
+
+
+def test_submit_buy_resolves_to_the_polled_order(fake):
+    fake.wait_polls = 3
+    exchange = make_exchange(fake)
+    exchange.start()
+    final = exchange.submit_buy("KRW-BTC", 20_000).result(timeout=5)
+    exchange.close()
+
+    assert final["state"] == "done"
+    assert float(final["executed_volume"]) == pytest.approx(200.0)
+    assert fake.polls[final["uuid"]] == 3
+
+
+def test_sell_uses_cached_volume(fake):
+    fake.accounts["BTC"] = 0.5
+    exchange = make_exchange(fake)
+    exchange.start()
+    accounts_calls = fake.requests.count(("GET", "/v1/accounts"))
+    order = exchange.sell_market_order("KRW-BTC")
+    exchange.close()
+
+    placed = fake.orders[order["uuid"]]["request"]
+    assert placed == {"market": "KRW-BTC", "side": "ask", "volume": "0.5", "ord_type": "market"}
+    assert fake.requests.count(("GET", "/v1/accounts")) == accounts_calls
+    assert exchange.balances.balance("BTC") == 0.0
+
+
+def test_sell_after_failed_startup_refresh(fake):
+    fake.accounts["BTC"] = 0.25
+    fake.fail_accounts = 1
+    exchange = make_exchange(fake)
+    with pytest.raises(UpbitAPIError):
+        exchange.start()
+    assert not exchange.balances.loaded
+
+    order = exchange.sell_market_order("KRW-BTC")
+    exchange.close()
+    assert fake.orders[order["uuid"]]["request"]["volume"] == "0.25"
+    assert exchange.balances.loaded
+
+
+def test_sell_waits_for_a_buy_still_being_polled(fake):
+    fake.wait_polls = 5
+    exchange = make_exchange(fake)
+    exchange.start()
+    exchange.buy_market_order("KRW-BTC", 10_000)
+    order = exchange.sell_market_order("KRW-BTC")
+    exchange.close()
+
+    assert float(fake.orders[order["uuid"]]["request"]["volume"]) == pytest.approx(100.0)
+
+
+def test_sell_without_holdings_raises(fake):
+    exchange = make_exchange(fake, poll_timeout_sec=0.1)
+    exchange.start()
+    with pytest.raises(RuntimeError, match="No balance to sell"):
+        exchange.sell_market_order("KRW-BTC")
+    exchange.close()
+    assert order_posts(fake) == []
+
+
+def test_refresh_keeps_fill_tracked_snapshot_while_an_order_is_pending(fake):
+    exchange = make_exchange(fake)
+    exchange.start()
+    exchange.balances.begin_order()
+    fake.accounts["BTC"] = 3.0
+    assert exchange.balances.refresh() is False
+    assert exchange.balances.balance("BTC") == 0.0
+    exchange.balances.end_order()
+    assert exchange.balances.refresh() is True
+    assert exchange.balances.balance("BTC") == 3.0
+    exchange.close()
+
+
+def test_one_shot_exchange_does_not_poll_sync_orders(fake):
+    exchange = make_exchange(fake, watch_fills=False)
+    exchange.buy_market_order("KRW-BTC", 10_000)
+    exchange.close()
+    assert ("GET", "/v1/order") not in fake.requests
+    assert exchange.balances.wait_idle(0)
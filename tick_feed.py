@@ -0,0 +1,226 @@
+import asyncio
+from datetime import datetime, timezone
+import json
+import time
+import uuid
+
+import pyupbit
+import websockets
+from loguru import logger
+
+from market_data import KST_OFFSET
+
+UPBIT_WS_URL = "wss://api.upbit.com/websocket/v1"
+RECONNECT_MIN_SEC = 1.0
+RECONNECT_MAX_SEC = 30.0
+CLOSE_GRACE_SEC = 0.2
+
+
+def kst_time(epoch_ms):
+    utc = datetime.fromtimestamp(epoch_ms / 1000, timezone.utc).replace(tzinfo=None)
+    return utc + KST_OFFSET
+
+
+def epoch_ms(kst):
+    if hasattr(kst, "to_pydatetime"):
+        kst = kst.to_pydatetime()
+    return int((kst - KST_OFFSET).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+class CandleBuilder:
+    def __init__(self, minutes=1):
+        self.bucket_ms = minutes * 60_000
+        self.current = None
+        self.bucket_start = None
+        self.last_closed = None
+        self.late_trades = 0
+
+    def add_trade(self, timestamp_ms, price, volume):
+        # Returns the candle closed by this trade, if it opened a new bucket.
+        start = timestamp_ms - timestamp_ms % self.bucket_ms
+        if self.last_closed is not None and start <= self.last_closed:
+            self.late_trades += 1
+            return None
+
+        closed = None
+        if self.bucket_start is not None and start > self.bucket_start:
+            closed = self._close()
+
+        if self.current is None:
+            self.bucket_start = start
+            self.current = {
+                "time": kst_time(start),
+                "open": price,
+                "high": price,
+                "low": price,
+                "close": price,
+                "volume": 0.0,
+                "value": 0.0,
+            }
+        candle = self.current
+        candle["high"] = max(candle["high"], price)
+        candle["low"] = min(candle["low"], price)
+        candle["close"] = price
+        candle["volume"] += volume
+        candle["value"] += price * volume
+        return closed
+
+    def close_due(self, now_ms):
+        if self.bucket_start is None or now_ms < self.bucket_start + self.bucket_ms:
+            return None
+        return self._close()
+
+    def _close(self):
+        closed = self.current
+        self.last_closed = self.bucket_start
+        self.current = None
+        self.bucket_start = None
+        return closed
+
+    def seed(self, candle, start_ms):
+        # Resume a partially built bucket from REST after a reconnect.
+        self.current = dict(candle)
+        self.bucket_start = start_ms
+
+    def next_close_ms(self):
+        if self.bucket_start is None:
+            return None
+        return self.bucket_start + self.bucket_ms
+
+
+class TradeStream:
+    def __init__(
+        self,
+        ticker,
+        minutes=1,
+        on_candle=None,
+        on_tick=None,
+        url=UPBIT_WS_URL,
+        get_ohlcv=pyupbit.get_ohlcv,
+    ):
+        self.ticker = ticker
+        self.minutes = minutes
+        self.on_candle = on_candle
+        self.on_tick = on_tick
+        self.url = url
+        self.get_ohlcv = get_ohlcv
+        self.builder = CandleBuilder(minutes)
+        self._stopped = False
+        self._ws = None
+
+    def stop(self):
+        self._stopped = True
+        if self._ws is not None:
+            asyncio.ensure_future(self._ws.close())
+
+    def _emit(self, candle):
+        if candle is None or self.on_candle is None:
+            return
+        # A failing callback loses this candle, not the stream.
+        try:
+            self.on_candle(candle)
+        except Exception:
+            logger.exception("Candle callback failed for {}", candle["time"])
+
+    def handle_message(self, message):
+        try:
+            data = json.loads(message)
+            if data.get("type") != "trade" or data.get("code") != self.ticker:
+                return
+            timestamp_ms = int(data["trade_timestamp"])
+            price = float(data["trade_price"])
+            volume = float(data["trade_volume"])
+        except (AttributeError, KeyError, TypeError, ValueError) as exc:
+            logger.warning("Skipping malformed trade message: {!r}", exc)
+            return
+        self._emit(self.builder.add_trade(timestamp_ms, price, volume))
+        if self.on_tick is not None:
+            try:
+                self.on_tick(price)
+            except Exception:
+                logger.exception("Tick callback failed")
+
+    async def backfill(self):
+        # Fill candles missed while disconnected from REST, then resume the
+        # forming candle from its REST snapshot.
+        last = self.builder.last_closed
+        if last is None:
+            return
+        now_ms = int(time.time() * 1000)
+        bucket_ms = self.builder.bucket_ms
+        count = int((now_ms - last) // bucket_ms) + 1
+        if count <= 1:
+            return
+        try:
+            df = await asyncio.to_thread(
+                self.get_ohlcv,
+                self.ticker,
+                interval=f"minute{self.minutes}",
+                count=min(count, 200),
+            )
+        except Exception as exc:
+            # Handled like a disconnect: run() reconnects and backfills again.
+            raise ConnectionError(f"backfill failed: {exc}") from exc
+        if df is None or df.empty:
+            logger.warning("Backfill returned no candles for {}", self.ticker)
+            return
+
+        current_start = now_ms - now_ms % bucket_ms
+        for ts, row in df.iterrows():
+            start_ms = epoch_ms(ts)
+            if start_ms <= self.builder.last_closed:
+                continue
+            candle = {"time": ts.to_pydatetime(), **{k: float(row[k]) for k in row.index}}
+            if start_ms >= current_start:
+                self.builder.seed(candle, start_ms)
+                break
+            self.builder.current = None
+            self.builder.bucket_start = None
+            self.builder.last_closed = start_ms
+            self._emit(candle)
+
+    async def _clock(self):
+        while not self._stopped:
+            close_ms = self.builder.next_close_ms()
+            now_ms = time.time() * 1000
+            if close_ms is None:
+                await asyncio.sleep(CLOSE_GRACE_SEC)
+                continue
+            wait = (close_ms - now_ms) / 1000 + CLOSE_GRACE_SEC
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            self._emit(self.builder.close_due(int(now_ms)))
+
+    def subscription(self):
+        return json.dumps(
+            [
+                {"ticket": str(uuid.uuid4())},
+                {"type": "trade", "codes": [self.ticker], "isOnlyRealtime": True},
+                {"format": "DEFAULT"},
+            ]
+        )
+
+    async def run(self):
+        delay = RECONNECT_MIN_SEC
+        clock = asyncio.create_task(self._clock())
+        try:
+            while not self._stopped:
+                try:
+                    async with websockets.connect(self.url) as ws:
+                        self._ws = ws
+                        await ws.send(self.subscription())
+                        await self.backfill()
+                        delay = RECONNECT_MIN_SEC
+                        async for message in ws:
+                            self.handle_message(message)
+                except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as exc:
+                    logger.warning("Trade stream disconnected: {}", exc)
+                finally:
+                    self._ws = None
+                if self._stopped:
+                    break
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_SEC)
+        finally:
+            clock.cancel()
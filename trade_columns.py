@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+
+TRADE_COLUMNS_DIR = "trades_columns"
+EQUITY_COLUMNS_DIR = "equity_curve"
+FLOAT_COLUMNS = ["price", "qty", "fee", "balance", "position", "pnl"]
+EQUITY_COLUMNS = ["time", "equity", "position", "cash"]
+SIGNAL_CODES = {"buy": 1, "sell": -1}
+SIGNAL_NAMES = {1: "buy", -1: "sell"}
+
+
+def trades_to_columns(rows):
+    count = len(rows)
+    columns = {
+        "time": np.array([row["time"] for row in rows], dtype="datetime64[s]").astype(
+            np.int64
+        ),
+        "signal": np.fromiter(
+            (SIGNAL_CODES[row["signal"]] for row in rows), dtype=np.int8, count=count
+        ),
+    }
+    for name in FLOAT_COLUMNS:
+        columns[name] = np.fromiter(
+            (row[name] for row in rows), dtype=np.float64, count=count
+        )
+    return columns
+
+
+def write_columns(columns, directory):
+    # One .npy file per column; `time` holds epoch seconds of the candle time.
+    os.makedirs(directory, exist_ok=True)
+    for name, values in columns.items():
+        np.save(os.path.join(directory, f"{name}.npy"), values)
+
+
+def load_columns(directory, names, mmap_mode="r"):
+    columns = {}
+    for name in names:
+        path = os.path.join(directory, f"{name}.npy")
+        if not os.path.exists(path):
+            return None
+        columns[name] = np.load(path, mmap_mode=mmap_mode)
+    return columns
+
+
+def write_trade_columns(rows, directory):
+    write_columns(trades_to_columns(rows), directory)
+
+
+def load_trade_columns(directory, mmap_mode="r"):
+    return load_columns(directory, ["time", "signal"] + FLOAT_COLUMNS, mmap_mode)
@@ -0,0 +1,67 @@
+from config import (
+    DAILY_LOSS_LIMIT_PCT,
+    MAX_INVEST_RATIO,
+    STOP_LOSS_PCT,
+    TAKE_PROFIT_PCT,
+    TRADE_AMOUNT_KRW,
+)
+
+
+class RiskRules:
+    def __init__(
+        self,
+        trade_amount=TRADE_AMOUNT_KRW,
+        max_invest_ratio=MAX_INVEST_RATIO,
+        stop_loss_pct=STOP_LOSS_PCT,
+        take_profit_pct=TAKE_PROFIT_PCT,
+        daily_loss_limit_pct=DAILY_LOSS_LIMIT_PCT,
+    ):
+        self.trade_amount = float(trade_amount)
+        self.max_invest_ratio = max_invest_ratio
+        self.stop_loss_pct = stop_loss_pct
+        self.take_profit_pct = take_profit_pct
+        self.daily_loss_limit_pct = daily_loss_limit_pct
+
+
+LIVE_RULES = RiskRules()
+
+
+def exit_reason(broker, price, rules=LIVE_RULES):
+    if broker.coin_amount <= 0 or broker.avg_buy_price <= 0:
+        return None
+
+    change_pct = (price - broker.avg_buy_price) / broker.avg_buy_price
+    if rules.stop_loss_pct and change_pct <= -rules.stop_loss_pct:
+        return "stop_loss"
+    if rules.take_profit_pct and change_pct >= rules.take_profit_pct:
+        return "take_profit"
+    return None
+
+
+def buy_blocked(broker, price, rules=LIVE_RULES):
+    total_equity = broker.get_total_equity(price)
+    current_coin_value = broker.coin_amount * price
+    spend = min(rules.trade_amount, broker.krw_balance)
+    max_coin_value = total_equity * rules.max_invest_ratio
+    return current_coin_value >= max_coin_value or (
+        current_coin_value + spend > max_coin_value
+    )
+
+
+def apply_rules(broker, signal, price, rules=LIVE_RULES):
+    # The paper decision path of run_once without logging, returning
+    # (event, result). Callers run broker.refresh_day first.
+    if broker.get_daily_loss_pct(price) <= -rules.daily_loss_limit_pct:
+        return "daily_loss_limit", None
+
+    reason = exit_reason(broker, price, rules)
+    if reason is not None:
+        return reason, broker.sell_all(price=price)
+
+    if signal == "buy":
+        if buy_blocked(broker, price, rules):
+            return "max_invest_ratio", {"status": "skipped", "reason": "max_invest_ratio"}
+        return "buy", broker.buy(price=price, amount_krw=rules.trade_amount)
+    if signal == "sell":
+        return "sell", broker.sell_all(price=price)
+    return "hold", {"status": "skipped", "reason": "hold"}
@@ -1,26 +1,59 @@
 import pyupbit
 
+from instrumentation import metrics
+from market_data import fetch_ohlcv_cached
+from upbit_exchange import UPBIT_API_URL, UpbitExchange
+
 
 class UpbitClient:
-    def __init__(self, access_key=None, secret_key=None):
-        self.upbit = None
+    def __init__(
+        self,
+        access_key=None,
+        secret_key=None,
+        candle_store=None,
+        base_url=UPBIT_API_URL,
+        refresh_sec=0,
+        watch_fills=True,
+    ):
+        self.exchange = None
+        self.candle_store = candle_store
         if access_key and secret_key:
-            self.upbit = pyupbit.Upbit(access_key, secret_key)
+            self.exchange = UpbitExchange(
+                access_key,
+                secret_key,
+                base_url=base_url,
+                refresh_sec=refresh_sec,
+                watch_fills=watch_fills,
+            )
+
+    def _require_exchange(self):
+        if not self.exchange:
+            raise RuntimeError("Upbit keys are not set.")
+        return self.exchange
+
+    def start(self):
+        # Preloads balances and keeps them (and the connection) warm.
+        if self.exchange:
+            self.exchange.start()
+
+    def close(self):
+        if self.exchange:
+            self.exchange.close()
 
     def get_ohlcv(self, ticker, interval="minute5", count=200):
-        return pyupbit.get_ohlcv(ticker, interval=interval, count=count)
+        with metrics.timer("fetch_ohlcv"):
+            if self.candle_store is not None:
+                return fetch_ohlcv_cached(self.candle_store, ticker, interval, count)
+            return pyupbit.get_ohlcv(ticker, interval=interval, count=count)
 
     def buy_market_order(self, ticker, amount_krw):
-        if not self.upbit:
-            raise RuntimeError("Upbit keys are not set.")
-        return self.upbit.buy_market_order(ticker, amount_krw)
+        return self._require_exchange().buy_market_order(ticker, amount_krw)
 
     def sell_market_order(self, ticker):
-        if not self.upbit:
-            raise RuntimeError("Upbit keys are not set.")
-        balance = self.upbit.get_balance(ticker)
-        if balance is None:
-            raise RuntimeError("Failed to fetch balance.")
-        if balance <= 0:
-            raise RuntimeError("No balance to sell.")
-        return self.upbit.sell_market_order(ticker, balance)
+        return self._require_exchange().sell_market_order(ticker)
+
+    def submit_buy(self, ticker, amount_krw):
+        return self._require_exchange().submit_buy(ticker, amount_krw)
+
+    def submit_sell(self, ticker):
+        return self._require_exchange().submit_sell(ticker)
@@ -0,0 +1,288 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+import uuid
+
+import jwt
+import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
+
+from instrumentation import metrics
+
+UPBIT_API_URL = "https://api.upbit.com"
+HTTP_TIMEOUT_SEC = 5.0
+POOL_SIZE = 4
+ORDER_POLL_SEC = 0.2
+ORDER_POLL_TIMEOUT_SEC = 10.0
+ORDER_WORKERS = 2
+FINAL_ORDER_STATES = ("done", "cancel")
+ORDER_STAGES = {"bid": "order_buy", "ask": "order_sell"}
+
+
+class UpbitAPIError(RuntimeError):
+    def __init__(self, status, body):
+        super().__init__(f"Upbit API error {status}: {body}")
+        self.status = status
+        self.body = body
+
+
+class UpbitSession:
+    # Exchange REST calls over one keep-alive session, so orders reuse warm
+    # TLS connections instead of handshaking on the critical path.
+    def __init__(self, access_key, secret_key, base_url=UPBIT_API_URL, timeout=HTTP_TIMEOUT_SEC):
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _headers(self, query=None):
+        # Same JWT scheme as pyupbit.Upbit.
+        payload = {"access_key": self.access_key, "nonce": str(uuid.uuid4())}
+        if query:
+            query_string = urlencode(query, doseq=True).replace("%5B%5D=", "[]=")
+            payload["query_hash"] = hashlib.sha512(query_string.encode()).hexdigest()
+            payload["query_hash_alg"] = "SHA512"
+        token = jwt.encode(payload, self.secret_key, algorithm="HS256")
+        return {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+
+    def request(self, method, path, params=None, body=None):
+        query = body if body is not None else params
+        response = self.session.request(
+            method,
+            self.base_url + path,
+            params=params,
+            json=body,
+            headers=self._headers(query),
+            timeout=self.timeout,
+        )
+        if response.status_code >= 400:
+            raise UpbitAPIError(response.status_code, response.text)
+        return response.json()
+
+    def get_accounts(self):
+        return self.request("GET", "/v1/accounts")
+
+    def place_order(self, body):
+        return self.request("POST", "/v1/orders", body=body)
+
+    def get_order(self, order_uuid):
+        return self.request("GET", "/v1/order", params={"uuid": order_uuid})
+
+    def close(self):
+        self.session.close()
+
+
+def order_funds(order):
+    trades = order.get("trades") or []
+    return sum(float(trade["funds"]) for trade in trades)
+
+
+class BalanceCache:
+    # Account snapshot kept current from fill responses; a background
+    # refresh reconciles it with /v1/accounts whenever no order is in flight.
+    def __init__(self, session, refresh_sec=0):
+        self.session = session
+        self.refresh_sec = refresh_sec
+        self.balances = {}
+        self.loaded = False
+        self._fills = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def refresh(self, force=False):
+        fills = self._fills
+        with metrics.timer("balance_refresh"):
+            accounts = self.session.get_accounts()
+        balances = {
+            account["currency"]: {
+                "balance": float(account["balance"]),
+                "locked": float(account.get("locked") or 0.0),
+                "avg_buy_price": float(account.get("avg_buy_price") or 0.0),
+            }
+            for account in accounts
+        }
+        with self._lock:
+            if not force and (self._pending or fills != self._fills):
+                # The response may or may not include an in-flight fill, so
+                # keep the fill-tracked snapshot.
+                return False
+            self.balances = balances
+            self.loaded = True
+        return True
+
+    def balance(self, currency):
+        with self._lock:
+            entry = self.balances.get(currency)
+            return entry["balance"] if entry else 0.0
+
+    def begin_order(self):
+        with self._lock:
+            self._pending += 1
+
+    def end_order(self, order=None):
+        # order is the final order, or None when its fill is unknown (the
+        # next refresh then reconciles).
+        with self._lock:
+            if order is not None:
+                self._apply_fill(order)
+            self._pending = max(self._pending - 1, 0)
+            self._fills += 1
+            self._idle.notify_all()
+        self._wake.set()
+
+    def wait_idle(self, timeout):
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending, timeout)
+
+    def _apply_fill(self, order):
+        executed = float(order.get("executed_volume") or 0.0)
+        if executed <= 0:
+            return
+        fiat, coin = order["market"].split("-")
+        funds = order_funds(order)
+        fee = float(order.get("paid_fee") or 0.0)
+        coin_entry = self.balances.setdefault(
+            coin, {"balance": 0.0, "locked": 0.0, "avg_buy_price": 0.0}
+        )
+        fiat_entry = self.balances.setdefault(
+            fiat, {"balance": 0.0, "locked": 0.0, "avg_buy_price": 0.0}
+        )
+        if order["side"] == "bid":
+            held = coin_entry["balance"]
+            cost = coin_entry["avg_buy_price"] * held + funds
+            coin_entry["balance"] = held + executed
+            coin_entry["avg_buy_price"] = cost / coin_entry["balance"]
+            fiat_entry["balance"] -= funds + fee
+        else:
+            coin_entry["balance"] = max(coin_entry["balance"] - executed, 0.0)
+            fiat_entry["balance"] += funds - fee
+
+    def start(self):
+        if self.refresh_sec <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopped:
+            try:
+                self.refresh()
+            except Exception as exc:
+                logger.warning("Balance refresh failed: {}", exc)
+            self._wake.wait(self.refresh_sec)
+            self._wake.clear()
+
+
+class UpbitExchange:
+    def __init__(
+        self,
+        access_key,
+        secret_key,
+        base_url=UPBIT_API_URL,
+        refresh_sec=0,
+        poll_sec=ORDER_POLL_SEC,
+        poll_timeout_sec=ORDER_POLL_TIMEOUT_SEC,
+        watch_fills=True,
+    ):
+        self.session = UpbitSession(access_key, secret_key, base_url=base_url)
+        self.balances = BalanceCache(self.session, refresh_sec=refresh_sec)
+        self.poll_sec = poll_sec
+        self.poll_timeout_sec = poll_timeout_sec
+        # Off for one-shot runs: polling a sync order's fill only keeps the
+        # balance cache current for later orders.
+        self.watch_fills = watch_fills
+        self._pool = ThreadPoolExecutor(max_workers=ORDER_WORKERS)
+
+    def start(self):
+        # Loads balances (which also opens the connection) and keeps both warm.
+        self.balances.refresh()
+        self.balances.start()
+
+    def close(self):
+        self.balances.stop()
+        self._pool.shutdown(wait=True)
+        self.session.close()
+
+    def wait_for_fill(self, order):
+        deadline = time.monotonic() + self.poll_timeout_sec
+        while order.get("state") not in FINAL_ORDER_STATES:
+            if time.monotonic() >= deadline:
+                logger.warning("Order {} not final after {}s", order["uuid"], self.poll_timeout_sec)
+                return order
+            time.sleep(self.poll_sec)
+            order = self.session.get_order(order["uuid"])
+        return order
+
+    def _watch(self, order):
+        final = None
+        try:
+            order = self.wait_for_fill(order)
+            if order.get("state") in FINAL_ORDER_STATES:
+                final = order
+        except Exception as exc:
+            logger.warning("Order fill polling failed: {}", exc)
+        finally:
+            self.balances.end_order(final)
+        return order
+
+    def _send(self, body):
+        self.balances.begin_order()
+        try:
+            with metrics.timer(ORDER_STAGES[body["side"]]):
+                return self.session.place_order(body)
+        except Exception:
+            self.balances.end_order()
+            raise
+
+    def _place(self, body):
+        order = self._send(body)
+        if self.watch_fills:
+            self._pool.submit(self._watch, order)
+        else:
+            self.balances.end_order()
+        return order
+
+    def _sell_body(self, ticker):
+        coin = ticker.split("-")[1]
+        volume = self.balances.balance(coin) if self.balances.loaded else 0.0
+        if volume <= 0:
+            # No snapshot yet, or the cache predates a fill still being
+            # polled: let in-flight orders finish, then take /v1/accounts.
+            self.balances.wait_idle(self.poll_timeout_sec)
+            self.balances.refresh(force=True)
+            volume = self.balances.balance(coin)
+        if volume <= 0:
+            raise RuntimeError("No balance to sell.")
+        return {"market": ticker, "side": "ask", "volume": str(volume), "ord_type": "market"}
+
+    def buy_market_order(self, ticker, amount_krw):
+        # Returns once the order is accepted; fills are polled in the background.
+        return self._place(
+            {"market": ticker, "side": "bid", "price": str(amount_krw), "ord_type": "price"}
+        )
+
+    def sell_market_order(self, ticker):
+        return self._place(self._sell_body(ticker))
+
+    def submit_buy(self, ticker, amount_krw):
+        # Future resolving to the final (polled) order.
+        body = {"market": ticker, "side": "bid", "price": str(amount_krw), "ord_type": "price"}
+        return self._pool.submit(lambda: self._watch(self._send(body)))
+
+    def submit_sell(self, ticker):
+        return self._pool.submit(lambda: self._watch(self._send(self._sell_body(ticker))))